@@ -4,23 +4,35 @@ GlaciarIng API Server
 API REST para conectar el frontend con MongoDB Atlas
 """
 
-from flask import Flask, request, jsonify, send_from_directory, session, redirect, url_for
+from flask import Flask, Response, request, jsonify, make_response, send_from_directory, session, redirect, url_for
 from flask_cors import CORS
 import logging
 import sys
 import os
 import platform
 from datetime import datetime
+import hashlib
 import json
+import multiprocessing
 import secrets
+import tempfile
 from functools import wraps
 
+# En el ejecutable, los procesos que validan importaciones en paralelo arrancan este
+# mismo programa: deben desviarse aquí, antes de crear la app y conectar a MongoDB
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
 # Agregar el directorio raíz al path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from controllers.controller import proyecto_controller
-from models.proyecto import Proyecto, STATUS_OPTIONS
+from controllers.controller import get_controller, UPSERT_KEYS
+from models.proyecto import Proyecto, STATUS_OPTIONS, parse_fields, get_encoder
 from db.conexion import test_mongodb_connection
+from db.cache import make_cache_key
+from db.eventos import format_event
+from controllers.importacion import check_import_options, save_upload, run_csv_import_job, run_bulk_import_job
+from controllers.trabajos import get_job_queue, JobQueueFull
 
 # Configurar logging
 if getattr(sys, 'frozen', False):
@@ -96,6 +108,36 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def conditional_get(f):
+    """Decorador para GET condicional con ETag.
+
+    El ETag se deriva de la versión de los datos, el rol y la URL (con sus
+    parámetros ordenados), así que validarlo no requiere consultar ni serializar
+    el contenido. Si coincide con If-None-Match se responde 304 sin cuerpo.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version = get_controller().get_data_version()
+        if version is None:
+            return f(*args, **kwargs)
+
+        # La versión se lee antes que los datos: si hay una escritura entre medio,
+        # el ETag queda más antiguo que el contenido y el cliente volverá a pedirlo
+        params = sorted(request.args.items(multi=True))
+        raw = json.dumps([version, session.get('user_type'), request.path, params], ensure_ascii=False)
+        etag = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
 # ===== RUTAS PARA SERVIR EL FRONTEND =====
 
 @app.route('/')
@@ -224,6 +266,12 @@ def check_session():
 
 # ===== API ENDPOINTS =====
 
+def serialize_proyecto(item):
+    """Serializa un Proyecto completo o deja tal cual un diccionario ya proyectado"""
+    if isinstance(item, Proyecto):
+        return item.to_json_serializable()
+    return item
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Endpoint de salud de la API"""
@@ -243,26 +291,60 @@ def health_check():
 
 @app.route('/api/proyectos', methods=['GET'])
 @login_required
+@conditional_get
 def get_proyectos():
-    """Obtiene todos los proyectos o proyectos filtrados"""
+    """Obtiene todos los proyectos o proyectos filtrados.
+
+    Con `limit` y/o `after` responde una página por cursor: `sort` indica el campo
+    (prefijo `-` para descendente), `after` el token de continuación recibido en
+    `next_cursor` y `total=1` agrega el conteo total de resultados.
+    `fields` (separados por coma) limita los campos retornados. El listado completo
+    se transmite por partes (`stream=0` lo desactiva).
+
+    Filtros (se combinan con AND): texto que contiene (contrato, cliente, ciudad,
+    rut_cliente, persona_contacto, telefono_contacto, correo_contacto, descripcion,
+    numero_factura, numero_orden_compra), igualdad (id, estado, region, tipo_cliente,
+    tipo_obra_lista; varios valores separados por coma), conjuntos (regiones,
+    ciudades), rangos <campo>_desde/<campo>_hasta (monto, superficie_terreno,
+    superficie_construida, duracion, fecha_inicio, fecha_termino, fecha_factura) y
+    banderas de servicios (ems=true, factura=false, ...).
+
+    `q` busca por subcadena en los campos de texto sin distinguir tildes ni
+    mayúsculas; sin paginación los resultados vienen ordenados por relevancia.
+    `cliente_grupo` (nombre o RUT) trae los proyectos de todas las variantes de
+    ese cliente según el último agrupamiento de /api/clientes/duplicados.
+    """
     try:
         # Obtener tipo de usuario de la sesión
         user_type = session.get('user_type', 'admin')
+        filters = request.args.to_dict()
+        paginated = 'limit' in request.args or 'after' in request.args
+        search_text = filters.get('q', '').strip()
 
-        # Obtener parámetros de filtro
-        cliente_filter = request.args.get('cliente', '')
-        estado_filter = request.args.get('estado', '')
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            if search_text and not paginated:
+                proyectos = get_controller().search_proyectos_ranked(search_text, user_type, filters, fields)
+                proyectos_json = [serialize_proyecto(proyecto) for proyecto in proyectos]
+                return jsonify({
+                    'success': True,
+                    'data': proyectos_json,
+                    'count': len(proyectos_json)
+                })
+            query = get_controller().build_filter_query(filters)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
-        if cliente_filter or estado_filter:
-            proyectos = proyecto_controller.search_proyectos(cliente_filter, estado_filter, user_type)
-        else:
-            proyectos = proyecto_controller.get_all_proyectos(user_type)
+        if paginated:
+            return get_proyectos_page(user_type, query, fields)
+
+        if request.args.get('stream', '1').lower() not in ['0', 'false']:
+            return stream_proyectos(user_type, query, fields)
+
+        proyectos = get_controller().get_all_proyectos(user_type, fields, query)
         
         # Convertir a formato JSON serializable
-        proyectos_json = []
-        for proyecto in proyectos:
-            proyecto_dict = proyecto.to_json_serializable()
-            proyectos_json.append(proyecto_dict)
+        proyectos_json = [serialize_proyecto(proyecto) for proyecto in proyectos]
         
         return jsonify({
             'success': True,
@@ -277,19 +359,159 @@ def get_proyectos():
             'error': str(e)
         }), 500
 
+# Cantidad de documentos serializados que se acumulan antes de enviar un fragmento
+STREAM_CHUNK_SIZE = 200
+
+# Tamaño máximo de un listado transmitido que se guarda en la caché de consultas
+STREAM_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+def stream_proyectos(user_type, query, fields=None):
+    """Transmite el listado como JSON por fragmentos sin materializar la colección.
+
+    Mantiene el mismo sobre {success, data, count}; count se emite al final. Los
+    listados de hasta STREAM_CACHE_MAX_BYTES se guardan ya codificados en la caché.
+    """
+    cache = get_controller().query_cache
+    cache_key = make_cache_key("stream", user_type, query, fields)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(cached, mimetype='application/json')
+    generation = cache.generation
+
+    documents = get_controller().iter_proyecto_documents(user_type, query, fields)
+
+    # Pedir el primer lote antes de responder para que un error de conexión sea un 500
+    first = next(documents, None)
+
+    encode = get_encoder(fields).encode
+
+    def chunks():
+        yield b'{"success": true, "data": ['
+        count = 0
+        separator = b''
+        if first is not None:
+            buffer = [encode(first)]
+            count = 1
+            for doc in documents:
+                buffer.append(encode(doc))
+                count += 1
+                if len(buffer) >= STREAM_CHUNK_SIZE:
+                    yield separator + b','.join(buffer)
+                    separator = b','
+                    buffer = []
+            if buffer:
+                yield separator + b','.join(buffer)
+        yield b'], "count": %d}' % count
+
+    def generate():
+        # Copia de lo enviado para la caché (se abandona si el listado es muy grande)
+        sent, size = [], 0
+        for chunk in chunks():
+            if sent is not None:
+                size += len(chunk)
+                if size <= STREAM_CACHE_MAX_BYTES:
+                    sent.append(chunk)
+                else:
+                    sent = None
+            yield chunk
+        if sent is not None:
+            cache.put(cache_key, b''.join(sent), generation)
+
+    return Response(generate(), mimetype='application/json')
+
+def get_proyectos_page(user_type, query, fields=None):
+    """Responde una página de proyectos usando paginación por cursor"""
+    sort_param = request.args.get('sort', 'id')
+    direction = -1 if sort_param.startswith('-') else 1
+    sort_field = sort_param.lstrip('-')
+
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'El parámetro limit debe ser numérico'}), 400
+
+    include_total = request.args.get('total', '').lower() in ['1', 'true']
+
+    try:
+        page = get_controller().get_proyectos_page(
+            user_type,
+            query=query,
+            sort_field=sort_field,
+            direction=direction,
+            after=request.args.get('after') or None,
+            limit=limit,
+            include_total=include_total,
+            fields=fields
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    proyectos_json = [serialize_proyecto(proyecto) for proyecto in page['items']]
+    response = {
+        'success': True,
+        'data': proyectos_json,
+        'count': len(proyectos_json),
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more']
+    }
+    if 'total' in page:
+        response['total'] = page['total']
+    return jsonify(response)
+
+@app.route('/api/proyectos/changes', methods=['GET'])
+@login_required
+def get_proyectos_changes():
+    """Cambios desde `since` (cursor recibido en una respuesta anterior).
+
+    Responde los proyectos creados/actualizados en `data`, los _id eliminados en
+    `deleted` y el cursor para la siguiente consulta. Con `reset` en true (sin
+    `since`, cursor demasiado antiguo o demasiados cambios) el cliente debe
+    recargar el listado completo y seguir desde el cursor recibido.
+    """
+    try:
+        user_type = session.get('user_type', 'admin')
+
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            changes = get_controller().get_changes(request.args.get('since') or None, user_type, fields)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'data': [serialize_proyecto(proyecto) for proyecto in changes['items']],
+            'deleted': changes['deleted'],
+            'cursor': changes['cursor'],
+            'reset': changes['reset']
+        })
+
+    except Exception as e:
+        logger.error(f"Error obteniendo cambios de proyectos: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/proyectos/<int:proyecto_id>', methods=['GET'])
 @login_required
+@conditional_get
 def get_proyecto(proyecto_id):
     """Obtiene un proyecto específico por ID"""
     try:
         # Obtener tipo de usuario de la sesión
         user_type = session.get('user_type', 'admin')
-        proyecto = proyecto_controller.get_proyecto_by_id(proyecto_id, user_type)
+
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        proyecto = get_controller().get_proyecto_by_id(proyecto_id, user_type, fields)
         
         if proyecto:
             return jsonify({
                 'success': True,
-                'data': proyecto.to_json_serializable()
+                'data': serialize_proyecto(proyecto)
             })
         else:
             return jsonify({
@@ -403,7 +625,7 @@ def create_proyecto():
 
         # Crear proyecto
         logger.info("💾 Intentando guardar proyecto en MongoDB...")
-        if proyecto_controller.create_proyecto(proyecto):
+        if get_controller().create_proyecto(proyecto):
             logger.info(f"✅ Proyecto creado exitosamente con ID: {proyecto.id}")
             return jsonify({
                 'success': True,
@@ -438,7 +660,7 @@ def update_proyecto(proyecto_id):
             }), 400
         
         # Obtener proyecto existente
-        proyecto = proyecto_controller.get_proyecto_by_id(proyecto_id)
+        proyecto = get_controller().get_proyecto_by_id(proyecto_id)
         if not proyecto:
             return jsonify({
                 'success': False,
@@ -501,7 +723,7 @@ def update_proyecto(proyecto_id):
         # La validación estricta solo se aplica en la creación
         
         # Actualizar proyecto
-        if proyecto_controller.update_proyecto(proyecto):
+        if get_controller().update_proyecto(proyecto):
             return jsonify({
                 'success': True,
                 'data': proyecto.to_json_serializable(),
@@ -525,7 +747,7 @@ def update_proyecto(proyecto_id):
 def delete_proyecto(proyecto_id):
     """Elimina un proyecto"""
     try:
-        if proyecto_controller.delete_proyecto(proyecto_id):
+        if get_controller().delete_proyecto(proyecto_id):
             return jsonify({
                 'success': True,
                 'message': 'Proyecto eliminado exitosamente'
@@ -560,7 +782,7 @@ def bulk_delete_proyectos():
         # Convertir a enteros
         ids = [int(id) for id in ids]
 
-        if proyecto_controller.delete_records(ids):
+        if get_controller().delete_records(ids):
             return jsonify({
                 'success': True,
                 'message': f'Eliminados {len(ids)} proyectos exitosamente'
@@ -578,95 +800,21 @@ def bulk_delete_proyectos():
             'error': str(e)
         }), 500
 
-def parse_boolean_value(value):
-    """Convierte valores CSV a booleanos"""
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, str):
-        return value.lower().strip() in ['true', '1', 'sí', 'si', 'yes', 'verdadero']
-    return False
-
-def parse_numeric_value(value, default=None):
-    """Convierte valores CSV a números"""
-    if not value or str(value).strip() == '' or str(value).lower() == 'null':
-        return default
-    try:
-        if '.' in str(value):
-            return float(value)
-        else:
-            return int(value)
-    except (ValueError, TypeError):
-        return default
-
-def normalize_column_name(column_name):
-    """Normaliza nombres de columnas CSV para mapeo consistente"""
-    if not column_name:
-        return ''
-
-    # Mapeo EXACTO de nombres de columnas CSV a nombres de campos internos
-    column_mapping = {
-        # Campos básicos - EXACTOS del CSV
-        'id': 'id',
-        'contrato': 'contrato',
-        'cliente': 'cliente',
-        'fecha_inicio': 'fecha_inicio',
-        'fecha_término': 'fecha_termino',  # Con acento como en CSV
-        'duración': 'duracion',           # Con acento como en CSV
-        'región': 'region',               # Con acento como en CSV
-        'ciudad': 'ciudad',
-        'estado': 'estado',
-        'monto': 'monto',
-
-        # Información del cliente - EXACTOS del CSV
-        'rut_cliente': 'rut_cliente',
-        'tipo_cliente': 'tipo_cliente',
-        'persona_contacto': 'persona_contacto',
-        'telefono_contacto': 'telefono_contacto',
-        'correo_contacto': 'correo_contacto',
-
-        # Información técnica - EXACTOS del CSV
-        'superficie_terreno': 'superficie_terreno',
-        'superficie_construida': 'superficie_construida',
-        'tipo_obra_lista': 'tipo_obra_lista',
-
-        # Estudios y servicios - EXACTOS del CSV
-        'ems': 'ems',
-        'estudio_sismico': 'estudio_sismico',
-        'estudio_geoeléctrico': 'estudio_geoelectrico',  # Con acento como en CSV
-        'topografía': 'topografia',                      # Con acento como en CSV
-        'sondaje': 'sondaje',
-        'hidráulica/hidrología': 'hidraulica_hidrologia', # Con acentos y / como en CSV
-        'descripción': 'descripcion',                     # Con acento como en CSV
-
-        # Documentos - EXACTOS del CSV
-        'certificado_experiencia': 'certificado_experiencia',
-        'orden_compra': 'orden_compra',
-        'contrato_existe': 'contrato_doc',
-        'factura': 'factura',
-        'fecha_factura': 'fecha_factura',
-        'numero_factura': 'numero_factura',
-        'numero_orden_compra': 'numero_orden_compra',
-        'link_documentos': 'link_documentos',
-
-        # Variaciones alternativas (por si acaso)
-        'fecha_termino': 'fecha_termino',
-        'duracion': 'duracion',
-        'region': 'region',
-        'estudio_geoelectrico': 'estudio_geoelectrico',
-        'topografia': 'topografia',
-        'hidraulica_hidrologia': 'hidraulica_hidrologia',
-        'descripcion': 'descripcion',
-        'contrato_doc': 'contrato_doc'
-    }
-
-    # Normalizar el nombre de la columna
-    normalized = column_name.lower().strip()
-    return column_mapping.get(normalized, normalized)
+def job_accepted(job_id, message):
+    """Respuesta 202 de un trabajo encolado; el progreso se consulta en /api/jobs/<id>"""
+    response = jsonify({
+        'success': True,
+        'message': message,
+        'data': {'job_id': job_id, 'status': 'queued', 'status_url': f'/api/jobs/{job_id}'}
+    })
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job_id}'
+    return response
 
 @app.route('/api/proyectos/bulk-import', methods=['POST'])
 @admin_required
 def bulk_import_proyectos():
-    """Importa múltiples proyectos"""
+    """Importa múltiples proyectos en segundo plano; retorna el id del trabajo (202)"""
     try:
         logger.info("🚀 INICIANDO IMPORTACIÓN CSV")
 
@@ -693,123 +841,145 @@ def bulk_import_proyectos():
             logger.info(f"📋 Columnas originales CSV ({len(original_columns)}): {original_columns}")
             logger.info(f"📄 Primer registro completo: {proyectos_data[0]}")
 
-        # Normalizar nombres de columnas en cada registro
-        normalized_data = []
-        for item in proyectos_data:
-            normalized_item = {}
-            for key, value in item.items():
-                normalized_key = normalize_column_name(key)
-                normalized_item[normalized_key] = value
-            normalized_data.append(normalized_item)
+        # Conversión e inserción por lotes en la cola de trabajos; el hash del cuerpo
+        # identifica el punto de control para retomar un reintento del mismo envío
+        body_hash = hashlib.sha256(request.get_data()).hexdigest()
+        duplicates = request.args.get('duplicates', 'skip')
+        try:
+            check_import_options('insert', False, duplicates)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        job_id = get_job_queue().submit(
+            'bulk_import',
+            lambda job: run_bulk_import_job(job, get_controller(), proyectos_data, body_hash,
+                                            duplicates=duplicates),
+            params={'rows': len(proyectos_data), 'duplicates': duplicates},
+            user=session.get('user_id')
+        )
+        return job_accepted(job_id, f"Importación de {len(proyectos_data)} proyectos encolada")
 
-        logger.info(f"📋 Ejemplo de datos normalizados: {normalized_data[0] if normalized_data else 'N/A'}")
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except Exception as e:
+        logger.error(f"Error en importación masiva: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        if not normalized_data:
+@app.route('/api/proyectos/import-csv', methods=['POST'])
+@admin_required
+def import_csv_proyectos():
+    """Importa proyectos desde un archivo CSV (campo `file` multipart o el cuerpo crudo).
+
+    El archivo se guarda en un temporal y se importa en segundo plano: responde
+    202 con el id del trabajo, cuyo progreso se consulta en /api/jobs/<id>. El
+    archivo se parsea por streaming y se inserta en lotes, así que la memoria
+    no crece con el tamaño del archivo. Detecta la codificación (UTF-8 o
+    Windows-1252 de Excel) y el delimitador (, ; tab |).
+
+    `mode=upsert` actualiza los proyectos existentes según `key` (`id` o
+    `contrato_rut`) escribiendo solo las columnas del archivo que cambiaron.
+    Con `dry_run=1` no se escribe nada: en modo upsert el resultado trae la
+    diferencia (new, changed, unchanged) y en modo insert la validación de cada
+    fila hecha en paralelo (valid, invalid, errors_by_field, errors por fila y campo).
+
+    En modo insert `duplicates` decide qué hacer con las filas cuyo id, contrato
+    o número de factura ya existe o se repite en el archivo: `skip` (omitirlas),
+    `overwrite` (actualizar el proyecto existente) o `report` (importarlas igual).
+    """
+    try:
+        mode = request.args.get('mode', 'insert')
+        key = request.args.get('key', 'id')
+        dry_run = request.args.get('dry_run', '').lower() in ['1', 'true']
+        duplicates = request.args.get('duplicates', 'skip')
+        try:
+            check_import_options(mode, dry_run, duplicates)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if mode == 'upsert' and key not in UPSERT_KEYS:
             return jsonify({
                 'success': False,
-                'error': 'No se proporcionaron datos de proyectos'
+                'error': f"Clave de actualización inválida: {key}. Opciones: {', '.join(UPSERT_KEYS)}"
             }), 400
 
-        # Crear objetos Proyecto
-        proyectos = []
-        for i, item in enumerate(normalized_data):
-            logger.info(f"📋 Procesando proyecto {i+1}: {item}")
-
-            # Función para parsear fechas con múltiples formatos
-            def parse_date(date_str):
-                if not date_str or str(date_str).strip() == '' or str(date_str).lower() == 'null':
-                    return None
-
-                date_formats = [
-                    '%Y-%m-%d',      # 2014-06-10
-                    '%d/%m/%Y',      # 10/06/2014
-                    '%d-%m-%Y',      # 10-06-2014
-                    '%m/%d/%Y',      # 06/10/2014
-                    '%Y/%m/%d'       # 2014/06/10
-                ]
-
-                for fmt in date_formats:
-                    try:
-                        return datetime.strptime(str(date_str).strip(), fmt)
-                    except ValueError:
-                        continue
-
-                logger.warning(f"⚠️ No se pudo parsear fecha: {date_str}")
-                return None
-
-            # Parsear fechas
-            fecha_inicio = parse_date(item.get('fecha_inicio'))
-            fecha_termino = parse_date(item.get('fecha_termino'))
-            fecha_factura = parse_date(item.get('fecha_factura'))
-
-            proyecto = Proyecto(
-                id=item.get('id'),
-                contrato=item.get('contrato', ''),
-                cliente=item.get('cliente', ''),
-                fecha_inicio=fecha_inicio,
-                fecha_termino=fecha_termino,
-                duracion=int(item.get('duracion')) if item.get('duracion') else None,
-                region=item.get('region', ''),
-                ciudad=item.get('ciudad', ''),
-                estado=item.get('estado', 'Activo'),
-                monto=parse_numeric_value(item.get('monto'), 0),
-                # Información del cliente
-                rut_cliente=item.get('rut_cliente', ''),
-                tipo_cliente=item.get('tipo_cliente', ''),
-                persona_contacto=item.get('persona_contacto', ''),
-                telefono_contacto=item.get('telefono_contacto', ''),
-                correo_contacto=item.get('correo_contacto', ''),
-                # Información técnica
-                superficie_terreno=parse_numeric_value(item.get('superficie_terreno')),
-                superficie_construida=parse_numeric_value(item.get('superficie_construida')),
-                tipo_obra_lista=item.get('tipo_obra_lista', ''),
-                # Estudios y servicios
-                ems=parse_boolean_value(item.get('ems', False)),
-                estudio_sismico=parse_boolean_value(item.get('estudio_sismico', False)),
-                estudio_geoelectrico=parse_boolean_value(item.get('estudio_geoelectrico', False)),
-                topografia=parse_boolean_value(item.get('topografia', False)),
-                sondaje=parse_boolean_value(item.get('sondaje', False)),
-                hidraulica_hidrologia=parse_boolean_value(item.get('hidraulica_hidrologia', False)),
-                descripcion=item.get('descripcion', ''),
-                certificado_experiencia=parse_boolean_value(item.get('certificado_experiencia', False)),
-                orden_compra=parse_boolean_value(item.get('orden_compra', False)),
-                contrato_doc=parse_boolean_value(item.get('contrato_doc', False)),
-                factura=parse_boolean_value(item.get('factura', False)),
-                fecha_factura=fecha_factura,
-                numero_factura=item.get('numero_factura', ''),
-                numero_orden_compra=item.get('numero_orden_compra', ''),
-                link_documentos=item.get('link_documentos', '')
-            )
-            logger.info(f"✅ Proyecto creado: ID={proyecto.id}, Contrato={proyecto.contrato}")
-            proyectos.append(proyecto)
-
-        # Importar proyectos
-        if proyecto_controller.bulk_insert_proyectos(proyectos):
-            return jsonify({
-                'success': True,
-                'message': f'Importados {len(proyectos)} proyectos exitosamente'
-            })
+        if request.files:
+            upload = request.files.get('file')
+            if upload is None:
+                return jsonify({'success': False, 'error': 'Falta el archivo (campo file)'}), 400
+            stream = upload.stream
         else:
-            return jsonify({
-                'success': False,
-                'error': 'Error al importar proyectos'
-            }), 500
+            stream = request.stream
+
+        # El stream del request se cierra al responder: el trabajo lee una copia en disco.
+        # El hash del archivo identifica su punto de control (un reintento retoma donde quedó)
+        fd, path = tempfile.mkstemp(prefix='glaciaring-import-', suffix='.csv')
+        with os.fdopen(fd, 'wb') as target:
+            file_hash = save_upload(stream, target)
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+            return jsonify({'success': False, 'error': 'El archivo CSV está vacío'}), 400
+
+        options = {'mode': mode, 'key': key, 'dry_run': dry_run, 'duplicates': duplicates}
+        try:
+            job_id = get_job_queue().submit(
+                'import_csv',
+                lambda job: run_csv_import_job(job, get_controller(), path, file_hash, **options),
+                params=options,
+                user=session.get('user_id'),
+                cleanup=lambda: os.remove(path)
+            )
+        except Exception:
+            os.remove(path)
+            raise
+        return job_accepted(job_id, 'Simulación encolada' if dry_run else 'Importación encolada')
 
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
     except Exception as e:
-        logger.error(f"Error en importación masiva: {e}")
+        logger.error(f"Error en importación CSV: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    """Estado de un trabajo: status, progress (filas leídas, válidas e insertadas,
+    rows_per_second, eta_seconds, percent), errors y, al terminar, result"""
+    job = get_job_queue().get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'data': job})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(job_id):
+    """Cancela un trabajo en cola o en curso (lo ya importado se conserva)"""
+    if not get_job_queue().cancel(job_id):
+        if not get_job_queue().get(job_id):
+            return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+        return jsonify({'success': False, 'error': 'El trabajo ya terminó'}), 409
+    return jsonify({'success': True, 'message': 'Cancelación solicitada'})
+
 @app.route('/api/statistics', methods=['GET'])
 @login_required
+@conditional_get
 def get_statistics():
-    """Obtiene estadísticas de los proyectos"""
+    """Obtiene estadísticas de los proyectos.
+
+    Acepta los mismos filtros que GET /api/proyectos.
+    """
     try:
         # Obtener tipo de usuario de la sesión
         user_type = session.get('user_type', 'admin')
-        stats = proyecto_controller.get_statistics(user_type)
+
+        try:
+            stats = get_controller().get_statistics(user_type, request.args.to_dict())
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
         return jsonify({
             'success': True,
             'data': stats
@@ -822,6 +992,111 @@ def get_statistics():
             'error': str(e)
         }), 500
 
+@app.route('/api/statistics/reconcile', methods=['POST'])
+@admin_required
+def reconcile_statistics():
+    """Reconstruye el resumen de estadísticas y reporta la deriva encontrada"""
+    try:
+        result = get_controller().reconcile_statistics()
+        return jsonify({
+            'success': True,
+            'data': {
+                'drift_count': result['drift_count'],
+                'drift': result['drift']
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"Error reconciliando estadísticas: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/clientes/duplicados', methods=['POST'])
+@admin_required
+def cluster_clients():
+    """Agrupa en segundo plano las variantes de un mismo cliente (nombre y RUT).
+
+    Responde 202 con el id del trabajo; al terminar, su resultado es el reporte
+    de sugerencias que también entrega GET /api/clientes/duplicados.
+    """
+    try:
+        job_id = get_job_queue().submit(
+            'client_clusters',
+            lambda job: get_controller().cluster_clients(
+                lambda done, total: job.update(rows_parsed=done, rows_total=total)),
+            user=session.get('user_id')
+        )
+        return job_accepted(job_id, 'Agrupamiento de clientes encolado')
+
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except Exception as e:
+        logger.error(f"Error encolando agrupamiento de clientes: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/clientes/duplicados', methods=['GET'])
+@admin_required
+def get_client_duplicates():
+    """Último reporte de clientes duplicados: cada grupo trae el nombre y RUT
+    sugeridos, sus variantes con la cantidad de proyectos, el puntaje y el motivo"""
+    report = get_controller().get_client_merge_suggestions()
+    if not report:
+        return jsonify({'success': False, 'error': 'Aún no se han agrupado los clientes'}), 404
+    return jsonify({'success': True, 'data': report})
+
+@app.route('/api/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Contadores de la caché de consultas (aciertos, fallos, desalojos, tamaño)"""
+    return jsonify({
+        'success': True,
+        'data': get_controller().get_cache_stats()
+    })
+
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión
+EVENTS_HEARTBEAT_SECONDS = 15
+
+# Milisegundos que espera el navegador antes de reconectarse
+EVENTS_RETRY_MS = 3000
+
+@app.route('/api/events', methods=['GET'])
+@login_required
+def stream_events():
+    """Canal Server-Sent Events con los cambios de proyectos (created, updated, deleted).
+
+    Cada evento trae {_id, id, fields} con los campos cambiados. Al reconectarse,
+    el navegador envía Last-Event-ID y recibe los eventos perdidos; si ya no están
+    disponibles recibe `reset` y debe resincronizar con /api/proyectos/changes.
+    """
+    bus = get_controller().events
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = bus.subscribe(last_event_id)
+
+    def generate():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            if not last_event_id:
+                # Punto de partida para que una reconexión pueda pedir lo perdido
+                yield format_event(bus.last_event_id, 'ready', '{}')
+            while True:
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield format_event(bus.last_event_id, 'reset', '{}')
+                message = subscription.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+                yield message if message is not None else ": ping\n\n"
+        finally:
+            bus.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Sin buffer en proxies (nginx)
+    return response
+
 @app.route('/api/status-options', methods=['GET'])
 def get_status_options():
     """Obtiene las opciones de estado disponibles"""
@@ -830,6 +1105,36 @@ def get_status_options():
         'data': STATUS_OPTIONS
     })
 
+@app.route('/api/suggest', methods=['GET'])
+@login_required
+def suggest_values():
+    """Sugerencias para autocompletar: valores de `field` que empiezan con `prefix`.
+
+    `field` puede ser cliente, ciudad, region o tipo_obra_lista; `limit` (por
+    defecto 10) limita la cantidad. Cada sugerencia incluye su frecuencia.
+    """
+    try:
+        field = request.args.get('field', '')
+        prefix = request.args.get('prefix', '')
+
+        try:
+            limit = int(request.args.get('limit', 10))
+            suggestions = get_controller().suggest_values(field, prefix, limit)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'data': suggestions
+        })
+
+    except Exception as e:
+        logger.error(f"Error obteniendo sugerencias: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 
 
 # ===== MANEJO DE ERRORES =====
@@ -862,6 +1167,13 @@ def main():
         else:
             logger.warning("⚠️ Problema con la conexión a MongoDB Atlas")
 
+        # El controlador y la cola se crean aquí y no al importar este archivo: los procesos
+        # que validan importaciones lo reimportan como __mp_main__ sin llamar a main()
+        get_job_queue()
+
+        # Invalidar la caché de consultas también con escrituras de otros procesos
+        get_controller().start_change_listener()
+
         # Iniciar servidor
         logger.info("🌐 Servidor disponible en:")
         logger.info("   📱 Frontend: http://localhost:5003")
@@ -316,6 +316,38 @@ class UIComponents {
         };
     }
 
+    /**
+     * Attach server-side value suggestions to a text input (uses a <datalist>)
+     */
+    static setupSuggestions(inputId, field, debounceMs = 150) {
+        const input = document.getElementById(inputId);
+        if (!input || !window.dataManager) return;
+
+        const datalist = document.createElement('datalist');
+        datalist.id = `${inputId}Suggestions`;
+        input.after(datalist);
+        input.setAttribute('list', datalist.id);
+        input.setAttribute('autocomplete', 'off');
+
+        let lastPrefix = null;
+        const loadSuggestions = this.debounce(async (prefix) => {
+            if (prefix === lastPrefix) return;
+            lastPrefix = prefix;
+            const suggestions = await window.dataManager.getSuggestions(field, prefix);
+            // Ignorar respuestas de un prefijo que ya cambió
+            if (prefix !== input.value.trim()) return;
+            datalist.innerHTML = '';
+            suggestions.forEach(({ value }) => {
+                const option = document.createElement('option');
+                option.value = value;
+                datalist.appendChild(option);
+            });
+        }, debounceMs);
+
+        input.addEventListener('input', (e) => loadSuggestions(e.target.value.trim()));
+        input.addEventListener('focus', () => loadSuggestions(input.value.trim()));
+    }
+
     /**
      * Setup search functionality
      */
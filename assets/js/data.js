@@ -6,29 +6,53 @@
 class DataManager {
     constructor() {
         this.apiBaseUrl = '/api';
-        this.cache = new Map();
-        this.cacheTimeout = 5 * 60 * 1000; // 5 minutos
+        this.cache = new Map(); // url -> { etag, data } de las respuestas GET con ETag
+        this.cacheMaxEntries = 50;
+        this.records = null;      // Copia local del listado completo (sincronización incremental)
+        this.syncCursor = null;
+        this.jobPollInterval = 1000; // ms entre consultas del progreso de un trabajo
     }
 
     /**
      * Make API request
+     * GET responses with an ETag are cached and revalidated with If-None-Match;
+     * on 304 Not Modified the cached body is returned without downloading it again
      */
     async apiRequest(endpoint, options = {}) {
         try {
             const url = `${this.apiBaseUrl}${endpoint}`;
-            const defaultOptions = {
-                headers: {
-                    'Content-Type': 'application/json',
-                },
+            const method = (options.method || 'GET').toUpperCase();
+            const cached = method === 'GET' ? this.cache.get(url) : null;
+            const headers = {
+                'Content-Type': 'application/json',
+                ...(cached ? { 'If-None-Match': cached.etag } : {}),
+                ...(options.headers || {})
             };
 
-            const response = await fetch(url, { ...defaultOptions, ...options });
+            const response = await fetch(url, { ...options, headers });
+
+            if (response.status === 304 && cached) {
+                // Refrescar su posición en el orden LRU
+                this.cache.delete(url);
+                this.cache.set(url, cached);
+                return cached.data;
+            }
+
             const data = await response.json();
 
             if (!response.ok) {
                 throw new Error(data.error || `HTTP error! status: ${response.status}`);
             }
 
+            const etag = response.headers.get('ETag');
+            if (method === 'GET' && etag) {
+                this.cache.delete(url);
+                this.cache.set(url, { etag, data });
+                if (this.cache.size > this.cacheMaxEntries) {
+                    this.cache.delete(this.cache.keys().next().value);
+                }
+            }
+
             return data;
         } catch (error) {
             console.error('API request failed:', error);
@@ -50,11 +74,15 @@ class DataManager {
     }
 
     /**
-     * Get all records
+     * Get all records (optionally only the given fields)
      */
-    async getAllRecords() {
+    async getAllRecords(fields = null) {
         try {
-            const response = await this.apiRequest('/proyectos');
+            if (!fields || !fields.length) {
+                return await this.syncRecords();
+            }
+            const query = fields && fields.length ? `?fields=${encodeURIComponent(fields.join(','))}` : '';
+            const response = await this.apiRequest(`/proyectos${query}`);
             return response.data || [];
         } catch (error) {
             console.error('Error getting all records:', error);
@@ -62,6 +90,124 @@ class DataManager {
         }
     }
 
+    /**
+     * Keep a local copy of all records up to date
+     * The first call (or when the server answers reset) loads the full listing;
+     * later calls only download records changed and ids deleted since the last cursor
+     */
+    async syncRecords() {
+        try {
+            if (this.records && this.syncCursor) {
+                const changes = await this.apiRequest(`/proyectos/changes?since=${encodeURIComponent(this.syncCursor)}`);
+                if (!changes.reset) {
+                    this.mergeChanges(changes.data || [], changes.deleted || []);
+                    this.syncCursor = changes.cursor;
+                    return this.records;
+                }
+            }
+
+            // El cursor se pide antes de la carga completa: lo que cambie entre
+            // ambas consultas vuelve a llegar en la siguiente sincronización
+            const start = await this.apiRequest('/proyectos/changes');
+            const response = await this.apiRequest('/proyectos');
+            this.records = response.data || [];
+            this.syncCursor = start.cursor;
+            return this.records;
+        } catch (error) {
+            console.error('Error syncing records:', error);
+            return this.records || [];
+        }
+    }
+
+    /**
+     * Apply updated records and deleted ids to the local copy (keyed by _id)
+     */
+    mergeChanges(updated, deleted) {
+        if (!updated.length && !deleted.length) return;
+
+        const byId = new Map(this.records.map(record => [record._id, record]));
+        deleted.forEach(id => byId.delete(id));
+        updated.forEach(record => byId.set(record._id, record));
+        this.records = Array.from(byId.values()).sort((a, b) => a.id - b.id);
+    }
+
+    /**
+     * Subscribe to live project changes pushed by the server (Server-Sent Events)
+     * Events are applied to the local copy; `reset` (missed events) triggers a delta sync.
+     * The browser reconnects by itself sending Last-Event-ID, so no full refetch is needed.
+     */
+    subscribeToChanges(onChange) {
+        if (this.eventSource || typeof EventSource === 'undefined') return;
+
+        this.eventSource = new EventSource(`${this.apiBaseUrl}/events`);
+        const apply = (type) => (event) => {
+            if (!this.records) return;
+            const change = JSON.parse(event.data);
+            if (this.applyChange(type, change)) {
+                onChange(type, change);
+            } else {
+                // Cambio sobre un registro que no tenemos: pedir solo lo que falta
+                this.syncRecords().then(() => onChange('reset', {}));
+            }
+        };
+
+        this.eventSource.addEventListener('created', apply('created'));
+        this.eventSource.addEventListener('updated', apply('updated'));
+        this.eventSource.addEventListener('deleted', apply('deleted'));
+        this.eventSource.addEventListener('reset', () => {
+            if (!this.records) return;
+            this.syncRecords().then(() => onChange('reset', {}));
+        });
+    }
+
+    /**
+     * Apply one pushed change to the local copy; returns false if it cannot be applied
+     */
+    applyChange(type, change) {
+        const index = this.records.findIndex(record => record._id === change._id);
+        if (type === 'deleted') {
+            if (index >= 0) this.records = this.records.filter((_, i) => i !== index);
+            return true;
+        }
+        if (type === 'updated') {
+            if (index < 0) return false;
+            this.records = this.records.slice();
+            this.records[index] = { ...this.records[index], ...change.fields };
+            return true;
+        }
+        this.mergeChanges([{ ...change.fields, _id: change._id }], []);
+        return true;
+    }
+
+    /**
+     * Get one page of records using cursor pagination
+     * options: { limit, after, sort, total, cliente, estado, fields, filters }
+     * Returns { data, nextCursor, hasMore, total }
+     */
+    async getRecordsPage(options = {}) {
+        try {
+            const params = this.buildFilterParams(options.filters || {});
+            params.append('limit', options.limit || 50);
+            if (options.after) params.append('after', options.after);
+            if (options.sort) params.append('sort', options.sort);
+            if (options.total) params.append('total', '1');
+            if (options.cliente) params.append('cliente', options.cliente);
+            if (options.estado) params.append('estado', options.estado);
+            if (options.fields && options.fields.length) params.append('fields', options.fields.join(','));
+
+            const response = await this.apiRequest(`/proyectos?${params.toString()}`);
+            return {
+                data: response.data || [],
+                nextCursor: response.next_cursor || null,
+                hasMore: Boolean(response.has_more),
+                total: response.total
+            };
+        } catch (error) {
+            console.error('Error getting records page:', error);
+            return { data: [], nextCursor: null, hasMore: false, total: 0 };
+        }
+    }
+
     /**
      * Get filtered records
      */
@@ -81,123 +227,31 @@ class DataManager {
     }
 
     /**
-     * Get records with advanced filtering
+     * Convert UI filters (camelCase keys) into the query parameters understood by the API
+     * The general search term is sent as `q` (accent-insensitive substring search)
+     */
+    buildFilterParams(filters = {}) {
+        const renamed = { tipoObra: 'tipo_obra_lista', search: 'q' };
+        const params = new URLSearchParams();
+        Object.keys(filters).sort().forEach(key => {
+            const value = filters[key];
+            if (value === undefined || value === null || value === '') return;
+            const param = renamed[key] || key.replace(/[A-Z]/g, c => '_' + c.toLowerCase());
+            params.append(param, value);
+        });
+        return params;
+    }
+
+    /**
+     * Get records with advanced filtering (filters are evaluated by the server;
+     * with a search term the results come ranked by relevance)
      */
     async getAdvancedFilteredRecords(filters = {}) {
         try {
-            const data = await this.getAllRecords();
-
-            return data.filter(record => {
-                // Búsqueda general (ID, contrato, cliente)
-                if (filters.search) {
-                    const searchTerm = filters.search.toLowerCase();
-                    const searchMatch =
-                        (record.id && record.id.toString().toLowerCase().includes(searchTerm)) ||
-                        (record.contrato && record.contrato.toLowerCase().includes(searchTerm)) ||
-                        (record.cliente && record.cliente.toLowerCase().includes(searchTerm));
-
-                    if (!searchMatch) return false;
-                }
-
-                // Filtro por ID específico
-                if (filters.id && record.id) {
-                    if (!record.id.toString().toLowerCase().includes(filters.id.toLowerCase())) {
-                        return false;
-                    }
-                }
-
-                // Filtro por contrato
-                if (filters.contrato && record.contrato) {
-                    if (!record.contrato.toLowerCase().includes(filters.contrato.toLowerCase())) {
-                        return false;
-                    }
-                }
-
-                // Filtro por cliente
-                if (filters.cliente && record.cliente) {
-                    if (!record.cliente.toLowerCase().includes(filters.cliente.toLowerCase())) {
-                        return false;
-                    }
-                }
-
-                // Filtro por estado
-                if (filters.estado && record.estado !== filters.estado) {
-                    return false;
-                }
-
-                // Filtro por región
-                if (filters.region && record.region) {
-                    if (!record.region.toLowerCase().includes(filters.region.toLowerCase())) {
-                        return false;
-                    }
-                }
-
-                // Filtro por ciudad
-                if (filters.ciudad && record.ciudad) {
-                    if (!record.ciudad.toLowerCase().includes(filters.ciudad.toLowerCase())) {
-                        return false;
-                    }
-                }
-
-                // Filtros de fecha de inicio
-                if (filters.fechaInicioDesde || filters.fechaInicioHasta) {
-                    const fechaInicio = record.fecha_inicio ? new Date(record.fecha_inicio) : null;
-
-                    if (filters.fechaInicioDesde) {
-                        const fechaDesde = new Date(filters.fechaInicioDesde);
-                        if (!fechaInicio || fechaInicio < fechaDesde) {
-                            return false;
-                        }
-                    }
-
-                    if (filters.fechaInicioHasta) {
-                        const fechaHasta = new Date(filters.fechaInicioHasta);
-                        if (!fechaInicio || fechaInicio > fechaHasta) {
-                            return false;
-                        }
-                    }
-                }
-
-                // Filtros de fecha de término
-                if (filters.fechaTerminoDesde || filters.fechaTerminoHasta) {
-                    const fechaTermino = record.fecha_termino ? new Date(record.fecha_termino) : null;
-
-                    if (filters.fechaTerminoDesde) {
-                        const fechaDesde = new Date(filters.fechaTerminoDesde);
-                        if (!fechaTermino || fechaTermino < fechaDesde) {
-                            return false;
-                        }
-                    }
-
-                    if (filters.fechaTerminoHasta) {
-                        const fechaHasta = new Date(filters.fechaTerminoHasta);
-                        if (!fechaTermino || fechaTermino > fechaHasta) {
-                            return false;
-                        }
-                    }
-                }
-
-                // Filtros de monto
-                if (filters.montoDesde || filters.montoHasta) {
-                    const monto = parseFloat(record.monto) || 0;
-
-                    if (filters.montoDesde) {
-                        const montoDesde = parseFloat(filters.montoDesde);
-                        if (monto < montoDesde) {
-                            return false;
-                        }
-                    }
-
-                    if (filters.montoHasta) {
-                        const montoHasta = parseFloat(filters.montoHasta);
-                        if (monto > montoHasta) {
-                            return false;
-                        }
-                    }
-                }
-
-                return true;
-            });
+            const params = this.buildFilterParams(filters);
+            const query = params.toString() ? `?${params.toString()}` : '';
+            const response = await this.apiRequest(`/proyectos${query}`);
+            return response.data || [];
         } catch (error) {
             console.error('Error filtering records with advanced filters:', error);
             throw error;
@@ -416,14 +470,71 @@ class DataManager {
                 body: JSON.stringify({ proyectos })
             });
 
-            console.log('Respuesta de importación:', response);
-            return proyectos.length;
+            // La importación corre en segundo plano: esperar a que termine el trabajo
+            const summary = await this.waitForJob(response.data.job_id);
+            console.log('Resultado de importación:', summary);
+            return summary.imported;
         } catch (error) {
             console.error('Error importing data:', error);
             return 0;
         }
     }
 
+    /**
+     * Import a CSV file; the server stream-parses it and inserts it in batches
+     * options: { mode: 'insert' | 'upsert', key: 'id' | 'contrato_rut', dryRun, onProgress,
+     *            duplicates: 'skip' | 'overwrite' | 'report' (solo insert) }
+     * The import runs as a background job; onProgress(job) receives each poll
+     * Returns the import summary { rows, imported, skipped, errors, ... }
+     */
+    async importCSV(file, options = {}) {
+        const formData = new FormData();
+        formData.append('file', file);
+
+        const params = new URLSearchParams();
+        if (options.mode) params.append('mode', options.mode);
+        if (options.key) params.append('key', options.key);
+        if (options.dryRun) params.append('dry_run', '1');
+        if (options.duplicates) params.append('duplicates', options.duplicates);
+        const query = params.toString() ? `?${params.toString()}` : '';
+
+        // Sin Content-Type explícito: el navegador agrega el boundary del multipart
+        const response = await fetch(`${this.apiBaseUrl}/proyectos/import-csv${query}`, {
+            method: 'POST',
+            body: formData
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.error || `HTTP error! status: ${response.status}`);
+        }
+        return this.waitForJob(result.data.job_id, options.onProgress);
+    }
+
+    /**
+     * Poll a background job until it finishes
+     * Returns the job result; throws if it failed or was cancelled
+     */
+    async waitForJob(jobId, onProgress = null) {
+        while (true) {
+            const response = await this.apiRequest(`/jobs/${jobId}`);
+            const job = response.data;
+            if (onProgress) onProgress(job);
+
+            if (job.status === 'completed') return job.result;
+            if (job.status === 'failed') throw new Error(job.error || 'El trabajo falló');
+            if (job.status === 'cancelled') throw new Error('Importación cancelada');
+
+            await new Promise(resolve => setTimeout(resolve, this.jobPollInterval));
+        }
+    }
+
+    /**
+     * Request cancellation of a background job (rows already imported are kept)
+     */
+    async cancelJob(jobId) {
+        return this.apiRequest(`/jobs/${jobId}/cancel`, { method: 'POST' });
+    }
+
     /**
      * Export data to JSON
      */
@@ -438,11 +549,14 @@ class DataManager {
     }
 
     /**
-     * Get statistics
+     * Get statistics computed on the server (optionally filtered)
+     * filters: UI filters (camelCase, see buildFilterParams) or URLSearchParams
      */
-    async getStatistics() {
+    async getStatistics(filters = {}) {
         try {
-            const response = await this.apiRequest('/statistics');
+            const params = filters instanceof URLSearchParams ? filters : this.buildFilterParams(filters);
+            const query = params.toString() ? `?${params.toString()}` : '';
+            const response = await this.apiRequest(`/statistics${query}`);
             return response.data || {};
         } catch (error) {
             console.error('Error getting statistics:', error);
@@ -456,6 +570,21 @@ class DataManager {
         }
     }
 
+    /**
+     * Get value suggestions for autocomplete (cliente, ciudad, region, tipo_obra_lista)
+     * Returns [{ value, count }] ordered by frequency
+     */
+    async getSuggestions(field, prefix = '', limit = 10) {
+        try {
+            const params = new URLSearchParams({ field, prefix, limit });
+            const response = await this.apiRequest(`/suggest?${params.toString()}`);
+            return response.data || [];
+        } catch (error) {
+            console.error('Error getting suggestions:', error);
+            return [];
+        }
+    }
+
     /**
      * Get status options
      */
@@ -9,6 +9,13 @@ class MainPage {
         this.filteredProjects = [];
         this.currentPage = 1;
         this.projectsPerPage = 50;
+
+        // Resultado de los filtros evaluados en el servidor
+        this.serverFilteredProjects = [];
+        this.serverStats = null;
+        this.serverFilterKey = null;
+        this.filterRequestId = 0;
+        this.searchTimer = null;
         
         this.currentFilters = {
             search: '',
@@ -65,9 +72,24 @@ class MainPage {
         this.setupEventListeners();
         await this.loadAllProjects();
         this.applyFiltersAndDisplay();
+        this.setupLiveUpdates();
         console.log('✅ MainPage inicializada correctamente');
     }
 
+    setupLiveUpdates() {
+        // Los cambios de otros usuarios llegan por el canal de eventos; se agrupan
+        // los que llegan seguidos para refiltrar una sola vez
+        let refreshTimer = null;
+        dataManager.subscribeToChanges(() => {
+            clearTimeout(refreshTimer);
+            refreshTimer = setTimeout(() => {
+                this.allProjects = dataManager.records || [];
+                this.serverFilterKey = null;
+                this.applyFiltersAndDisplay();
+            }, 300);
+        });
+    }
+
     setupEventListeners() {
         // Toggle filters visibility
         const toggleFilters = document.getElementById('toggleFilters');
@@ -109,7 +131,9 @@ class MainPage {
         if (searchInput) {
             searchInput.addEventListener('input', (e) => {
                 this.currentFilters.search = e.target.value.trim();
-                this.applyFiltersAndDisplay();
+                // Esperar a que el usuario deje de escribir antes de consultar al servidor
+                clearTimeout(this.searchTimer);
+                this.searchTimer = setTimeout(() => this.applyFiltersAndDisplay(), 250);
             });
         }
 
@@ -126,6 +150,10 @@ class MainPage {
             });
         }
 
+        // Sugerencias de valores para los filtros de texto
+        UIComponents.setupSuggestions('clienteFilter', 'cliente');
+        UIComponents.setupSuggestions('ciudadFilter', 'ciudad');
+
         // Enter key on filter inputs for quick apply
         const filterInputs = [
             'idFilter', 'contratoFilter', 'clienteFilter', 'ciudadFilter',
@@ -171,13 +199,9 @@ class MainPage {
             console.log('📡 Cargando todos los proyectos...');
             UIComponents.showLoading('Cargando proyectos...');
 
-            const response = await fetch('/api/proyectos');
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-
-            const result = await response.json();
-            this.allProjects = result.data || [];
+            // Tras la primera carga solo se descargan los cambios desde la última sincronización
+            this.allProjects = await dataManager.syncRecords();
+            this.serverFilterKey = null; // Forzar nueva consulta de filtros con los datos recargados
             
             console.log('✅ Proyectos cargados:', this.allProjects.length);
             UIComponents.hideLoading();
@@ -256,388 +280,43 @@ class MainPage {
         UIComponents.showNotification('Filtros aplicados exitosamente', 'success');
     }
 
-    applyFiltersAndDisplay() {
-        this.filteredProjects = this.allProjects.filter(project => {
-            return this.matchesAllFilters(project);
-        });
-
-        console.log('📊 Proyectos filtrados:', this.filteredProjects.length, 'de', this.allProjects.length);
-        this.displayProjects();
-        this.updateStatistics();
-    }
-
-    matchesAllFilters(project) {
-        // Búsqueda general en todos los campos
-        if (this.currentFilters.search) {
-            const searchTerm = this.currentFilters.search.toLowerCase();
-            const searchMatch =
-                // Campos básicos
-                (project.id && project.id.toString().toLowerCase().includes(searchTerm)) ||
-                (project.contrato && project.contrato.toLowerCase().includes(searchTerm)) ||
-                (project.cliente && project.cliente.toLowerCase().includes(searchTerm)) ||
-                (project.region && project.region.toLowerCase().includes(searchTerm)) ||
-                (project.ciudad && project.ciudad.toLowerCase().includes(searchTerm)) ||
-                (project.estado && project.estado.toLowerCase().includes(searchTerm)) ||
-                (project.monto && project.monto.toString().toLowerCase().includes(searchTerm)) ||
-
-                // Información del cliente
-                (project.rut_cliente && project.rut_cliente.toLowerCase().includes(searchTerm)) ||
-                (project.tipo_cliente && project.tipo_cliente.toLowerCase().includes(searchTerm)) ||
-                (project.persona_contacto && project.persona_contacto.toLowerCase().includes(searchTerm)) ||
-                (project.telefono_contacto && project.telefono_contacto.toLowerCase().includes(searchTerm)) ||
-                (project.correo_contacto && project.correo_contacto.toLowerCase().includes(searchTerm)) ||
-
-                // Información técnica
-                (project.superficie_terreno && project.superficie_terreno.toString().toLowerCase().includes(searchTerm)) ||
-                (project.superficie_construida && project.superficie_construida.toString().toLowerCase().includes(searchTerm)) ||
-                (project.tipo_obra_lista && project.tipo_obra_lista.toLowerCase().includes(searchTerm)) ||
-
-                // Descripción y documentos
-                (project.descripcion && project.descripcion.toLowerCase().includes(searchTerm)) ||
-                (project.numero_factura && project.numero_factura.toLowerCase().includes(searchTerm)) ||
-                (project.numero_orden_compra && project.numero_orden_compra.toLowerCase().includes(searchTerm)) ||
-                (project.link_documentos && project.link_documentos.toLowerCase().includes(searchTerm)) ||
-
-                // Fechas (convertidas a string)
-                (project.fecha_inicio && new Date(project.fecha_inicio).toLocaleDateString().includes(searchTerm)) ||
-                (project.fecha_termino && new Date(project.fecha_termino).toLocaleDateString().includes(searchTerm)) ||
-
-                // Campos booleanos (búsqueda por "sí", "no", "true", "false")
-                this.searchBooleanFields(project, searchTerm);
-
-            if (!searchMatch) return false;
-        }
-
-        // Filtro por ID específico
-        if (this.currentFilters.id && project.id) {
-            if (!project.id.toString().toLowerCase().includes(this.currentFilters.id.toLowerCase())) {
-                return false;
-            }
-        }
-
-        // Filtro por contrato
-        if (this.currentFilters.contrato && project.contrato) {
-            if (!project.contrato.toLowerCase().includes(this.currentFilters.contrato.toLowerCase())) {
-                return false;
-            }
-        }
-
-        // Filtro por cliente
-        if (this.currentFilters.cliente && project.cliente) {
-            if (!project.cliente.toLowerCase().includes(this.currentFilters.cliente.toLowerCase())) {
-                return false;
-            }
-        }
-
-        // Filtro por estado
-        if (this.currentFilters.estado && project.estado !== this.currentFilters.estado) {
-            return false;
-        }
-
-        // Filtro por región (exacto para el selector)
-        if (this.currentFilters.region && project.region !== this.currentFilters.region) {
-            return false;
-        }
-
-        // Filtro por ciudad
-        if (this.currentFilters.ciudad && project.ciudad) {
-            if (!project.ciudad.toLowerCase().includes(this.currentFilters.ciudad.toLowerCase())) {
-                return false;
-            }
-        }
-
-        // Filtros de fecha de inicio
-        if (this.currentFilters.fechaInicioDesde || this.currentFilters.fechaInicioHasta) {
-            const fechaInicio = project.fecha_inicio ? new Date(project.fecha_inicio) : null;
-            
-            if (this.currentFilters.fechaInicioDesde) {
-                const fechaDesde = new Date(this.currentFilters.fechaInicioDesde);
-                if (!fechaInicio || fechaInicio < fechaDesde) {
-                    return false;
-                }
-            }
-            
-            if (this.currentFilters.fechaInicioHasta) {
-                const fechaHasta = new Date(this.currentFilters.fechaInicioHasta);
-                if (!fechaInicio || fechaInicio > fechaHasta) {
-                    return false;
-                }
-            }
-        }
-
-        // Filtros de fecha de término
-        if (this.currentFilters.fechaTerminoDesde || this.currentFilters.fechaTerminoHasta) {
-            const fechaTermino = project.fecha_termino ? new Date(project.fecha_termino) : null;
-
-            if (this.currentFilters.fechaTerminoDesde) {
-                const fechaDesde = new Date(this.currentFilters.fechaTerminoDesde);
-                if (!fechaTermino || fechaTermino < fechaDesde) {
-                    return false;
-                }
-            }
-
-            if (this.currentFilters.fechaTerminoHasta) {
-                const fechaHasta = new Date(this.currentFilters.fechaTerminoHasta);
-                if (!fechaTermino || fechaTermino > fechaHasta) {
-                    return false;
-                }
-            }
-        }
-
-        // Filtros de duración
-        if (this.currentFilters.duracionDesde || this.currentFilters.duracionHasta) {
-            const duracion = project.duracion;
-
-            if (this.currentFilters.duracionDesde) {
-                if (!duracion || duracion < parseInt(this.currentFilters.duracionDesde)) {
-                    return false;
-                }
-            }
-
-            if (this.currentFilters.duracionHasta) {
-                if (!duracion || duracion > parseInt(this.currentFilters.duracionHasta)) {
-                    return false;
-                }
-            }
-        }
-
-        // Filtros de fecha de factura
-        if (this.currentFilters.fechaFacturaDesde || this.currentFilters.fechaFacturaHasta) {
-            const fechaFactura = project.fecha_factura ? new Date(project.fecha_factura) : null;
-
-            if (this.currentFilters.fechaFacturaDesde) {
-                const fechaDesde = new Date(this.currentFilters.fechaFacturaDesde);
-                if (!fechaFactura || fechaFactura < fechaDesde) {
-                    return false;
-                }
-            }
-
-            if (this.currentFilters.fechaFacturaHasta) {
-                const fechaHasta = new Date(this.currentFilters.fechaFacturaHasta);
-                if (!fechaFactura || fechaFactura > fechaHasta) {
-                    return false;
-                }
-            }
-        }
-
-        // Filtros de monto
-        if (this.currentFilters.montoDesde || this.currentFilters.montoHasta) {
-            const monto = parseFloat(project.monto) || 0;
-            
-            if (this.currentFilters.montoDesde) {
-                const montoDesde = parseFloat(this.currentFilters.montoDesde);
-                if (monto < montoDesde) {
-                    return false;
-                }
-            }
-            
-            if (this.currentFilters.montoHasta) {
-                const montoHasta = parseFloat(this.currentFilters.montoHasta);
-                if (monto > montoHasta) {
-                    return false;
-                }
-            }
-        }
-
-        // Filtro por tipo de cliente
-        if (this.currentFilters.tipoCliente && project.tipo_cliente !== this.currentFilters.tipoCliente) {
-            return false;
-        }
-
-        // Filtro por tipo de obra
-        if (this.currentFilters.tipoObra && project.tipo_obra_lista !== this.currentFilters.tipoObra) {
-            return false;
-        }
-
-        // Filtros de superficie de terreno
-        if (this.currentFilters.superficieTerrenoDesde || this.currentFilters.superficieTerrenoHasta) {
-            const superficie = parseFloat(project.superficie_terreno) || 0;
-
-            if (this.currentFilters.superficieTerrenoDesde) {
-                const superficieDesde = parseFloat(this.currentFilters.superficieTerrenoDesde);
-                if (superficie < superficieDesde) {
-                    return false;
-                }
-            }
-
-            if (this.currentFilters.superficieTerrenoHasta) {
-                const superficieHasta = parseFloat(this.currentFilters.superficieTerrenoHasta);
-                if (superficie > superficieHasta) {
-                    return false;
+    async applyFiltersAndDisplay() {
+        // Los filtros y la búsqueda general se evalúan en el servidor; solo se
+        // vuelve a consultar cuando cambian
+        const params = dataManager.buildFilterParams(this.currentFilters);
+        const filterKey = params.toString();
+
+        if (filterKey !== this.serverFilterKey) {
+            const requestId = ++this.filterRequestId;
+            let projects = this.allProjects;
+            let stats = null;
+
+            if (filterKey) {
+                try {
+                    [projects, stats] = await Promise.all([
+                        dataManager.getAdvancedFilteredRecords(this.currentFilters),
+                        dataManager.getStatistics(params)
+                    ]);
+                } catch (error) {
+                    console.error('❌ Error aplicando filtros:', error);
+                    UIComponents.showNotification(error.message || 'Error aplicando filtros', 'error');
+                    projects = [];
                 }
             }
-        }
-
-        // Filtro por EMS
-        if (this.currentFilters.ems) {
-            const emsValue = this.currentFilters.ems === 'true';
-            if (project.ems !== emsValue) {
-                return false;
-            }
-        }
 
-        // Filtro por Topografía
-        if (this.currentFilters.topografia) {
-            const topografiaValue = this.currentFilters.topografia === 'true';
-            if (project.topografia !== topografiaValue) {
-                return false;
-            }
-        }
-
-        // Filtro por Sondaje
-        if (this.currentFilters.sondaje) {
-            const sondajeValue = this.currentFilters.sondaje === 'true';
-            if (project.sondaje !== sondajeValue) {
-                return false;
-            }
-        }
+            // Descartar respuestas de filtros que ya fueron reemplazados
+            if (requestId !== this.filterRequestId) return;
 
-        // Filtro por Certificado de Experiencia
-        if (this.currentFilters.certificadoExperiencia) {
-            const certificadoValue = this.currentFilters.certificadoExperiencia === 'true';
-            if (project.certificado_experiencia !== certificadoValue) {
-                return false;
-            }
+            this.serverFilteredProjects = projects;
+            this.serverStats = stats;
+            this.serverFilterKey = filterKey;
         }
 
-        // Filtros de información del cliente
-        if (this.currentFilters.rutCliente && project.rut_cliente) {
-            if (!project.rut_cliente.toLowerCase().includes(this.currentFilters.rutCliente.toLowerCase())) {
-                return false;
-            }
-        }
+        this.filteredProjects = this.serverFilteredProjects;
 
-        if (this.currentFilters.personaContacto && project.persona_contacto) {
-            if (!project.persona_contacto.toLowerCase().includes(this.currentFilters.personaContacto.toLowerCase())) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.telefonoContacto && project.telefono_contacto) {
-            if (!project.telefono_contacto.toLowerCase().includes(this.currentFilters.telefonoContacto.toLowerCase())) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.correoContacto && project.correo_contacto) {
-            if (!project.correo_contacto.toLowerCase().includes(this.currentFilters.correoContacto.toLowerCase())) {
-                return false;
-            }
-        }
-
-        // Filtros de superficie construida
-        if (this.currentFilters.superficieConstruidaDesde || this.currentFilters.superficieConstruidaHasta) {
-            const superficie = parseFloat(project.superficie_construida) || 0;
-
-            if (this.currentFilters.superficieConstruidaDesde) {
-                const superficieDesde = parseFloat(this.currentFilters.superficieConstruidaDesde);
-                if (superficie < superficieDesde) {
-                    return false;
-                }
-            }
-
-            if (this.currentFilters.superficieConstruidaHasta) {
-                const superficieHasta = parseFloat(this.currentFilters.superficieConstruidaHasta);
-                if (superficie > superficieHasta) {
-                    return false;
-                }
-            }
-        }
-
-        // Filtros de estudios adicionales
-        if (this.currentFilters.estudioSismico) {
-            const estudioValue = this.currentFilters.estudioSismico === 'true';
-            if (project.estudio_sismico !== estudioValue) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.estudioGeoelectrico) {
-            const estudioValue = this.currentFilters.estudioGeoelectrico === 'true';
-            if (project.estudio_geoelectrico !== estudioValue) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.hidraulicaHidrologia) {
-            const hidraulicaValue = this.currentFilters.hidraulicaHidrologia === 'true';
-            if (project.hidraulica_hidrologia !== hidraulicaValue) {
-                return false;
-            }
-        }
-
-        // Filtros de documentos
-        if (this.currentFilters.ordenCompra) {
-            const ordenValue = this.currentFilters.ordenCompra === 'true';
-            if (project.orden_compra !== ordenValue) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.contratoDoc) {
-            const contratoValue = this.currentFilters.contratoDoc === 'true';
-            if (project.contrato_doc !== contratoValue) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.factura) {
-            const facturaValue = this.currentFilters.factura === 'true';
-            if (project.factura !== facturaValue) {
-                return false;
-            }
-        }
-
-        // Filtros de texto adicionales
-        if (this.currentFilters.descripcion && project.descripcion) {
-            if (!project.descripcion.toLowerCase().includes(this.currentFilters.descripcion.toLowerCase())) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.numeroFactura && project.numero_factura) {
-            if (!project.numero_factura.toLowerCase().includes(this.currentFilters.numeroFactura.toLowerCase())) {
-                return false;
-            }
-        }
-
-        if (this.currentFilters.numeroOrdenCompra && project.numero_orden_compra) {
-            if (!project.numero_orden_compra.toLowerCase().includes(this.currentFilters.numeroOrdenCompra.toLowerCase())) {
-                return false;
-            }
-        }
-
-        return true;
-    }
-
-    searchBooleanFields(project, searchTerm) {
-        // Mapear términos de búsqueda a valores booleanos
-        const booleanTerms = {
-            'sí': true,
-            'si': true,
-            'yes': true,
-            'true': true,
-            'verdadero': true,
-            'activo': true,
-            'no': false,
-            'false': false,
-            'falso': false,
-            'inactivo': false
-        };
-
-        const booleanValue = booleanTerms[searchTerm];
-        if (booleanValue !== undefined) {
-            // Lista de campos booleanos para buscar
-            const booleanFields = [
-                'ems', 'estudio_sismico', 'estudio_geoelectrico', 'topografia',
-                'sondaje', 'hidraulica_hidrologia', 'certificado_experiencia',
-                'orden_compra', 'contrato_doc', 'factura'
-            ];
-
-            return booleanFields.some(field => project[field] === booleanValue);
-        }
-
-        return false;
+        console.log('📊 Proyectos filtrados:', this.filteredProjects.length, 'de', this.allProjects.length);
+        this.displayProjects();
+        this.updateStatistics();
     }
 
     displayProjects() {
@@ -721,8 +400,10 @@ class MainPage {
             filteredCount.textContent = this.filteredProjects.length.toLocaleString();
         }
 
-        // Calcular estadísticas adicionales
-        const totalMonto = this.filteredProjects.reduce((sum, project) => sum + (parseFloat(project.monto) || 0), 0);
+        // Con filtros activos, las estadísticas vienen del servidor
+        const totalMonto = this.serverStats
+            ? this.serverStats.total_amount || 0
+            : this.filteredProjects.reduce((sum, project) => sum + (parseFloat(project.monto) || 0), 0);
         const totalMontoElement = document.getElementById('totalMonto');
         if (totalMontoElement) {
             totalMontoElement.textContent = '$' + this.formatNumber(totalMonto);
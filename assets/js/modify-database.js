@@ -69,6 +69,10 @@ class ModifyDatabasePage {
     }
 
     setupEventListeners() {
+        // Sugerencias de valores existentes en el formulario
+        UIComponents.setupSuggestions('recordCliente', 'cliente');
+        UIComponents.setupSuggestions('recordCiudad', 'ciudad');
+
         // Navigation
         const backToMainBtn = document.getElementById('backToMainBtn');
         if (backToMainBtn) {
@@ -394,9 +398,9 @@ class ModifyDatabasePage {
             return false;
         }
 
-        // Validar tamaño del archivo (máximo 5MB)
-        if (file.size > 5 * 1024 * 1024) {
-            UIComponents.showNotification('El archivo es demasiado grande. Máximo 5MB permitido.', 'error');
+        // Validar tamaño del archivo (máximo 200MB; el servidor lo procesa por streaming)
+        if (file.size > 200 * 1024 * 1024) {
+            UIComponents.showNotification('El archivo es demasiado grande. Máximo 200MB permitido.', 'error');
             return false;
         }
 
@@ -406,32 +410,54 @@ class ModifyDatabasePage {
 
     async uploadFile(file) {
         try {
-            UIComponents.showLoading('Procesando archivo CSV...');
+            UIComponents.showLoading('Importando archivo CSV...');
 
             // Validar que sea un archivo CSV
             if (!file.name.toLowerCase().endsWith('.csv')) {
                 throw new Error('Por favor selecciona un archivo CSV válido');
             }
 
-            // Leer el contenido del archivo
-            const fileContent = await this.readFileContent(file);
-
-            // Parsear el CSV
-            const csvData = this.parseCSV(fileContent);
-
-            if (csvData.length === 0) {
-                throw new Error('El archivo CSV está vacío o no tiene datos válidos');
-            }
-
-            // Convertir datos CSV a formato de proyecto
-            const proyectos = this.convertCSVToProjects(csvData);
-
-            if (proyectos.length === 0) {
-                throw new Error('No se encontraron proyectos válidos en el archivo CSV');
+            // El servidor parsea el archivo por streaming (comillas, saltos de línea,
+            // codificación y delimitador) e inserta en lotes
+            const options = this.getImportOptions();
+            if (options.mode === 'upsert') {
+                // Primero una simulación para confirmar cuántos proyectos cambiarían
+                const preview = await dataManager.importCSV(file, {
+                    ...options, dryRun: true, onProgress: job => this.showJobProgress(job, 'Comparando')
+                });
+                this.hideJobProgress();
+                UIComponents.hideLoading();
+                const proceed = await UIComponents.confirm(
+                    `Se crearán ${preview.new} proyectos, se actualizarán ${preview.changed} ` +
+                    `y ${preview.unchanged} no tienen cambios (${preview.skipped} filas omitidas). ¿Continuar?`);
+                if (!proceed) return;
+                UIComponents.showLoading('Actualizando proyectos...');
+            } else {
+                // Validación completa sin escribir: si hay filas con errores se muestran antes de importar
+                const report = await dataManager.importCSV(file, {
+                    ...options, dryRun: true, onProgress: job => this.showJobProgress(job, 'Validando')
+                });
+                this.hideJobProgress();
+                if (report.invalid > 0 || report.duplicates > 0) {
+                    UIComponents.hideLoading();
+                    console.warn('Errores de validación por fila:', report.errors);
+                    const examples = report.errors.slice(0, 5)
+                        .map(error => `Fila ${error.row} (${error.field}): ${error.error}`).join('\n');
+                    const duplicateNote = report.duplicates > 0
+                        ? `${report.duplicates} filas duplicadas (${this.describeDuplicatePolicy(options.duplicates)}).\n`
+                        : '';
+                    const proceed = await UIComponents.confirm(
+                        `${report.invalid} de ${report.rows} filas tienen errores y se omitirán.\n${duplicateNote}` +
+                        `${examples}\n\n¿Importar las ${report.valid} filas válidas?`);
+                    if (!proceed) return;
+                    UIComponents.showLoading('Importando archivo CSV...');
+                }
             }
-
-            // Importar los datos
-            const importedCount = await dataManager.importData(proyectos);
+            // La importación corre como trabajo en segundo plano; se muestra su progreso
+            const summary = await dataManager.importCSV(file, {
+                ...options, onProgress: job => this.showJobProgress(job, 'Importando')
+            });
+            this.hideJobProgress();
 
             // Refresh table
             await this.loadExistingRecords();
@@ -449,184 +475,76 @@ class ModifyDatabasePage {
             this.clearForm();
 
             UIComponents.hideLoading();
-            UIComponents.showNotification(`¡Importados ${importedCount} proyectos exitosamente!`, 'success');
+            if (summary.resumed_rows) {
+                // Reintento del mismo archivo: se retomó desde el último lote confirmado
+                console.info(`Importación retomada desde la fila ${summary.resumed_rows + 1}`);
+            }
+            if (summary.skipped > 0 || summary.failed > 0) {
+                console.warn('Filas omitidas o fallidas en la importación:', summary.errors);
+                UIComponents.showNotification(
+                    `Importados ${summary.imported} de ${summary.rows} proyectos ` +
+                    `(${summary.skipped} filas omitidas, ${summary.failed} fallidas)`, 'warning');
+            } else if (summary.overwritten > 0) {
+                UIComponents.showNotification(
+                    `Importados ${summary.imported} proyectos y ${summary.overwritten} existentes actualizados`, 'success');
+            } else {
+                UIComponents.showNotification(`¡Importados ${summary.imported} proyectos exitosamente!`, 'success');
+            }
 
         } catch (error) {
+            this.hideJobProgress();
             UIComponents.hideLoading();
             UIComponents.showNotification('Error procesando archivo: ' + error.message, 'error');
         }
     }
 
-    async readFileContent(file) {
-        // Lee el contenido del archivo como texto
-        return new Promise((resolve, reject) => {
-            const reader = new FileReader();
-            reader.onload = (e) => resolve(e.target.result);
-            reader.onerror = () => reject(new Error('Error leyendo el archivo'));
-            reader.readAsText(file, 'UTF-8');
-        });
-    }
-
-    parseCSV(csvContent) {
-        // Parsea el contenido CSV en un array de objetos
-        console.log('Contenido CSV a parsear:', csvContent.substring(0, 200) + '...');
-
-        const lines = csvContent.split('\n').filter(line => line.trim() !== '');
-        console.log(`Líneas encontradas: ${lines.length}`);
-
-        if (lines.length < 2) {
-            throw new Error('El archivo CSV debe tener al menos una línea de encabezados y una línea de datos');
-        }
-
-        // Obtener headers (primera línea)
-        const headers = lines[0].split(',').map(header => header.trim().replace(/"/g, ''));
-        console.log('Headers encontrados:', headers);
-
-        // Parsear datos (resto de líneas)
-        const data = [];
-        for (let i = 1; i < lines.length; i++) {
-            const line = lines[i].trim();
-            if (!line) continue; // Saltar líneas vacías
-
-            const values = this.parseCSVLine(line);
-            console.log(`Línea ${i}: "${line}" → ${values.length} valores, esperados: ${headers.length}`);
-
-            // Ser más flexible con el número de columnas
-            if (values.length >= headers.length - 2) { // Permitir algunas columnas faltantes
-                const row = {};
-                headers.forEach((header, index) => {
-                    row[header] = values[index] || ''; // Usar string vacío si falta el valor
-                });
-                data.push(row);
-                console.log(`Fila ${i} parseada:`, row);
-            } else {
-                console.warn(`Línea ${i} ignorada - muy pocas columnas: ${values.length} < ${headers.length - 2}`);
-            }
-        }
-
-        console.log(`Datos parseados: ${data.length} filas`);
-        return data;
-    }
-
-    parseCSVLine(line) {
-        // Parsea una línea CSV manejando comillas y comas dentro de campos
-        const result = [];
-        let current = '';
-        let inQuotes = false;
-
-        for (let i = 0; i < line.length; i++) {
-            const char = line[i];
-
-            if (char === '"') {
-                inQuotes = !inQuotes;
-            } else if (char === ',' && !inQuotes) {
-                // Limpiar comillas del inicio y final del campo
-                let cleanValue = current.trim();
-                if (cleanValue.startsWith('"') && cleanValue.endsWith('"')) {
-                    cleanValue = cleanValue.slice(1, -1);
+    showJobProgress(job, action) {
+        // Texto del overlay: filas procesadas, ritmo y tiempo restante estimado
+        const progress = job.progress || {};
+        let message = `${action}... ${(progress.rows_parsed || 0).toLocaleString('es-CL')} filas`;
+        if (progress.percent != null) message += ` (${progress.percent}%)`;
+        if (progress.rows_per_second) message += `, ${Math.round(progress.rows_per_second).toLocaleString('es-CL')} filas/s`;
+        if (progress.eta_seconds != null) message += `, ~${Math.ceil(progress.eta_seconds)} s restantes`;
+        if (job.status === 'queued') message = 'En cola, esperando otra importación...';
+        UIComponents.showLoading(message);
+
+        const cancelBtn = document.getElementById('cancelJobBtn');
+        if (cancelBtn) {
+            cancelBtn.style.display = '';
+            cancelBtn.onclick = async () => {
+                cancelBtn.disabled = true;
+                try {
+                    await dataManager.cancelJob(job.id);
+                } catch (error) {
+                    console.warn('No se pudo cancelar el trabajo:', error);
                 }
-                result.push(cleanValue);
-                current = '';
-            } else {
-                current += char;
-            }
+            };
         }
+    }
 
-        // Procesar el último campo
-        let cleanValue = current.trim();
-        if (cleanValue.startsWith('"') && cleanValue.endsWith('"')) {
-            cleanValue = cleanValue.slice(1, -1);
+    hideJobProgress() {
+        const cancelBtn = document.getElementById('cancelJobBtn');
+        if (cancelBtn) {
+            cancelBtn.style.display = 'none';
+            cancelBtn.disabled = false;
+            cancelBtn.onclick = null;
         }
-        result.push(cleanValue);
-
-        console.log('Línea parseada:', line, '→', result);
-        return result;
     }
 
-    convertCSVToProjects(csvData) {
-        // Convierte los datos CSV al formato de proyecto
-        console.log('Datos CSV recibidos:', csvData);
-        const proyectos = [];
-
-        for (const row of csvData) {
-            try {
-                console.log('Procesando fila:', row);
-
-                // Mapear campos CSV a campos de proyecto
-                // Soportar diferentes variaciones de nombres de columnas
-                const idValue = this.getCSVValue(row, ['id', 'ID', 'Id']);
-
-                // Obtener valores de fecha antes de parsear
-                const fechaInicioRaw = this.getCSVValue(row, ['fecha_inicio', 'Fecha_Inicio', 'fecha inicio', 'start_date', 'Start Date']);
-                const fechaTerminoRaw = this.getCSVValue(row, ['fecha_termino', 'fecha_término', 'Fecha_Termino', 'Fecha_Término', 'fecha termino', 'end_date', 'End Date']);
-                const fechaFacturaRaw = this.getCSVValue(row, ['fecha_factura', 'Fecha_Factura', 'fecha factura', 'invoice_date', 'Invoice Date']);
-
-                console.log(`Proyecto ID ${idValue}: fecha_inicio raw = "${fechaInicioRaw}", fecha_termino raw = "${fechaTerminoRaw}", fecha_factura raw = "${fechaFacturaRaw}"`);
-
-                const proyecto = {
-                    id: idValue ? parseInt(idValue) : null,
-                    contrato: this.getCSVValue(row, ['contrato', 'Contrato', 'contract', 'Contract']),
-                    cliente: this.getCSVValue(row, ['cliente', 'Cliente', 'client', 'Client']),
-                    fecha_inicio: this.parseDate(fechaInicioRaw),
-                    fecha_termino: this.parseDate(fechaTerminoRaw),
-                    duracion: this.parseNumeric(this.getCSVValue(row, ['duracion', 'duración', 'Duracion', 'Duración', 'duration', 'Duration'])),
-                    region: this.getCSVValue(row, ['region', 'Region', 'región', 'Región']),
-                    ciudad: this.getCSVValue(row, ['ciudad', 'Ciudad', 'city', 'City']),
-                    estado: this.mapEstado(this.getCSVValue(row, ['estado', 'Estado', 'status', 'Status'])),
-                    monto: this.parseMonto(this.getCSVValue(row, ['monto', 'Monto', 'amount', 'Amount'])),
-                    // Información del cliente
-                    rut_cliente: this.getCSVValue(row, ['RUT_cliente', 'rut_cliente', 'RUT Cliente', 'RUT']),
-                    tipo_cliente: this.getCSVValue(row, ['Tipo_cliente', 'tipo_cliente', 'Tipo Cliente', 'Tipo']),
-                    persona_contacto: this.getCSVValue(row, ['Persona_contacto', 'persona_contacto', 'Persona Contacto', 'Contacto']),
-                    telefono_contacto: this.getCSVValue(row, ['Telefono_contacto', 'telefono_contacto', 'Teléfono Contacto', 'Teléfono']),
-                    correo_contacto: this.getCSVValue(row, ['Correo_contacto', 'correo_contacto', 'Correo Contacto', 'Email']),
-                    // Información técnica
-                    superficie_terreno: this.parseFloat(this.getCSVValue(row, ['Superficie_terreno', 'superficie_terreno', 'Superficie Terreno'])),
-                    superficie_construida: this.parseFloat(this.getCSVValue(row, ['Superficie_construida', 'superficie_construida', 'Superficie Construida'])),
-                    tipo_obra_lista: this.getCSVValue(row, ['Tipo_obra_lista', 'tipo_obra_lista', 'Tipo Obra Lista', 'Tipo Obra']),
-                    // Estudios y servicios
-                    ems: this.parseBoolean(this.getCSVValue(row, ['EMS', 'ems'])),
-                    estudio_sismico: this.parseBoolean(this.getCSVValue(row, ['Estudio_sismico', 'estudio_sismico', 'Estudio Sísmico'])),
-                    estudio_geoelectrico: this.parseBoolean(this.getCSVValue(row, ['Estudio_Geoeléctrico', 'estudio_geoelectrico', 'Estudio Geoeléctrico'])),
-                    topografia: this.parseBoolean(this.getCSVValue(row, ['Topografía', 'topografia', 'Topografia'])),
-                    sondaje: this.parseBoolean(this.getCSVValue(row, ['Sondaje', 'sondaje'])),
-                    hidraulica_hidrologia: this.parseBoolean(this.getCSVValue(row, ['Hidráulica/Hidrología', 'hidraulica_hidrologia', 'Hidráulica', 'Hidrología'])),
-                    descripcion: this.getCSVValue(row, ['Descripción', 'descripcion', 'Descripcion']),
-                    certificado_experiencia: this.parseBoolean(this.getCSVValue(row, ['Certificado_experiencia', 'certificado_experiencia', 'Certificado Experiencia'])),
-                    orden_compra: this.parseBoolean(this.getCSVValue(row, ['Orden_compra', 'orden_compra', 'Orden Compra'])),
-                    contrato_doc: this.parseBoolean(this.getCSVValue(row, ['Contrato_existe', 'contrato_existe', 'Contrato Existe', 'Contrato'])),
-                    factura: this.parseBoolean(this.getCSVValue(row, ['Factura', 'factura'])),
-                    fecha_factura: this.parseDate(fechaFacturaRaw),
-                    numero_factura: this.getCSVValue(row, ['Numero_factura', 'numero_factura', 'Número Factura']),
-                    numero_orden_compra: this.getCSVValue(row, ['Numero_orden_compra', 'numero_orden_compra', 'Número Orden Compra']),
-                    link_documentos: this.getCSVValue(row, ['Link_documentos', 'link_documentos', 'Link Documentos'])
-                };
-
-                console.log(`Proyecto ID ${idValue}: fecha_inicio parseada = "${proyecto.fecha_inicio}", fecha_termino parseada = "${proyecto.fecha_termino}"`);
-
-                console.log('Proyecto mapeado:', proyecto);
-
-                // Validar que al menos el contrato esté presente (ser más flexible)
-                if (proyecto.contrato && proyecto.contrato.trim() !== '') {
-                    // Asignar valores por defecto para campos vacíos (excepto fecha_inicio)
-                    if (!proyecto.cliente) proyecto.cliente = 'Cliente no especificado';
-                    if (!proyecto.region) proyecto.region = 'Región no especificada';
-                    if (!proyecto.ciudad) proyecto.ciudad = 'Ciudad no especificada';
-                    if (!proyecto.estado) proyecto.estado = 'Activo';
-                    // NO asignar fecha por defecto aquí - dejar que el servidor lo maneje
-
-                    proyectos.push(proyecto);
-                    console.log('Proyecto válido agregado:', proyecto);
-                } else {
-                    console.warn('Proyecto inválido - falta contrato:', proyecto);
-                }
-            } catch (error) {
-                console.warn('Error procesando fila CSV:', row, error);
-            }
-        }
+    getImportOptions() {
+        // Modo de importación elegido: "insert", "upsert:id" o "upsert:contrato_rut"
+        const select = document.getElementById('importMode');
+        const [mode, key] = (select ? select.value : 'insert').split(':');
+        if (key) return { mode, key };
+        // Qué hacer con filas cuyo id, contrato o número de factura ya existe
+        const duplicates = document.getElementById('duplicatePolicy');
+        return { mode, duplicates: duplicates ? duplicates.value : 'skip' };
+    }
 
-        console.log(`Proyectos válidos encontrados: ${proyectos.length}`);
-        return proyectos;
+    describeDuplicatePolicy(policy) {
+        if (policy === 'overwrite') return 'se actualizarán los proyectos existentes';
+        if (policy === 'report') return 'se importarán igual';
+        return 'se omitirán';
     }
 
     clearForm() {
@@ -638,184 +556,6 @@ class ModifyDatabasePage {
         }
     }
 
-    getCSVValue(row, possibleKeys) {
-        // Busca un valor en el objeto row usando diferentes posibles nombres de clave
-        console.log('Buscando valor para claves:', possibleKeys, 'en fila:', Object.keys(row));
-
-        for (const key of possibleKeys) {
-            if (row[key] !== undefined && row[key] !== null && row[key] !== '') {
-                const value = row[key].toString().trim();
-
-                // Manejar valores NULL explícitos
-                if (value.toLowerCase() === 'null' || value === '') {
-                    continue;
-                }
-
-                console.log(`Encontrado ${key}: "${value}"`);
-                return value;
-            }
-        }
-
-        console.log('No se encontró valor para ninguna clave');
-        return '';
-    }
-
-    parseDate(dateString) {
-        // Parsea diferentes formatos de fecha
-        if (!dateString ||
-            dateString.toLowerCase() === 'null' ||
-            dateString.trim() === '' ||
-            dateString === '""' ||
-            dateString === "''" ||
-            dateString.length === 0) {
-            console.log('Fecha vacía o NULL:', `"${dateString}"`);
-            return null;
-        }
-
-        try {
-            console.log('Parseando fecha:', `"${dateString}"`);
-
-            const cleanDate = dateString.toString().trim();
-
-            // Detectar formato DD-MM-YYYY específicamente
-            const ddmmyyyyPattern = /^(\d{1,2})-(\d{1,2})-(\d{4})$/;
-            const ddmmyyyyMatch = cleanDate.match(ddmmyyyyPattern);
-
-            if (ddmmyyyyMatch) {
-                const [, day, month, year] = ddmmyyyyMatch;
-                const date = new Date(parseInt(year), parseInt(month) - 1, parseInt(day));
-
-                if (!isNaN(date.getTime())) {
-                    const result = date.toISOString().split('T')[0];
-                    console.log(`✅ Fecha DD-MM-YYYY parseada: ${cleanDate} → ${result}`);
-                    return result;
-                }
-            }
-
-            // Detectar formato YYYY-MM-DD
-            const yyyymmddPattern = /^(\d{4})-(\d{1,2})-(\d{1,2})$/;
-            const yyyymmddMatch = cleanDate.match(yyyymmddPattern);
-
-            if (yyyymmddMatch) {
-                const date = new Date(cleanDate);
-                if (!isNaN(date.getTime())) {
-                    const result = date.toISOString().split('T')[0];
-                    console.log(`✅ Fecha YYYY-MM-DD parseada: ${cleanDate} → ${result}`);
-                    return result;
-                }
-            }
-
-            // Detectar formato DD/MM/YYYY
-            const ddmmyyyySlashPattern = /^(\d{1,2})\/(\d{1,2})\/(\d{4})$/;
-            const ddmmyyyySlashMatch = cleanDate.match(ddmmyyyySlashPattern);
-
-            if (ddmmyyyySlashMatch) {
-                const [, day, month, year] = ddmmyyyySlashMatch;
-                const date = new Date(parseInt(year), parseInt(month) - 1, parseInt(day));
-
-                if (!isNaN(date.getTime())) {
-                    const result = date.toISOString().split('T')[0];
-                    console.log(`✅ Fecha DD/MM/YYYY parseada: ${cleanDate} → ${result}`);
-                    return result;
-                }
-            }
-
-            console.warn(`❌ Formato de fecha no reconocido: "${cleanDate}"`);
-
-        } catch (error) {
-            console.warn('❌ Error parseando fecha:', dateString, error);
-        }
-
-        console.log('❌ No se pudo parsear la fecha:', dateString);
-        return null;
-    }
-
-    mapEstado(estadoString) {
-        // Mapea diferentes variaciones de estado a los valores estándar
-        if (!estadoString) return 'Activo';
-
-        const estado = estadoString.toLowerCase().trim();
-
-        if (estado.includes('activ') || estado.includes('active')) return 'Activo';
-        if (estado.includes('complet') || estado.includes('finish') || estado.includes('done')) return 'Completado';
-        if (estado.includes('pend') || estado.includes('wait')) return 'Pendiente';
-
-        // Si no coincide, usar el valor original si es válido
-        const validStates = ['Activo', 'Completado', 'Pendiente'];
-        const capitalizedState = estadoString.charAt(0).toUpperCase() + estadoString.slice(1).toLowerCase();
-
-        return validStates.includes(capitalizedState) ? capitalizedState : 'Activo';
-    }
-
-    parseNumeric(numericString) {
-        // Parsea valores numéricos (enteros o decimales)
-        if (!numericString ||
-            numericString.toString().trim() === '' ||
-            numericString.toString().toLowerCase() === 'null' ||
-            numericString.toString().toLowerCase() === 'undefined') {
-            return null;
-        }
-
-        try {
-            const cleanValue = numericString.toString().replace(/[^\d.-]/g, '');
-            if (cleanValue === '' || cleanValue === '-') {
-                return null;
-            }
-            const parsed = parseFloat(cleanValue);
-            return isNaN(parsed) ? null : (cleanValue.includes('.') ? parsed : parseInt(cleanValue));
-        } catch (error) {
-            console.warn('Error parsing numeric value:', numericString, error);
-            return null;
-        }
-    }
-
-    parseMonto(montoString) {
-        // Parsea diferentes formatos de monto
-        if (!montoString) return 0;
-
-        try {
-            // Remover símbolos de moneda y espacios
-            const cleanMonto = montoString.toString()
-                .replace(/[$\s]/g, '')
-                .replace(/[.,](\d{3})/g, '$1') // Remover separadores de miles
-                .replace(/,/g, '.'); // Convertir coma decimal a punto
-
-            const parsed = parseFloat(cleanMonto);
-            return isNaN(parsed) ? 0 : Math.abs(parsed);
-        } catch (error) {
-            console.warn('Error parseando monto:', montoString, error);
-            return 0;
-        }
-    }
-
-    parseBoolean(value) {
-        // Parsea valores booleanos desde CSV
-        if (typeof value === 'boolean') return value;
-        if (!value || value === '') return false;
-
-        const lowerValue = value.toString().toLowerCase().trim();
-        return lowerValue === 'true' || lowerValue === 'sí' || lowerValue === 'si' ||
-               lowerValue === '1' || lowerValue === 'yes' || lowerValue === 'y';
-    }
-
-    parseFloat(value) {
-        // Parsea valores flotantes desde CSV
-        if (!value || value === '' || value === 'NULL' || value === 'null') return null;
-
-        try {
-            // Limpiar el valor (remover espacios, comas como separadores de miles)
-            const cleanValue = value.toString()
-                .replace(/\s/g, '')
-                .replace(/,/g, ''); // Asumir que las comas son separadores de miles
-
-            const parsed = parseFloat(cleanValue);
-            return isNaN(parsed) ? null : parsed;
-        } catch (error) {
-            console.warn('Error parseando float:', value, error);
-            return null;
-        }
-    }
-
     async loadExistingRecords() {
         try {
             const data = await dataManager.getAllRecords();
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de la conversión de filas CSV a proyectos
+Compara la conversión anterior (fila por fila, probando formatos de fecha con
+strptime) con ImportPlan (formatos inferidos una vez, conversión por columnas)
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.importacion import ImportPlan, normalize_column_name
+from models.proyecto import Proyecto
+
+ENCABEZADO = ['ID', 'Contrato', 'Cliente', 'Fecha_Inicio', 'Fecha_Término', 'Duración', 'Región', 'Ciudad',
+              'Estado', 'Monto', 'RUT_cliente', 'Superficie_terreno', 'EMS', 'Topografía', 'Factura',
+              'Fecha_factura', 'Descripción']
+
+def generar_filas(cantidad):
+    """Genera filas como las de un CSV exportado desde Excel (fechas DD-MM-YYYY)"""
+    base = datetime(2015, 1, 1)
+    filas = []
+    for i in range(cantidad):
+        inicio = base + timedelta(days=random.randint(0, 3000))
+        filas.append([
+            str(1001 + i),
+            f'Estudio de mecánica de suelos {i}',
+            random.choice(['Municipalidad de Arica', 'Constructora Norte', 'Inmobiliaria Sur']),
+            inicio.strftime('%d-%m-%Y'),
+            (inicio + timedelta(days=90)).strftime('%d-%m-%Y'),
+            '90',
+            random.choice(['Arica y Parinacota', 'Tarapacá', 'Valparaíso']),
+            random.choice(['Arica', 'Iquique', 'Viña del Mar']),
+            random.choice(['Activo', 'Completado', 'Pendiente']),
+            str(random.randint(100000, 50000000)),
+            '76.123.456-7',
+            f'{random.uniform(100, 5000):.1f}',
+            random.choice(['Sí', 'No']),
+            random.choice(['Sí', 'No']),
+            random.choice(['Sí', 'No']),
+            '',
+            'Descripción del proyecto',
+        ])
+    return filas
+
+# ===== Conversión anterior (copia de bulk_import_proyectos antes del cambio) =====
+
+def _normalizar_anterior(nombre):
+    mapping = {'id': 'id', 'contrato': 'contrato', 'cliente': 'cliente', 'fecha_inicio': 'fecha_inicio',
+               'fecha_término': 'fecha_termino', 'duración': 'duracion', 'región': 'region',
+               'ciudad': 'ciudad', 'estado': 'estado', 'monto': 'monto', 'rut_cliente': 'rut_cliente',
+               'superficie_terreno': 'superficie_terreno', 'ems': 'ems', 'topografía': 'topografia',
+               'factura': 'factura', 'fecha_factura': 'fecha_factura', 'descripción': 'descripcion'}
+    normalizado = nombre.lower().strip()
+    return mapping.get(normalizado, normalizado)
+
+def _booleano_anterior(valor):
+    return isinstance(valor, str) and valor.lower().strip() in ['true', '1', 'sí', 'si', 'yes', 'verdadero']
+
+def _numero_anterior(valor, default=None):
+    if not valor or str(valor).strip() == '' or str(valor).lower() == 'null':
+        return default
+    try:
+        return float(valor) if '.' in str(valor) else int(valor)
+    except (ValueError, TypeError):
+        return default
+
+def camino_anterior(filas):
+    proyectos = []
+    for fila in filas:
+        item = {_normalizar_anterior(k): v for k, v in zip(ENCABEZADO, fila)}
+
+        def parse_date(date_str):
+            if not date_str or str(date_str).strip() == '' or str(date_str).lower() == 'null':
+                return None
+            for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y', '%Y/%m/%d']:
+                try:
+                    return datetime.strptime(str(date_str).strip(), fmt)
+                except ValueError:
+                    continue
+            return None
+
+        proyectos.append(Proyecto(
+            id=item.get('id'),
+            contrato=item.get('contrato', ''),
+            cliente=item.get('cliente', ''),
+            fecha_inicio=parse_date(item.get('fecha_inicio')),
+            fecha_termino=parse_date(item.get('fecha_termino')),
+            duracion=int(item.get('duracion')) if item.get('duracion') else None,
+            region=item.get('region', ''),
+            ciudad=item.get('ciudad', ''),
+            estado=item.get('estado', 'Activo'),
+            monto=_numero_anterior(item.get('monto'), 0),
+            rut_cliente=item.get('rut_cliente', ''),
+            superficie_terreno=_numero_anterior(item.get('superficie_terreno')),
+            ems=_booleano_anterior(item.get('ems', False)),
+            topografia=_booleano_anterior(item.get('topografia', False)),
+            factura=_booleano_anterior(item.get('factura', False)),
+            fecha_factura=parse_date(item.get('fecha_factura')),
+            descripcion=item.get('descripcion', ''),
+        ))
+    return proyectos
+
+def camino_por_columnas(filas, lote=1000):
+    columnas = [normalize_column_name(nombre) for nombre in ENCABEZADO]
+    plan = ImportPlan.compile(columnas, filas[:lote])
+    proyectos = []
+    for inicio in range(0, len(filas), lote):
+        registros, _ = plan.convert_batch(filas[inicio:inicio + lote], inicio + 2)
+        proyectos.extend(Proyecto(**registro) for registro in registros)
+    return proyectos
+
+def medir(nombre, funcion, filas, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(filas)
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"{nombre:<35} {mejor * 1000:9.1f} ms  ({len(filas) / mejor:,.0f} filas/s)")
+    return mejor
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    filas = generar_filas(cantidad)
+    print(f"📊 {cantidad} filas, {len(ENCABEZADO)} columnas")
+
+    # Ambos caminos deben producir las mismas fechas
+    assert [p.fecha_inicio for p in camino_anterior(filas[:100])] == \
+           [p.fecha_inicio for p in camino_por_columnas(filas[:100])]
+
+    anterior = medir('fila por fila (strptime)', camino_anterior, filas)
+    columnas = medir('ImportPlan por columnas', camino_por_columnas, filas)
+    print(f"⚡ Aceleración: {anterior / columnas:.1f}x")
+
+if __name__ == "__main__":
+    main()
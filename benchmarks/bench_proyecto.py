@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark de hidratación y memoria del modelo Proyecto
+Compara Proyecto (__slots__ + métodos generados) con un objeto equivalente con __dict__
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.proyecto import Proyecto, PROYECTO_SCHEMA
+from benchmarks.bench_serializer import generar_documentos
+
+def hidratar_con_dict(doc):
+    """Referencia: un objeto con __dict__ construido campo por campo con .get()"""
+    return SimpleNamespace(**{name: doc.get(name, default) for name, default in PROYECTO_SCHEMA})
+
+def medir(nombre, funcion, docs):
+    gc.collect()
+    inicio = time.perf_counter()
+    objetos = [funcion(doc) for doc in docs]
+    duracion = time.perf_counter() - inicio
+    del objetos
+    gc.collect()
+
+    tracemalloc.start()
+    objetos = [funcion(doc) for doc in docs]
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{nombre:<30} {duracion * 1000:8.1f} ms  {memoria / len(docs):7.0f} B/objeto")
+    return objetos
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    docs = generar_documentos(cantidad)
+    print(f"📊 Hidratando {cantidad} documentos")
+
+    medir('Objeto con __dict__', hidratar_con_dict, docs)
+    proyectos = medir('Proyecto.from_dict (slots)', Proyecto.from_dict, docs)
+
+    inicio = time.perf_counter()
+    for proyecto in proyectos:
+        proyecto.to_dict()
+    print(f"{'Proyecto.to_dict':<30} {(time.perf_counter() - inicio) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
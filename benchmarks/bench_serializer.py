@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del serializador de proyectos
+Compara el camino actual (from_dict + to_json_serializable + json) con ProyectoEncoder
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.proyecto import Proyecto, get_encoder, orjson, _json_default
+
+def generar_documentos(cantidad):
+    """Genera documentos con la forma de los guardados en MongoDB"""
+    base = datetime(2015, 1, 1)
+    docs = []
+    for i in range(cantidad):
+        inicio = base + timedelta(days=random.randint(0, 3000))
+        docs.append({
+            '_id': ObjectId(),
+            'id': 1001 + i,
+            'contrato': f'Estudio de mecánica de suelos {i}',
+            'cliente': random.choice(['Municipalidad de Arica', 'Constructora Norte', 'Inmobiliaria Sur']),
+            'fecha_inicio': inicio,
+            'fecha_termino': inicio + timedelta(days=90),
+            'duracion': 90,
+            'region': random.choice(['Arica y Parinacota', 'Tarapacá', 'Valparaíso']),
+            'ciudad': random.choice(['Arica', 'Iquique', 'Viña del Mar']),
+            'estado': random.choice(['Activo', 'Completado', 'Pendiente']),
+            'monto': round(random.uniform(1e5, 5e7), 2),
+            'rut_cliente': '76.123.456-7',
+            'tipo_cliente': 'Público',
+            'persona_contacto': 'Juan Pérez',
+            'telefono_contacto': '+56 9 1234 5678',
+            'correo_contacto': 'contacto@example.cl',
+            'superficie_terreno': 1200.5,
+            'superficie_construida': None,
+            'tipo_obra_lista': 'Edificación',
+            'ems': True,
+            'estudio_sismico': False,
+            'estudio_geoelectrico': False,
+            'topografia': True,
+            'sondaje': False,
+            'hidraulica_hidrologia': False,
+            'descripcion': 'Descripción del proyecto ' * 3,
+            'certificado_experiencia': False,
+            'orden_compra': True,
+            'contrato_doc': True,
+            'factura': False,
+            'fecha_factura': None,
+            'numero_factura': '',
+            'numero_orden_compra': f'OC-{i}',
+            'link_documentos': '',
+            'created_at': inicio,
+            'updated_at': inicio,
+        })
+    return docs
+
+def camino_actual(docs):
+    data = [Proyecto.from_dict(doc).to_json_serializable() for doc in docs]
+    return json.dumps(data, default=_json_default).encode('utf-8')
+
+def camino_rapido(docs):
+    return get_encoder().encode_many(docs)
+
+def medir(nombre, funcion, docs, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(docs)
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"{nombre:<35} {mejor * 1000:9.1f} ms  ({len(docs) / mejor:,.0f} docs/s)")
+    return mejor
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    docs = generar_documentos(cantidad)
+    print(f"📊 {cantidad} documentos, backend JSON: {'orjson' if orjson else 'json'}")
+
+    actual = medir('from_dict + to_json_serializable', camino_actual, docs)
+    rapido = medir('ProyectoEncoder.encode_many', camino_rapido, docs)
+    print(f"⚡ Aceleración: {actual / rapido:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,298 @@
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Iterable
+from datetime import datetime, timedelta
+import base64
+import copy
+import json
 import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from bson import ObjectId
-from pymongo.errors import PyMongoError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from db.conexion import get_collection, get_collection_for_user, test_mongodb_connection
-from models.proyecto import Proyecto, STATUS_OPTIONS, create_indexes, get_collection_stats
+from db.cache import QueryCache, make_cache_key
+from db.contadores import IdAllocator, DataVersion
+from db.eliminados import TombstoneLog
+from db.eventos import EventBus
+from db.puntos_control import ImportCheckpoints
+from models.busqueda import SearchIndex
+from models.clientes import ClientClusters
+from models.estadisticas import StatsSummary, STATS_PROJECTION
+from models.sugerencias import SuggestionIndex, SUGGEST_FIELDS
+from models.proyecto import (Proyecto, STATUS_OPTIONS, SORTABLE_FIELDS, SERVICE_FLAGS, create_indexes,
+                             get_collection_stats, build_projection, serialize_document, add_derived_fields,
+                             DERIVED_FIELDS, compact_rut, normalize_rut)
 
 logger = logging.getLogger(__name__)
 
+# Tamaño máximo de página permitido en la paginación por cursor
+MAX_PAGE_SIZE = 500
+
+# Campos de la imagen previa de un documento que necesitan las estructuras derivadas
+PREVIOUS_IMAGE_PROJECTION = {"id": 1, **STATS_PROJECTION, **{field: 1 for field in SUGGEST_FIELDS}}
+
+# Margen restado al cursor de cambios para cubrir escrituras en curso y desfase de relojes
+CHANGES_CURSOR_MARGIN = timedelta(seconds=5)
+
+# Sobre esta cantidad de cambios es más barato que el cliente recargue todo
+MAX_CHANGES = 5000
+
+# Sobre esta cantidad de documentos en una escritura se publica un solo evento `reset`
+MAX_EVENTS_PER_WRITE = 100
+
+# Documentos por insert_many en la inserción masiva y bloques insertados en paralelo
+BULK_CHUNK_SIZE = 500
+BULK_WORKERS = 4
+
+# Claves por las que se puede actualizar en una importación (upsert); el RUT se compara normalizado
+UPSERT_KEYS = {"id": ("id",), "contrato_rut": ("contrato", "rut_normalizado")}
+
+# Marca de los registros sin ID en la clave `id` (no choca con ningún valor real de la clave)
+_NEW_RECORD = object()
+
+# Diferencias de ejemplo que se incluyen en el resumen de un upsert
+MAX_DIFF_SAMPLES = 20
+
+def upsert_key(doc: Dict[str, Any], key_fields) -> tuple:
+    """Valor de la clave de upsert de un documento (texto vacío y None son equivalentes).
+
+    rut_normalizado se calcula desde rut_cliente: "76.123.456-7" y "761234567"
+    son la misma clave, y un RUT inválido cuenta como vacío.
+    """
+    values = []
+    for field in key_fields:
+        if field == "id":
+            values.append(doc.get(field))
+        elif field == "rut_normalizado":
+            values.append(normalize_rut(doc.get("rut_cliente")) or "")
+        else:
+            values.append(doc.get(field) or "")
+    return tuple(values)
+
+def is_duplicate_id_error(error: Dict[str, Any]) -> bool:
+    """True si un writeError es por _id duplicado (y no por otro índice único)"""
+    if error.get("code") != 11000:
+        return False
+    key_pattern = error.get("keyPattern")
+    if key_pattern is not None:
+        return list(key_pattern) == ["_id"]
+    return "index: _id_ " in (error.get("errmsg") or "")
+
+def change_event(doc: Dict[str, Any], fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Datos de un evento de cambio: _id, id y los campos cambiados (sin campos derivados)"""
+    event = {"_id": str(doc.get("_id")), "id": doc.get("id")}
+    if fields is not None:
+        event["fields"] = {k: v for k, v in fields.items() if k not in DERIVED_FIELDS and k != "_id"}
+    return event
+
+def _encode_cursor_value(value):
+    """Convierte un valor de ordenamiento a una forma serializable en JSON"""
+    if isinstance(value, datetime):
+        return {"$d": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$o": str(value)}
+    return value
+
+def _decode_cursor_value(value):
+    """Reconstruye un valor de ordenamiento desde su forma JSON"""
+    if isinstance(value, dict):
+        if "$d" in value:
+            return datetime.fromisoformat(value["$d"])
+        if "$o" in value:
+            return ObjectId(value["$o"])
+    return value
+
+def encode_cursor(sort_field: str, direction: int, doc: Dict[str, Any]) -> str:
+    """Genera un token de continuación opaco a partir del último documento de la página"""
+    payload = {
+        "s": sort_field,
+        "d": direction,
+        "v": _encode_cursor_value(doc.get(sort_field)),
+        "i": _encode_cursor_value(doc.get("_id"))
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """Decodifica un token de continuación; lanza ValueError si es inválido"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return {
+            "sort_field": payload["s"],
+            "direction": int(payload["d"]),
+            "value": _decode_cursor_value(payload["v"]),
+            "last_id": _decode_cursor_value(payload["i"])
+        }
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
+def build_keyset_query(sort_field: str, direction: int, value, last_id) -> Dict[str, Any]:
+    """Construye la condición "después de (valor, _id)" respetando el orden de MongoDB.
+
+    MongoDB ordena null/ausente antes que cualquier valor en orden ascendente y
+    después en descendente, y $gt/$lt no cruzan tipos, por eso null se trata aparte.
+    """
+    op = "$gt" if direction == 1 else "$lt"
+    if value is None:
+        same_value = {sort_field: None, "_id": {op: last_id}}
+        if direction == 1:
+            return {"$or": [same_value, {sort_field: {"$ne": None}}]}
+        return same_value
+
+    conditions = [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: last_id}}
+    ]
+    if direction == -1:
+        conditions.append({sort_field: None})
+    return {"$or": conditions}
+
+# ===== COMPILADOR DE FILTROS =====
+
+# Campos de texto filtrados por "contiene" sin distinguir mayúsculas
+CONTAINS_FILTERS = [
+    "contrato", "cliente", "ciudad", "rut_cliente", "persona_contacto", "telefono_contacto",
+    "correo_contacto", "descripcion", "numero_factura", "numero_orden_compra"
+]
+
+# Campos filtrados por igualdad exacta (varios valores separados por coma usan $in)
+EQUALS_FILTERS = ["estado", "region", "tipo_cliente", "tipo_obra_lista"]
+
+# Conjuntos de valores exactos: parámetro -> campo
+SET_FILTERS = {"regiones": "region", "ciudades": "ciudad"}
+
+# Rangos numéricos (<campo>_desde / <campo>_hasta)
+RANGE_FILTERS = ["monto", "superficie_terreno", "superficie_construida", "duracion"]
+
+# Rangos de fecha (<campo>_desde / <campo>_hasta, formato YYYY-MM-DD)
+DATE_FILTERS = ["fecha_inicio", "fecha_termino", "fecha_factura"]
+
+TRUE_VALUES = {"true", "1", "si", "sí", "yes"}
+FALSE_VALUES = {"false", "0", "no"}
+
+# Valores de selectores que significan "sin filtro"
+IGNORED_VALUES = {"", "Select Status"}
+
+def _filter_value(filters: Dict[str, Any], param: str) -> str:
+    value = filters.get(param)
+    return "" if value is None else str(value).strip()
+
+def _split_values(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def contains_condition(text: str) -> Dict[str, Any]:
+    """Condición "contiene" sin distinguir mayúsculas (el texto se escapa literalmente)"""
+    return {"$regex": re.escape(text), "$options": "i"}
+
+def compile_filters(filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Compila una especificación de filtros (parámetros de la API) a una consulta de MongoDB.
+
+    Los filtros de igualdad, conjuntos, rangos y banderas se resuelven con los
+    índices de la colección; los "contiene" se evalúan sobre lo que esos filtros
+    dejan; un `rut_cliente` completo y válido (en cualquier formato) se compara
+    con rut_normalizado. Los parámetros desconocidos se ignoran. Lanza ValueError
+    si un número, fecha o valor booleano es inválido.
+    """
+    filters = filters or {}
+    query: Dict[str, Any] = {}
+
+    def add(field, condition):
+        # Un segundo filtro sobre el mismo campo se combina con $and
+        if field in query:
+            query.setdefault("$and", []).append({field: condition})
+        else:
+            query[field] = condition
+
+    values = _split_values(_filter_value(filters, "id"))
+    if values:
+        try:
+            ids = [int(value) for value in values]
+        except ValueError:
+            raise ValueError(f"ID inválido: {_filter_value(filters, 'id')}")
+        add("id", ids[0] if len(ids) == 1 else {"$in": ids})
+
+    for field in EQUALS_FILTERS:
+        value = _filter_value(filters, field)
+        if value in IGNORED_VALUES:
+            continue
+        values = _split_values(value)
+        add(field, values[0] if len(values) == 1 else {"$in": values})
+
+    for param, field in SET_FILTERS.items():
+        values = _split_values(_filter_value(filters, param))
+        if values:
+            add(field, {"$in": values})
+
+    for field in CONTAINS_FILTERS:
+        value = _filter_value(filters, field)
+        # Un RUT completo y válido se busca exacto por su forma canónica (con índice);
+        # uno parcial ("12.345") sigue siendo "contiene"
+        rut = normalize_rut(value) if field == "rut_cliente" and len(compact_rut(value)) >= 8 else None
+        if rut:
+            add("rut_normalizado", rut)
+        elif value:
+            add(field, contains_condition(value))
+
+    for field in RANGE_FILTERS:
+        bounds = {}
+        for suffix, op in (("desde", "$gte"), ("hasta", "$lte")):
+            param = f"{field}_{suffix}"
+            value = _filter_value(filters, param)
+            if value:
+                try:
+                    bounds[op] = float(value)
+                except ValueError:
+                    raise ValueError(f"Número inválido en {param}: {value}")
+        if bounds:
+            add(field, bounds)
+
+    for field in DATE_FILTERS:
+        bounds = {}
+        for suffix, op in (("desde", "$gte"), ("hasta", "$lte")):
+            param = f"{field}_{suffix}"
+            value = _filter_value(filters, param)
+            if value:
+                try:
+                    bounds[op] = datetime.fromisoformat(value)
+                except ValueError:
+                    raise ValueError(f"Fecha inválida en {param}: {value}")
+        if bounds:
+            add(field, bounds)
+
+    for flag in SERVICE_FLAGS:
+        value = _filter_value(filters, flag).lower()
+        if not value:
+            continue
+        if value in TRUE_VALUES:
+            add(flag, True)
+        elif value in FALSE_VALUES:
+            # Documentos antiguos pueden no tener la bandera: ausente equivale a falso
+            add(flag, {"$ne": True})
+        else:
+            raise ValueError(f"Valor inválido en {flag}: {value}")
+
+    return query
+
 class ProyectoController:
     """Controlador para manejar operaciones CRUD de proyectos en MongoDB Atlas con CSV almacenado en BD"""
 
     def __init__(self):
         self.collection_name = "proyectos"
         self._collection = None
+        self._id_allocator = IdAllocator(get_collection, self.collection_name)
+        self._stats_summary = StatsSummary(get_collection, self.collection_name)
+        self._data_version = DataVersion(get_collection, self.collection_name)
+        self._search_index = SearchIndex(get_collection, self.collection_name)
+        self._suggestions = SuggestionIndex(get_collection, self.collection_name)
+        self._client_clusters = ClientClusters(get_collection, self.collection_name)
+        self._tombstones = TombstoneLog(get_collection, self.collection_name)
+        self.import_checkpoints = ImportCheckpoints(get_collection)
+        self.query_cache = QueryCache()
+        self.events = EventBus()
         self._initialize_collection()
 
     def _initialize_collection(self):
@@ -22,10 +300,11 @@ class ProyectoController:
         try:
             self._collection = get_collection(self.collection_name)
 
-            # Crear índices si la colección está vacía (primera vez)
-            if self._collection.count_documents({}) == 0:
-                create_indexes(self._collection)
-                logger.info("🔧 Colección inicializada con índices")
+            # Asegurar índices (create_index es idempotente, así se agregan los nuevos)
+            create_indexes(self._collection)
+            self._tombstones.ensure_indexes()
+            self.import_checkpoints.ensure_indexes()
+            logger.info("🔧 Colección inicializada con índices")
 
         except Exception as e:
             logger.error(f"❌ Error inicializando colección: {e}")
@@ -46,6 +325,26 @@ class ProyectoController:
 
 
 
+    def _record_write(self, added: List[Dict[str, Any]] = (), removed: List[Dict[str, Any]] = ()):
+        """Propaga una escritura a las estructuras derivadas (caché, estadísticas, búsqueda y sugerencias).
+
+        `added` son los documentos nuevos o su versión actualizada y `removed` los
+        eliminados o su versión previa; ambos deben incluir _id.
+        """
+        self.query_cache.invalidate()
+        self._data_version.bump()
+        self._stats_summary.record(added, removed)
+        self._search_index.update(added, removed)
+        self._suggestions.update(added, removed)
+
+    def _publish_changes(self, event_type: str, docs: List[Dict[str, Any]]):
+        """Publica un evento por documento, o un `reset` si la escritura es muy grande"""
+        if len(docs) > MAX_EVENTS_PER_WRITE:
+            self.events.publish("reset", {"count": len(docs)})
+            return
+        for doc in docs:
+            self.events.publish(event_type, change_event(doc, doc if event_type == "created" else None))
+
     def create_proyecto(self, proyecto: Proyecto) -> bool:
         """Crea un nuevo proyecto en MongoDB Atlas"""
         try:
@@ -60,14 +359,18 @@ class ProyectoController:
             # Generar ID único si no existe
             if not proyecto.id:
                 proyecto.id = self._generate_next_id()
+            else:
+                self._id_allocator.observe(proyecto.id)
 
             # Preparar datos para inserción
-            data = proyecto.to_dict()
+            data = add_derived_fields(proyecto.to_dict())
             data.pop('_id', None)  # Dejar que MongoDB genere el _id
 
             # Insertar documento en MongoDB
             result = collection.insert_one(data)
             proyecto._id = result.inserted_id
+            self._record_write(added=[data])
+            self._publish_changes("created", [data])
 
             logger.info(f"✅ Proyecto creado con ID: {proyecto.id}, MongoDB _id: {result.inserted_id}")
             return True
@@ -80,18 +383,75 @@ class ProyectoController:
             logger.error(f"❌ Error inesperado al crear proyecto: {e}")
             return False
 
-    def get_all_proyectos(self, user_type='admin') -> List[Proyecto]:
-        """Obtiene todos los proyectos de MongoDB Atlas"""
+    def _cached(self, operation: str, user_type, loader, *key_parts):
+        """Lee un resultado de la caché de consultas o lo calcula con `loader`.
+
+        La clave incluye la operación, el rol y los parámetros de la consulta. Se
+        retorna una copia superficial: los elementos son compartidos y no deben
+        modificarse.
+        """
+        key = make_cache_key(operation, user_type, *key_parts)
+        return copy.copy(self.query_cache.get_or_load(key, loader))
+
+    def start_change_listener(self) -> bool:
+        """Invalida la caché y publica eventos también con escrituras de otros procesos (change stream)"""
+        try:
+            collection = self.get_collection()
+            self.events.watch(collection, ignored_fields=DERIVED_FIELDS)
+            return self.query_cache.watch(collection, on_change=self._on_collection_change)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo iniciar el listener de cambios: {e}")
+            return False
+
+    def _on_collection_change(self):
+        """Cambio visto por el change stream (también de otros procesos o editado en Atlas).
+
+        Cambia la versión de los ETag y descarta el índice de búsqueda y las
+        sugerencias en memoria, que solo conocen las escrituras de este proceso;
+        se vuelven a cargar en la siguiente consulta.
+        """
+        self._data_version.bump()
+        self._search_index.invalidate()
+        self._suggestions.invalidate()
+
+    def get_data_version(self) -> Optional[int]:
+        """Versión de los datos de la colección (contador propio de escrituras, ver DataVersion).
+
+        Es una lectura por _id, sin tocar los proyectos; retorna None si no se puede
+        leer o si un incremento falló (la versión podría estar atrasada).
+        """
+        try:
+            return self._data_version.get()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer la versión de los datos: {e}")
+            return None
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Contadores de la caché de consultas (aciertos, fallos, desalojos, ...)"""
+        return self.query_cache.get_stats()
+
+    def _materialize(self, docs, fields=None) -> list:
+        """Convierte documentos crudos en Proyecto o, si hay proyección, en diccionarios parciales"""
+        if fields:
+            return [serialize_document(doc, fields) for doc in docs]
+        return [Proyecto.from_dict(doc) for doc in docs]
+
+    def get_all_proyectos(self, user_type='admin', fields: Optional[List[str]] = None,
+                          query: Optional[Dict[str, Any]] = None) -> list:
+        """Obtiene todos los proyectos de MongoDB Atlas (opcionalmente filtrados por `query`).
+
+        Si se indica `fields`, solo se traen esos campos y se retornan diccionarios
+        ya serializables en lugar de objetos Proyecto.
+        """
         try:
             collection = self.get_collection(user_type)
 
             # Obtener documentos ordenados por ID
-            cursor = collection.find().sort("id", 1)
+            def load():
+                cursor = collection.find(query or {}, build_projection(fields)).sort("id", 1)
+                return self._materialize(cursor, fields)
 
-            proyectos = []
-            for doc in cursor:
-                proyecto = Proyecto.from_dict(doc)
-                proyectos.append(proyecto)
+            proyectos = self._cached("all", user_type, load, query, fields)
 
             logger.info(f"📊 Obtenidos {len(proyectos)} proyectos")
             return proyectos
@@ -103,14 +463,29 @@ class ProyectoController:
             logger.error(f"❌ Error inesperado al obtener proyectos: {e}")
             return []
 
-    def get_proyecto_by_id(self, proyecto_id: int, user_type='admin') -> Optional[Proyecto]:
-        """Obtiene un proyecto por su ID"""
+    def iter_proyecto_documents(self, user_type='admin', query: Optional[Dict[str, Any]] = None,
+                                fields: Optional[List[str]] = None, batch_size: int = 500):
+        """Itera los documentos crudos ordenados por ID, trayéndolos del servidor por lotes.
+
+        No materializa la colección: cada lote de `batch_size` documentos se pide
+        al servidor cuando el anterior ya fue consumido.
+        """
+        collection = self.get_collection(user_type)
+        cursor = collection.find(query or {}, build_projection(fields)).sort("id", 1).batch_size(batch_size)
+        try:
+            for doc in cursor:
+                yield doc
+        finally:
+            cursor.close()
+
+    def get_proyecto_by_id(self, proyecto_id: int, user_type='admin', fields: Optional[List[str]] = None):
+        """Obtiene un proyecto por su ID (diccionario parcial si se indica `fields`)"""
         try:
             collection = self.get_collection(user_type)
-            doc = collection.find_one({"id": proyecto_id})
+            doc = collection.find_one({"id": proyecto_id}, build_projection(fields))
 
             if doc:
-                proyecto = Proyecto.from_dict(doc)
+                proyecto = self._materialize([doc], fields)[0]
                 logger.info(f"📋 Proyecto encontrado: {proyecto_id}")
                 return proyecto
             else:
@@ -136,22 +511,24 @@ class ProyectoController:
                 return False
 
             # Preparar datos para actualización
-            data = proyecto.to_dict()
+            data = add_derived_fields(proyecto.to_dict())
             data.pop('_id', None)  # No actualizar el _id
             data['updated_at'] = datetime.now()
 
-            # Actualizar documento
-            result = collection.update_one(
+            # Actualizar documento obteniendo la imagen previa (estadísticas y campos cambiados)
+            previous = collection.find_one_and_update(
                 {"id": proyecto.id},
-                {"$set": data}
+                {"$set": data},
+                projection=build_projection(None),
+                return_document=ReturnDocument.BEFORE
             )
 
-            if result.modified_count > 0:
+            if previous is not None:
+                self._record_write(added=[dict(data, _id=previous["_id"])], removed=[previous])
+                changed = {k: v for k, v in data.items() if previous.get(k) != v}
+                self.events.publish("updated", change_event(previous, changed))
                 logger.info(f"✅ Proyecto {proyecto.id} actualizado")
                 return True
-            elif result.matched_count > 0:
-                logger.info(f"ℹ️ Proyecto {proyecto.id} encontrado pero sin cambios")
-                return True
             else:
                 logger.warning(f"⚠️ No se encontró proyecto con ID {proyecto.id}")
                 return False
@@ -168,9 +545,12 @@ class ProyectoController:
         try:
             collection = self.get_collection()
 
-            result = collection.delete_one({"id": proyecto_id})
+            deleted = collection.find_one_and_delete({"id": proyecto_id}, projection=PREVIOUS_IMAGE_PROJECTION)
 
-            if result.deleted_count > 0:
+            if deleted is not None:
+                self._record_write(removed=[deleted])
+                self._tombstones.record([deleted])
+                self._publish_changes("deleted", [deleted])
                 logger.info(f"🗑️ Proyecto {proyecto_id} eliminado")
                 return True
             else:
@@ -184,27 +564,19 @@ class ProyectoController:
             logger.error(f"❌ Error inesperado al eliminar proyecto {proyecto_id}: {e}")
             return False
 
-    def search_proyectos(self, cliente_filter: str = "", estado_filter: str = "", user_type='admin') -> List[Proyecto]:
+    def search_proyectos(self, cliente_filter: str = "", estado_filter: str = "", user_type='admin',
+                         fields: Optional[List[str]] = None) -> list:
         """Busca proyectos por cliente y/o estado usando índices de MongoDB"""
         try:
             collection = self.get_collection(user_type)
-            query = {}
-
-            # Filtro por cliente usando índice de texto
-            if cliente_filter:
-                query["$text"] = {"$search": cliente_filter}
-
-            # Filtro por estado
-            if estado_filter and estado_filter not in ["Select Status", ""]:
-                query["estado"] = estado_filter
+            query = self.build_search_query(cliente_filter, estado_filter)
 
             # Ejecutar consulta con ordenamiento
-            cursor = collection.find(query).sort("id", 1)
+            def load():
+                cursor = collection.find(query, build_projection(fields)).sort("id", 1)
+                return self._materialize(cursor, fields)
 
-            proyectos = []
-            for doc in cursor:
-                proyecto = Proyecto.from_dict(doc)
-                proyectos.append(proyecto)
+            proyectos = self._cached("search", user_type, load, query, fields)
 
             logger.info(f"🔍 Búsqueda completada: {len(proyectos)} resultados")
             return proyectos
@@ -216,89 +588,588 @@ class ProyectoController:
             logger.error(f"❌ Error inesperado en búsqueda: {e}")
             return []
 
-    def _generate_next_id(self) -> int:
-        """Genera el siguiente ID disponible usando agregación de MongoDB"""
+    def build_search_query(self, cliente_filter: str = "", estado_filter: str = "") -> Dict[str, Any]:
+        """Construye la consulta de búsqueda por cliente y/o estado"""
+        query = {}
+
+        # Filtro por cliente usando índice de texto
+        if cliente_filter:
+            query["$text"] = {"$search": cliente_filter}
+
+        # Filtro por estado
+        if estado_filter and estado_filter not in ["Select Status", ""]:
+            query["estado"] = estado_filter
+
+        return query
+
+    def get_proyectos_page(self, user_type='admin', query: Optional[Dict[str, Any]] = None,
+                           sort_field: str = "id", direction: int = 1, after: Optional[str] = None,
+                           limit: int = 50, include_total: bool = False,
+                           fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Obtiene una página de proyectos usando paginación por cursor (keyset).
+
+        El costo de cada página es el mismo sin importar su profundidad: se salta
+        directamente a (valor, _id) del último documento usando el índice compuesto.
+        Lanza ValueError si el orden o el cursor son inválidos.
+        """
+        if sort_field not in SORTABLE_FIELDS:
+            raise ValueError(f"Campo de ordenamiento inválido: {sort_field}")
+        direction = -1 if direction == -1 else 1
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        base_query = dict(query or {})
+
+        page_query = base_query
+        if after:
+            cursor_info = decode_cursor(after)
+            if cursor_info["sort_field"] != sort_field or cursor_info["direction"] != direction:
+                raise ValueError("El cursor no corresponde al ordenamiento solicitado")
+            keyset = build_keyset_query(sort_field, direction, cursor_info["value"], cursor_info["last_id"])
+            page_query = {"$and": [base_query, keyset]} if base_query else keyset
+
         try:
-            collection = self.get_collection()
+            collection = self.get_collection(user_type)
 
-            # Usar agregación para obtener el ID máximo
-            pipeline = [
-                {"$group": {"_id": None, "max_id": {"$max": "$id"}}}
-            ]
+            def load():
+                # El campo de orden se proyecta siempre porque forma parte del cursor
+                projection = build_projection(fields, sort_field)
+                cursor = collection.find(page_query, projection).sort([(sort_field, direction), ("_id", direction)]).limit(limit + 1)
+                docs = list(cursor)
 
-            result = list(collection.aggregate(pipeline))
+                has_more = len(docs) > limit
+                docs = docs[:limit]
 
-            if result and result[0]["max_id"]:
-                next_id = result[0]["max_id"] + 1
-            else:
-                next_id = 1001  # ID inicial
+                page = {
+                    "items": self._materialize(docs, fields),
+                    "next_cursor": encode_cursor(sort_field, direction, docs[-1]) if has_more else None,
+                    "has_more": has_more
+                }
+                if include_total:
+                    page["total"] = collection.count_documents(base_query)
+                return page
 
+            page = self._cached("page", user_type, load, page_query, sort_field, direction, limit, include_total, fields)
+            logger.info(f"📄 Página obtenida: {len(page['items'])} proyectos (ordenados por {sort_field})")
+            return page
+
+        except PyMongoError as e:
+            logger.error(f"❌ Error de MongoDB al obtener página de proyectos: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error inesperado al obtener página de proyectos: {e}")
+            raise
+
+    def _generate_next_id(self) -> int:
+        """Genera el siguiente ID disponible desde el contador atómico"""
+        try:
+            next_id = self._id_allocator.next_id()
             logger.info(f"🔢 Siguiente ID generado: {next_id}")
             return next_id
 
         except PyMongoError as e:
             logger.error(f"❌ Error de MongoDB al generar ID: {e}")
-            return 1001
+            raise
         except Exception as e:
             logger.error(f"❌ Error inesperado al generar ID: {e}")
-            return 1001
-
-    def bulk_insert_proyectos(self, proyectos: List[Proyecto]) -> bool:
-        """Inserta múltiples proyectos de una vez usando operación bulk"""
+            raise
+
+    def _insert_chunk(self, collection, documents: List[Dict[str, Any]], rows: List[int]) -> Dict[str, Any]:
+        """Inserta un bloque con insert_many(ordered=False).
+
+        Retorna {inserted, failed, present, error}. Con BulkWriteError el resto del
+        bloque sí se inserta y solo las filas con error quedan como fallidas; las que
+        chocan por _id (documentos con _id determinista de un intento anterior) ya
+        estaban y se cuentan en `present`. `error` indica que se perdió la conexión.
+        """
+        outcome = {"inserted": documents, "failed": [], "present": 0, "error": None}
+        # updated_at marca el momento de la escritura (get_changes lo usa como cursor),
+        # no el de la conversión, que en un bloque posterior puede quedar muy atrás
+        now = datetime.now()
+        for doc in documents:
+            doc["updated_at"] = now
         try:
-            if not proyectos:
-                logger.warning("⚠️ Lista de proyectos vacía")
-                return False
+            collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            outcome["inserted"] = [doc for index, doc in enumerate(documents) if index not in errors]
+            for index, error in errors.items():
+                if is_duplicate_id_error(error):
+                    outcome["present"] += 1
+                    continue
+                outcome["failed"].append({
+                    "row": rows[index],
+                    "id": documents[index].get("id"),
+                    "code": error.get("code"),
+                    "error": error.get("errmsg")
+                })
+        except PyMongoError as e:
+            # Sin detalle por documento: no se sabe cuáles alcanzaron a insertarse
+            logger.error(f"❌ Error de MongoDB insertando un bloque de {len(documents)} proyectos: {e}")
+            outcome["inserted"] = []
+            outcome["failed"] = [{"row": row, "id": doc.get("id"), "code": getattr(e, "code", None), "error": str(e)}
+                                 for row, doc in zip(rows, documents)]
+            outcome["error"] = str(e)
+        return outcome
+
+    def bulk_insert_proyectos(self, proyectos: List[Proyecto], rows: Optional[List[int]] = None,
+                              object_ids: Optional[List[ObjectId]] = None) -> Dict[str, Any]:
+        """Inserta múltiples proyectos en bloques concurrentes.
+
+        Los proyectos se validan y se dividen en bloques de BULK_CHUNK_SIZE que se
+        insertan en paralelo (hasta BULK_WORKERS hilos sobre el pool de conexiones).
+        `rows` son los números de fila de cada proyecto para el reporte (por defecto
+        1..n). Con `object_ids` (uno por proyecto) la inserción es idempotente: un
+        proyecto cuyo _id ya existe no se duplica y se cuenta en `already_present`.
+        Retorna {inserted, already_present, skipped, failed, total, chunks,
+        elapsed_seconds, rows_per_second}; skipped y failed listan cada fila con su
+        motivo. Si se perdió la conexión en algún bloque incluye `error`.
+        """
+        started = time.perf_counter()
+        rows = list(rows) if rows is not None else list(range(1, len(proyectos) + 1))
+        object_ids = list(object_ids) if object_ids is not None else [None] * len(proyectos)
+        result = {"inserted": 0, "already_present": 0, "skipped": [], "failed": [], "total": len(proyectos),
+                  "chunks": 0, "elapsed_seconds": 0.0, "rows_per_second": 0.0}
+
+        if not proyectos:
+            logger.warning("⚠️ Lista de proyectos vacía")
+            return result
 
+        try:
             collection = self.get_collection()
-            documents = []
+            valid_proyectos, valid_rows, valid_ids = [], [], []
 
-            for proyecto in proyectos:
+            for proyecto, row, object_id in zip(proyectos, rows, object_ids):
                 # Validar cada proyecto
                 is_valid, errors = proyecto.validate()
                 if not is_valid:
-                    logger.warning(f"⚠️ Proyecto inválido omitido: {errors}")
+                    result["skipped"].append({"row": row, "id": proyecto.id, "errors": errors})
                     continue
+                valid_proyectos.append(proyecto)
+                valid_rows.append(row)
+                valid_ids.append(object_id)
+
+            # Registrar los IDs explícitos y reservar de una vez los que faltan
+            explicit_ids = [int(p.id) for p in valid_proyectos if p.id and str(p.id).isdigit()]
+            if explicit_ids:
+                self._id_allocator.observe(max(explicit_ids))
+            missing = [p for p in valid_proyectos if not p.id]
+            for proyecto, new_id in zip(missing, self._id_allocator.reserve(len(missing))):
+                proyecto.id = new_id
 
-                # Generar ID solo si no existe
-                if not proyecto.id:
-                    proyecto.id = self._generate_next_id()
-
+            documents = []
+            for proyecto, object_id in zip(valid_proyectos, valid_ids):
                 # Preparar documento
-                data = proyecto.to_dict()
+                data = add_derived_fields(proyecto.to_dict())
                 data.pop('_id', None)
+                if object_id is not None:
+                    data['_id'] = object_id
                 documents.append(data)
 
-            if documents:
-                result = collection.insert_many(documents, ordered=False)
-                logger.info(f"📦 Insertados {len(result.inserted_ids)} proyectos en lote")
-                return True
-            else:
+            if not documents:
                 logger.warning("⚠️ No hay documentos válidos para insertar")
-                return False
+                return result
+
+            chunks = [(documents[start:start + BULK_CHUNK_SIZE], valid_rows[start:start + BULK_CHUNK_SIZE])
+                      for start in range(0, len(documents), BULK_CHUNK_SIZE)]
+            result["chunks"] = len(chunks)
+
+            inserted = []
+            if len(chunks) == 1:
+                outcomes = [self._insert_chunk(collection, *chunks[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=min(BULK_WORKERS, len(chunks))) as executor:
+                    outcomes = list(executor.map(lambda chunk: self._insert_chunk(collection, *chunk), chunks))
+            for outcome in outcomes:
+                inserted.extend(outcome["inserted"])
+                result["failed"].extend(outcome["failed"])
+                result["already_present"] += outcome["present"]
+                if outcome["error"]:
+                    result["error"] = outcome["error"]
+
+            # Las estructuras derivadas se actualizan una vez, desde este hilo
+            if inserted:
+                # Un _id determinista reinsertado no debe seguir figurando como eliminado
+                explicit_object_ids = {object_id for object_id in valid_ids if object_id is not None}
+                self._tombstones.forget([doc["_id"] for doc in inserted if doc["_id"] in explicit_object_ids])
+                self._record_write(added=inserted)
+                self._publish_changes("created", inserted)
+            result["inserted"] = len(inserted)
 
-        except PyMongoError as e:
-            logger.error(f"❌ Error de MongoDB en inserción masiva: {e}")
-            return False
         except Exception as e:
             logger.error(f"❌ Error inesperado en inserción masiva: {e}")
-            return False
+            result["error"] = str(e)
+
+        elapsed = time.perf_counter() - started
+        result["elapsed_seconds"] = round(elapsed, 3)
+        result["rows_per_second"] = round(result["inserted"] / elapsed, 1) if elapsed else 0.0
+        logger.info(f"📦 Inserción masiva: {result['inserted']} insertados, {result['already_present']} ya existían, "
+                    f"{len(result['skipped'])} omitidos, {len(result['failed'])} fallidos en {result['chunks']} bloques "
+                    f"({result['rows_per_second']:,.0f} filas/s)")
+        return result
+
+    def find_existing_keys(self, candidates: Dict[str, Iterable[Any]]) -> Dict[str, Dict[Any, List[Dict[str, Any]]]]:
+        """Busca qué valores de cada clave ya existen en la colección.
+
+        `candidates` es {campo: valores}; se hace una consulta $in por campo (cada
+        una usa el índice del campo). Retorna {campo: {valor: [{_id, id}, ...]}}
+        con todos los documentos que tienen cada valor.
+        """
+        found: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {field: {} for field in candidates}
+        collection = self.get_collection()
+        for field, values in candidates.items():
+            values = list({value for value in values if value not in (None, "")})
+            if not values:
+                continue
+            for doc in collection.find({field: {"$in": values}}, {field: 1, "id": 1}):
+                found[field].setdefault(doc.get(field), []).append({"_id": doc["_id"], "id": doc.get("id")})
+        return found
+
+    def upsert_proyectos(self, records: List[Dict[str, Any]], key: str = "id", dry_run: bool = False,
+                         rows: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Crea o actualiza proyectos según una clave (`id` o `contrato_rut`).
+
+        `records` son registros parciales: solo se comparan y se escriben ($set) los
+        campos que traen; con clave `id`, los registros sin ID se crean como nuevos.
+        Los existentes se leen con una consulta $in por bloque y solo se escriben
+        los que cambian, con bulk_write de UpdateOne(upsert=True).
+        Con `dry_run` solo se calcula la diferencia. Retorna {new, changed,
+        unchanged, skipped, failed, changes, ...}. Lanza ValueError si la clave no existe.
+        """
+        if key not in UPSERT_KEYS:
+            raise ValueError(f"Clave de actualización inválida: {key}. Opciones: {', '.join(UPSERT_KEYS)}")
+        key_fields = UPSERT_KEYS[key]
+
+        started = time.perf_counter()
+        rows = list(rows) if rows is not None else list(range(1, len(records) + 1))
+        result = {"new": 0, "changed": 0, "unchanged": 0, "written": 0, "skipped": [], "failed": [],
+                  "changes": [], "dry_run": dry_run, "key": key, "elapsed_seconds": 0.0, "rows_per_second": 0.0}
+
+        # Una fila por clave: si se repite en el archivo, la última reemplaza a las anteriores
+        latest: Dict[tuple, tuple] = {}
+        for record, row in zip(records, rows):
+            record_key = upsert_key(record, key_fields)
+            if key == "id" and record_key[0] in (None, ""):
+                # Sin ID es un proyecto nuevo: se le asigna uno al escribirlo
+                latest[(_NEW_RECORD, row)] = (record, row)
+                continue
+            if any(value in (None, "") for value in record_key):
+                error = f"Falta la clave o no es válida ({', '.join(key_fields)})"
+                result["skipped"].append({"row": row, "errors": [error]})
+                continue
+            if record_key in latest:
+                result["skipped"].append({"row": latest[record_key][1], "errors": [f"Clave repetida en la fila {row}"]})
+            latest[record_key] = (record, row)
 
-    def get_statistics(self, user_type='admin') -> Dict[str, Any]:
-        """Obtiene estadísticas de la colección"""
+        try:
+            collection = self.get_collection()
+            pending = list(latest.items())
+            for start in range(0, len(pending), BULK_CHUNK_SIZE):
+                self._upsert_chunk(collection, pending[start:start + BULK_CHUNK_SIZE], key_fields, dry_run, result)
+        except Exception as e:
+            logger.error(f"❌ Error inesperado en actualización masiva: {e}")
+            result["error"] = str(e)
+
+        elapsed = time.perf_counter() - started
+        result["elapsed_seconds"] = round(elapsed, 3)
+        result["rows_per_second"] = round(len(records) / elapsed, 1) if elapsed else 0.0
+        logger.info(f"🔁 {'Simulación de a' if dry_run else 'A'}ctualización masiva por {key}: {result['new']} nuevos, "
+                    f"{result['changed']} con cambios, {result['unchanged']} sin cambios, "
+                    f"{len(result['skipped'])} omitidos, {len(result['failed'])} fallidos")
+        return result
+
+    def _upsert_chunk(self, collection, pending, key_fields, dry_run: bool, result: Dict[str, Any]):
+        """Compara un bloque de registros con los existentes y escribe solo los cambios"""
+        first_field = key_fields[0]
+        existing = {}
+        values = {record_key[0] for record_key, _ in pending if record_key[0] is not _NEW_RECORD}
+        lookup = {first_field: {"$in": list(values)}}
+        for doc in collection.find(lookup, build_projection(None)):
+            existing[upsert_key(doc, key_fields)] = doc
+
+        targets = []  # (fila, previo o None, documento resultante, campos cambiados)
+        new_proyectos = []
+        for record_key, (record, row) in pending:
+            previous = existing.get(record_key)
+            if previous is None:
+                proyecto = Proyecto(**record)
+                is_valid, errors = proyecto.validate()
+                if not is_valid:
+                    result["skipped"].append({"row": row, "errors": errors})
+                    continue
+                result["new"] += 1
+                new_proyectos.append((proyecto, row))
+                continue
+
+            # El id nunca se reescribe: con otra clave identifica al documento encontrado
+            changed = {field: value for field, value in record.items()
+                       if field not in key_fields and field not in ("id", "_id") and previous.get(field) != value}
+            if not changed:
+                result["unchanged"] += 1
+                continue
+
+            merged = {**previous, **changed}
+            is_valid, errors = Proyecto.from_dict(merged).validate()
+            if not is_valid:
+                result["skipped"].append({"row": row, "errors": errors})
+                continue
+            result["changed"] += 1
+            if len(result["changes"]) < MAX_DIFF_SAMPLES:
+                result["changes"].append({
+                    "row": row,
+                    "id": previous.get("id"),
+                    "fields": {field: [previous.get(field), value] for field, value in changed.items()}
+                })
+            if dry_run:
+                continue
+
+            merged = add_derived_fields({**previous, **changed})
+            for field in DERIVED_FIELDS:
+                if previous.get(field) != merged[field]:
+                    changed[field] = merged[field]
+            targets.append((row, previous, merged, changed))
+
+        if dry_run:
+            return
+
+        # IDs para los nuevos que no traen uno
+        explicit_ids = [int(p.id) for p, _ in new_proyectos if p.id and str(p.id).isdigit()]
+        if explicit_ids:
+            self._id_allocator.observe(max(explicit_ids))
+        missing = [p for p, _ in new_proyectos if not p.id]
+        for proyecto, new_id in zip(missing, self._id_allocator.reserve(len(missing))):
+            proyecto.id = new_id
+
+        for proyecto, row in new_proyectos:
+            doc = add_derived_fields(proyecto.to_dict())
+            doc.pop("_id", None)
+            targets.append((row, None, doc, None))
+
+        if not targets:
+            return
+
+        # updated_at se fija justo antes de escribir: es el cursor de get_changes
+        now = datetime.now()
+        operations = []
+        for row, previous, doc, changed in targets:
+            doc["updated_at"] = now
+            if previous is None:
+                key_filter = {field: doc.get(field) for field in key_fields}
+                on_insert = {field: value for field, value in doc.items() if field not in key_filter}
+                operations.append(UpdateOne(key_filter, {"$setOnInsert": on_insert}, upsert=True))
+            else:
+                changed["updated_at"] = now
+                operations.append(UpdateOne({"_id": previous["_id"]}, {"$set": changed}))
+
+        try:
+            write = collection.bulk_write(operations, ordered=False)
+            upserted, errors = write.upserted_ids or {}, {}
+        except BulkWriteError as e:
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+        added, removed, events = [], [], []
+        for index, (row, previous, doc, changed) in enumerate(targets):
+            if index in errors:
+                result["failed"].append({"row": row, "id": doc.get("id"), "code": errors[index].get("code"),
+                                         "error": errors[index].get("errmsg")})
+                continue
+            if previous is None:
+                if index not in upserted:
+                    # Otro proceso lo creó entre la lectura y la escritura: $setOnInsert no aplicó
+                    continue
+                doc["_id"] = upserted[index]
+                events.append(("created", doc))
+            else:
+                removed.append(previous)
+                events.append(("updated", change_event(previous, changed)))
+            added.append(doc)
+
+        result["written"] += len(added)
+        if added:
+            self._record_write(added=added, removed=removed)
+            if len(events) > MAX_EVENTS_PER_WRITE:
+                self.events.publish("reset", {"count": len(events)})
+            else:
+                for event_type, data in events:
+                    self.events.publish(event_type, data if event_type == "updated" else change_event(data, data))
+
+    def build_filter_query(self, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Compila los filtros de la API a una consulta (ver compile_filters).
+
+        El parámetro `q` (búsqueda de texto) se resuelve con el índice de búsqueda y
+        se agrega como una condición sobre _id. `cliente_grupo` (nombre o RUT) trae
+        los proyectos de todas las variantes de ese cliente según el último
+        agrupamiento (ver cluster_clients). Lanza ValueError si algún valor es inválido.
+        """
+        query = compile_filters(filters)
+        text = _filter_value(filters or {}, "q")
+        if text:
+            query["_id"] = {"$in": [doc_id for doc_id, _ in self._search_index.search(text)]}
+        return self._add_client_group(query, filters)
+
+    def _add_client_group(self, query: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Agrega la condición del filtro `cliente_grupo` (todas las variantes del cliente)"""
+        client = _filter_value(filters or {}, "cliente_grupo")
+        if client:
+            query.setdefault("$and", []).append(self._client_clusters.group_query(client))
+        return query
+
+    def search_proyectos_ranked(self, text: str, user_type='admin', filters: Optional[Dict[str, Any]] = None,
+                                fields: Optional[List[str]] = None, limit: Optional[int] = None) -> list:
+        """Busca proyectos por subcadena (sin distinguir tildes ni mayúsculas) ordenados por relevancia.
+
+        Los demás filtros de `filters` se aplican sobre los resultados de la búsqueda.
+        Lanza ValueError si algún filtro es inválido.
+        """
+        query = self._add_client_group(compile_filters(filters), filters)
         try:
             collection = self.get_collection(user_type)
-            return get_collection_stats(collection)
+
+            def load():
+                ranked = self._search_index.search(text)
+                if not ranked:
+                    return []
+
+                rank = {doc_id: position for position, (doc_id, _) in enumerate(ranked)}
+                ranked_query = dict(query, _id={"$in": list(rank)})
+                docs = sorted(collection.find(ranked_query, build_projection(fields)), key=lambda doc: rank[doc["_id"]])
+                if limit:
+                    docs = docs[:limit]
+                return self._materialize(docs, fields)
+
+            proyectos = self._cached("ranked", user_type, load, text, query, fields, limit)
+            logger.info(f"🔍 Búsqueda '{text}': {len(proyectos)} resultados")
+            return proyectos
+
+        except PyMongoError as e:
+            logger.error(f"❌ Error de MongoDB en búsqueda: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"❌ Error inesperado en búsqueda: {e}")
+            return []
+
+    def get_changes(self, since: Optional[str] = None, user_type='admin',
+                    fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Cambios desde el cursor `since`: proyectos creados/actualizados y _id eliminados.
+
+        Retorna {cursor, reset, items, deleted}. Con `reset` en True (sin cursor, cursor
+        fuera de la retención de lápidas o demasiados cambios) el cliente debe recargar
+        todo y continuar desde `cursor`. Lanza ValueError si el cursor es inválido.
+        """
+        # El siguiente cursor se toma antes de consultar: lo escrito durante la consulta
+        # vuelve a aparecer en la próxima sincronización (el cliente aplica idempotente)
+        next_cursor = (datetime.now() - CHANGES_CURSOR_MARGIN).isoformat()
+        changes = {"cursor": next_cursor, "reset": True, "items": [], "deleted": []}
+
+        if not since:
+            return changes
+        try:
+            since_time = datetime.fromisoformat(since)
+        except ValueError:
+            raise ValueError(f"Cursor de cambios inválido: {since}")
+        if not self._tombstones.covers(since_time):
+            return changes
+
+        collection = self.get_collection(user_type)
+        query = {"updated_at": {"$gte": since_time}}
+        docs = list(collection.find(query, build_projection(fields, "updated_at")).sort("updated_at", 1).limit(MAX_CHANGES + 1))
+        tombstones = self._tombstones.since(since_time)
+        if len(docs) + len(tombstones) > MAX_CHANGES:
+            return changes
+
+        changes.update({
+            "reset": False,
+            "items": self._materialize(docs, fields),
+            "deleted": [str(tombstone["_id"]) for tombstone in tombstones]
+        })
+        logger.info(f"🔄 Cambios desde {since}: {len(docs)} actualizados, {len(tombstones)} eliminados")
+        return changes
+
+    def suggest_values(self, field: str, prefix: str = "", limit: int = 10) -> List[Dict[str, Any]]:
+        """Sugerencias de valores para autocompletar (ver SuggestionIndex.suggest).
+
+        Lanza ValueError si el campo no tiene sugerencias.
+        """
+        return self._suggestions.suggest(field, prefix, limit)
+
+    def cluster_clients(self, on_progress=None) -> Dict[str, Any]:
+        """Agrupa variantes del mismo cliente y guarda las sugerencias de unificación
+        (ver ClientClusters.cluster)"""
+        # Los documentos antiguos reciben rut_normalizado antes de agrupar
+        self._search_index.backfill()
+        report = self._client_clusters.cluster(on_progress)
+        # Cambian los resultados de los filtros cliente_grupo
+        self._data_version.bump()
+        return report
+
+    def get_client_merge_suggestions(self) -> Dict[str, Any]:
+        """Último reporte de clientes duplicados ({} si no se ha calculado)"""
+        try:
+            return self._client_clusters.latest()
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo sugerencias de clientes: {e}")
+            return {}
+
+    def get_statistics(self, user_type='admin', filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Obtiene estadísticas de la colección (opcionalmente filtradas) en un solo round trip"""
+        query = self.build_filter_query(filters)
+        try:
+            def load():
+                # Sin filtros se lee el resumen materializado (O(1))
+                if not query:
+                    stats = self._stats_summary.read()
+                    if stats is None:
+                        stats = self._stats_summary.rebuild()["summary"]
+                    return stats
+
+                stats = get_collection_stats(self.get_collection(user_type), query)
+                if not stats:
+                    raise Exception("No se pudieron calcular las estadísticas")
+                return stats
+
+            return self._cached("stats", user_type, load, query)
         except Exception as e:
             logger.error(f"❌ Error obteniendo estadísticas: {e}")
             return {}
 
+    def reconcile_statistics(self) -> Dict[str, Any]:
+        """Reconstruye el resumen de estadísticas desde cero y reporta la deriva"""
+        try:
+            result = self._stats_summary.rebuild()
+            self.query_cache.invalidate()
+            self._data_version.bump()
+            return result
+        except Exception as e:
+            logger.error(f"❌ Error reconciliando estadísticas: {e}")
+            raise
+
     def delete_records(self, ids: List[int]) -> bool:
         """Elimina múltiples registros por sus IDs"""
         try:
             collection = self.get_collection()
 
-            result = collection.delete_many({"id": {"$in": ids}})
+            # Leer antes las imágenes de los documentos para descontarlas de las estadísticas
+            targets = list(collection.find({"id": {"$in": ids}}, PREVIOUS_IMAGE_PROJECTION))
+            if not targets:
+                logger.warning(f"⚠️ No se encontraron proyectos con los IDs proporcionados")
+                return False
+
+            result = collection.delete_many({"_id": {"$in": [doc["_id"] for doc in targets]}})
+            # Una lápida por documento leído: si otro proceso ya borró alguno, la lápida queda repetida
+            self._tombstones.record(targets)
+            self._publish_changes("deleted", targets)
+            if result.deleted_count == len(targets):
+                self._record_write(removed=targets)
+            else:
+                # Otro proceso borró parte de los documentos entre la lectura y el borrado
+                logger.warning("⚠️ Borrado concurrente detectado, reconstruyendo estadísticas")
+                self.query_cache.invalidate()
+                self._data_version.bump()
+                self._search_index.update(removed=targets)
+                self._suggestions.invalidate()
+                try:
+                    self._stats_summary.rebuild()
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudieron reconstruir las estadísticas: {e}")
 
             if result.deleted_count > 0:
                 logger.info(f"🗑️ Eliminados {result.deleted_count} proyectos")
@@ -323,5 +1194,16 @@ class ProyectoController:
             logger.error(f"❌ Error probando conexión: {e}")
             return False
 
-# Instancia global del controlador
-proyecto_controller = ProyectoController()
\ No newline at end of file
+# Instancia global del controlador, creada al primer uso: importar este módulo no conecta
+# a MongoDB (los procesos que validan importaciones lo cargan sin usarlo)
+_proyecto_controller: Optional[ProyectoController] = None
+_proyecto_controller_lock = threading.Lock()
+
+def get_controller() -> ProyectoController:
+    """Retorna el controlador global, creándolo la primera vez"""
+    global _proyecto_controller
+    if _proyecto_controller is None:
+        with _proyecto_controller_lock:
+            if _proyecto_controller is None:
+                _proyecto_controller = ProyectoController()
+    return _proyecto_controller
@@ -0,0 +1,1059 @@
+import codecs
+import csv
+import hashlib
+import io
+import itertools
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from controllers.validacion import MAX_VALIDATION_ERRORS, init_validation_worker, process_context, validate_chunk
+from models.proyecto import Proyecto, PROYECTO_FIELDS, STATUS_OPTIONS, SERVICE_FLAGS, fold_text
+
+logger = logging.getLogger(__name__)
+
+# Filas por lote de inserción (la memoria usada depende de esto, no del tamaño del archivo)
+IMPORT_BATCH_SIZE = 1000
+
+# Bytes iniciales del archivo usados para detectar codificación y delimitador
+SNIFF_BYTES = 64 * 1024
+
+# Delimitadores aceptados (Excel en español exporta con ';')
+CSV_DELIMITERS = ",;\t|"
+
+# Errores de filas que se reportan en el resumen (el resto solo se cuentan)
+MAX_REPORTED_ERRORS = 50
+
+# Modos de importación: agregar como nuevos o crear/actualizar por clave
+IMPORT_MODES = ("insert", "upsert")
+
+# Campos que identifican a un proyecto al buscar duplicados (en la colección y en el archivo)
+DUPLICATE_KEYS = ("id", "contrato", "numero_factura")
+
+# Qué hacer con una fila duplicada: omitirla, sobrescribir el existente o importarla e informarla
+DUPLICATE_POLICIES = ("skip", "overwrite", "report")
+
+# Validación sin escribir (dry run): procesos y filas por tarea
+VALIDATION_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+VALIDATION_CHUNK_SIZE = 5000
+
+# Mapeo EXACTO de nombres de columnas CSV a nombres de campos internos
+COLUMN_MAPPING = {
+    # Campos básicos - EXACTOS del CSV
+    'id': 'id',
+    'contrato': 'contrato',
+    'cliente': 'cliente',
+    'fecha_inicio': 'fecha_inicio',
+    'fecha_término': 'fecha_termino',  # Con acento como en CSV
+    'duración': 'duracion',           # Con acento como en CSV
+    'región': 'region',               # Con acento como en CSV
+    'ciudad': 'ciudad',
+    'estado': 'estado',
+    'monto': 'monto',
+
+    # Información del cliente - EXACTOS del CSV
+    'rut_cliente': 'rut_cliente',
+    'tipo_cliente': 'tipo_cliente',
+    'persona_contacto': 'persona_contacto',
+    'telefono_contacto': 'telefono_contacto',
+    'correo_contacto': 'correo_contacto',
+
+    # Información técnica - EXACTOS del CSV
+    'superficie_terreno': 'superficie_terreno',
+    'superficie_construida': 'superficie_construida',
+    'tipo_obra_lista': 'tipo_obra_lista',
+
+    # Estudios y servicios - EXACTOS del CSV
+    'ems': 'ems',
+    'estudio_sismico': 'estudio_sismico',
+    'estudio_geoeléctrico': 'estudio_geoelectrico',  # Con acento como en CSV
+    'topografía': 'topografia',                      # Con acento como en CSV
+    'sondaje': 'sondaje',
+    'hidráulica/hidrología': 'hidraulica_hidrologia', # Con acentos y / como en CSV
+    'descripción': 'descripcion',                     # Con acento como en CSV
+
+    # Documentos - EXACTOS del CSV
+    'certificado_experiencia': 'certificado_experiencia',
+    'orden_compra': 'orden_compra',
+    'contrato_existe': 'contrato_doc',
+    'factura': 'factura',
+    'fecha_factura': 'fecha_factura',
+    'numero_factura': 'numero_factura',
+    'numero_orden_compra': 'numero_orden_compra',
+    'link_documentos': 'link_documentos',
+
+    # Variaciones alternativas (por si acaso)
+    'fecha_termino': 'fecha_termino',
+    'duracion': 'duracion',
+    'region': 'region',
+    'estudio_geoelectrico': 'estudio_geoelectrico',
+    'topografia': 'topografia',
+    'hidraulica_hidrologia': 'hidraulica_hidrologia',
+    'descripcion': 'descripcion',
+    'contrato_doc': 'contrato_doc'
+}
+
+# Mismo mapeo indexado sin tildes, para encabezados escritos con o sin ellas
+_FOLDED_COLUMN_MAPPING = {fold_text(name): field for name, field in COLUMN_MAPPING.items()}
+
+def normalize_column_name(column_name):
+    """Normaliza nombres de columnas CSV para mapeo consistente"""
+    if not column_name:
+        return ''
+
+    # Normalizar el nombre de la columna
+    normalized = column_name.lower().strip()
+    if normalized in COLUMN_MAPPING:
+        return COLUMN_MAPPING[normalized]
+    # Encabezados con espacios o sin tildes ("Fecha Termino", "Region")
+    folded = fold_text(normalized).replace(' ', '_')
+    return _FOLDED_COLUMN_MAPPING.get(folded, normalized)
+
+def parse_estado(value) -> str:
+    """Mapea variaciones de estado ("activo", "completed", ...) a STATUS_OPTIONS"""
+    estado = str(value or '').strip().lower()
+    if not estado:
+        return 'Activo'
+    if 'activ' in estado:
+        return 'Activo'
+    if 'complet' in estado or 'finish' in estado or 'done' in estado:
+        return 'Completado'
+    if 'pend' in estado or 'wait' in estado:
+        return 'Pendiente'
+    capitalized = estado.capitalize()
+    return capitalized if capitalized in STATUS_OPTIONS else 'Activo'
+
+# ===== CONVERSIÓN POR COLUMNAS =====
+
+# Tipo de conversión de cada campo (los que no aparecen son texto)
+FIELD_KINDS = {
+    "id": "id",
+    "duracion": "integer",
+    "monto": "decimal",
+    "superficie_terreno": "decimal",
+    "superficie_construida": "decimal",
+    "fecha_inicio": "date",
+    "fecha_termino": "date",
+    "fecha_factura": "date",
+    "estado": "estado",
+    **{flag: "boolean" for flag in SERVICE_FLAGS}
+}
+
+# Valores por defecto de un campo vacío (si no está, el default del esquema)
+EMPTY_VALUES = {"monto": 0}
+
+# Valores que se consideran celda vacía
+NULL_TOKENS = frozenset(['', 'null', 'none'])
+
+# Filas de muestra usadas para inferir el formato de cada columna
+SAMPLE_ROWS = 500
+
+# Valores distintos recordados por columna entre lotes (fechas repetidas)
+MAX_MEMO_VALUES = 50000
+
+# Vocabulario booleano conocido
+TRUE_TOKENS = frozenset(['true', '1', 'sí', 'si', 'yes', 'y', 's', 'verdadero', 'x'])
+FALSE_TOKENS = frozenset(['false', '0', 'no', 'n', 'falso'])
+
+# Formatos de fecha aceptados, en orden de prioridad ante ambigüedad (día antes que mes).
+# Cada uno es (nombre, regex, posiciones de año, mes y día en los grupos); se admite
+# una hora al final, que se descarta
+_TIME_SUFFIX = r'(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$'
+DATE_LAYOUTS = [
+    ('%Y-%m-%d', re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})' + _TIME_SUFFIX), (0, 1, 2)),
+    ('%d/%m/%Y', re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})' + _TIME_SUFFIX), (2, 1, 0)),
+    ('%d-%m-%Y', re.compile(r'(\d{1,2})-(\d{1,2})-(\d{4})' + _TIME_SUFFIX), (2, 1, 0)),
+    ('%m/%d/%Y', re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})' + _TIME_SUFFIX), (2, 0, 1)),
+    ('%Y/%m/%d', re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2})' + _TIME_SUFFIX), (0, 1, 2)),
+    ('%d.%m.%Y', re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})' + _TIME_SUFFIX), (2, 1, 0)),
+]
+_DATE_LAYOUTS_BY_NAME = {layout[0]: layout for layout in DATE_LAYOUTS}
+
+# Caracteres que no forman parte de un número ($, espacios, "CLP", ...)
+_NUMBER_JUNK = re.compile(r'[^\d,.\-]')
+_THOUSANDS_PATTERNS = {
+    ',': re.compile(r'-?\d{1,3}(?:,\d{3})+$'),
+    '.': re.compile(r'-?\d{1,3}(?:\.\d{3})+$'),
+}
+
+def _is_null(value) -> bool:
+    return value is None or (isinstance(value, str) and value.strip().lower() in NULL_TOKENS)
+
+def _parse_layout_date(value: str, layout):
+    match = layout[1].match(value)
+    if match is None:
+        return None
+    parts = match.groups()
+    year, month, day = layout[2]
+    try:
+        return datetime(int(parts[year]), int(parts[month]), int(parts[day]))
+    except ValueError:
+        return None
+
+def infer_date_layout(samples: List[str]) -> str:
+    """El formato de fecha que reconoce más valores de la muestra"""
+    best, best_matches = DATE_LAYOUTS[0][0], 0
+    for layout in DATE_LAYOUTS:
+        matches = sum(1 for value in samples if _parse_layout_date(value, layout))
+        if matches > best_matches:
+            best, best_matches = layout[0], matches
+    return best
+
+def infer_decimal_layout(samples: List[str]) -> Tuple[str, str]:
+    """Separadores (miles, decimal) de una columna numérica: "1.234,5", "1,234.5" o "1234.5" """
+    cleaned = [_NUMBER_JUNK.sub('', value) for value in samples]
+    both = [value for value in cleaned if ',' in value and '.' in value]
+    if both:
+        # El separador que aparece al final es el decimal
+        comma_last = sum(1 for value in both if value.rfind(',') > value.rfind('.'))
+        return ('.', ',') if comma_last * 2 >= len(both) else (',', '.')
+
+    for separator, other in ((',', '.'), ('.', ',')):
+        with_separator = [value for value in cleaned if separator in value]
+        if not with_separator:
+            continue
+        thousands = all(_THOUSANDS_PATTERNS[separator].match(value) for value in with_separator)
+        # "1.500" es ambiguo: el punto se toma como miles solo si algún valor tiene dos grupos
+        if separator == '.' and thousands:
+            thousands = any(value.count('.') > 1 for value in with_separator)
+        if thousands:
+            return (separator, other)
+        return ('', separator)
+    return ('', '.')
+
+def infer_boolean_layout(samples: List[str]) -> Optional[Tuple[str, ...]]:
+    """Valores verdaderos de una columna booleana.
+
+    Retorna None si la columna usa un vocabulario propio sin valores falsos
+    conocidos (p. ej. "X" o vacío): cualquier valor no vacío cuenta como verdadero.
+    """
+    tokens = {value.strip().lower() for value in samples}
+    unknown = tokens - TRUE_TOKENS - FALSE_TOKENS
+    if unknown and not tokens & FALSE_TOKENS:
+        return None
+    return tuple(sorted(TRUE_TOKENS))
+
+class ColumnConverter:
+    """Conversor de una columna con su formato ya inferido.
+
+    Solo guarda datos simples (campo, tipo y formato), así que se puede enviar
+    a otros procesos. `convert` recibe la columna completa de un lote y retorna
+    los valores convertidos y las posiciones que no calzan con el formato.
+    """
+
+    __slots__ = ("field", "kind", "layout", "_memo")
+
+    def __init__(self, field: str, kind: str, layout=None):
+        self.field = field
+        self.kind = kind
+        self.layout = layout
+        self._memo = {}  # valor crudo -> (convertido, calza), compartido entre lotes
+
+    def __getstate__(self):
+        return (self.field, self.kind, self.layout)
+
+    def __setstate__(self, state):
+        self.field, self.kind, self.layout = state
+        self._memo = {}
+
+    @classmethod
+    def infer(cls, field: str, samples: List[str]) -> 'ColumnConverter':
+        """Crea el conversor de `field` infiriendo el formato desde valores de muestra"""
+        kind = FIELD_KINDS.get(field, "text")
+        samples = [value.strip() for value in samples if isinstance(value, str) and not _is_null(value)]
+        if kind == "date":
+            return cls(field, kind, infer_date_layout(samples))
+        if kind in ("decimal", "integer"):
+            return cls(field, kind, infer_decimal_layout(samples))
+        if kind == "boolean":
+            return cls(field, kind, infer_boolean_layout(samples))
+        return cls(field, kind)
+
+    def describe(self) -> str:
+        if self.kind == "decimal" or self.kind == "integer":
+            thousands, decimal = self.layout
+            return f"{self.kind} (miles '{thousands}', decimal '{decimal}')"
+        if self.kind == "boolean":
+            return "boolean (no vacío = verdadero)" if self.layout is None else "boolean"
+        if self.kind == "date":
+            return f"date {self.layout}"
+        return self.kind
+
+    def convert(self, values) -> Tuple[list, List[int]]:
+        return getattr(self, f"_convert_{self.kind}")(values)
+
+    def _convert_text(self, values):
+        try:
+            # Desde un CSV todas las celdas son texto
+            return [value.strip() for value in values], []
+        except AttributeError:
+            return [value.strip() if isinstance(value, str) else ('' if value is None else value)
+                    for value in values], []
+
+    def _convert_estado(self, values):
+        return _map_distinct(values, lambda value: (parse_estado(value), True))
+
+    def _convert_date(self, values):
+        layout = _DATE_LAYOUTS_BY_NAME[self.layout]
+
+        def convert_one(value):
+            if isinstance(value, datetime):
+                return value, True
+            if _is_null(value):
+                return None, True
+            date = _parse_layout_date(str(value).strip(), layout)
+            return date, date is not None
+
+        # Las fechas se repiten mucho en un archivo: cada valor distinto se parsea una vez
+        return _map_distinct(values, convert_one, self._memo)
+
+    def _convert_boolean(self, values):
+        true_tokens = None if self.layout is None else frozenset(self.layout)
+
+        def convert_one(value):
+            if isinstance(value, bool):
+                return value, True
+            token = '' if value is None else str(value).strip().lower()
+            if token in NULL_TOKENS or token in FALSE_TOKENS:
+                return False, True
+            if true_tokens is None or token in true_tokens:
+                return True, True
+            return False, False
+
+        return _map_distinct(values, convert_one)
+
+    def _parse_number(self, value):
+        """(número, calza) de una celda según los separadores inferidos"""
+        if _is_null(value):
+            return EMPTY_VALUES.get(self.field), True
+        thousands, decimal = self.layout
+        try:
+            if not isinstance(value, str):
+                number = float(value)
+            else:
+                text = _NUMBER_JUNK.sub('', value)
+                if thousands:
+                    text = text.replace(thousands, '')
+                number = float(text.replace(decimal, '.'))
+        except (ValueError, TypeError):
+            return EMPTY_VALUES.get(self.field), False
+        if not math.isfinite(number):
+            return EMPTY_VALUES.get(self.field), False
+        return (number if self.kind == "decimal" else int(number)), True
+
+    def _convert_decimal(self, values):
+        if self.layout == ('', '.'):
+            try:
+                # Columna completa en formato de Python y sin celdas vacías
+                converted = list(map(float, values))
+                if all(map(math.isfinite, converted)):
+                    return converted, []
+            except (ValueError, TypeError):
+                pass
+        converted, bad = [], []
+        for i, value in enumerate(values):
+            number, ok = self._parse_number(value)
+            if not ok:
+                bad.append(i)
+            converted.append(number)
+        return converted, bad
+
+    def _convert_integer(self, values):
+        # Pocos valores distintos (duración en días)
+        return _map_distinct(values, self._parse_number, self._memo)
+
+    def _convert_id(self, values):
+        try:
+            converted = list(map(int, values))
+            if all(value > 0 for value in converted):
+                return converted, []
+        except (ValueError, TypeError):
+            pass
+        converted, bad = [], []
+        for i, value in enumerate(values):
+            if isinstance(value, int):
+                converted.append(value)
+            elif isinstance(value, str) and value.strip().isdigit():
+                converted.append(int(value))
+            else:
+                if not _is_null(value):
+                    bad.append(i)
+                converted.append(None)
+        return converted, bad
+
+def _map_distinct(values, convert_one, memo: Optional[dict] = None) -> Tuple[list, List[int]]:
+    """Convierte cada valor distinto una sola vez; `convert_one` retorna (valor, calza).
+
+    Con `memo` los valores ya vistos en lotes anteriores no se vuelven a convertir.
+    """
+    if memo is None:
+        memo = {}
+    elif len(memo) > MAX_MEMO_VALUES:
+        memo.clear()
+    mapping, failed = {}, set()
+    for value in set(values):
+        result = memo.get(value)
+        if result is None:
+            result = memo[value] = convert_one(value)
+        mapping[value] = result[0]
+        if not result[1]:
+            failed.add(value)
+    converted = [mapping[value] for value in values]
+    bad = [i for i, value in enumerate(values) if value in failed] if failed else []
+    return converted, bad
+
+class ImportPlan:
+    """Conversión compilada de un archivo: un ColumnConverter por columna reconocida.
+
+    Se construye una vez con el encabezado y una muestra de filas y luego
+    convierte lotes completos columna por columna.
+    """
+
+    def __init__(self, columns: List[str], converters: List[Optional[ColumnConverter]]):
+        self.columns = columns
+        self.converters = converters
+
+    @classmethod
+    def compile(cls, columns: List[str], sample_rows: List[list]) -> 'ImportPlan':
+        """`columns` son los nombres de campo ya normalizados; las columnas desconocidas se ignoran"""
+        sample_rows = sample_rows[:SAMPLE_ROWS]
+        converters = []
+        for position, field in enumerate(columns):
+            if field not in PROYECTO_FIELDS or field in ('_id', 'created_at', 'updated_at'):
+                converters.append(None)
+                continue
+            samples = [row[position] for row in sample_rows if position < len(row)]
+            converters.append(ColumnConverter.infer(field, samples))
+        return cls(columns, converters)
+
+    def describe(self) -> Dict[str, str]:
+        """Formato inferido de cada columna (para el resumen de la importación)"""
+        return {converter.field: converter.describe() for converter in self.converters if converter}
+
+    def convert_batch(self, rows: List[list], first_row: int = 2) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Convierte un lote de filas; retorna (registros, celdas que no calzan con el formato).
+
+        Las celdas que no calzan quedan vacías (None o el valor por defecto) y se
+        reportan con su número de fila, campo y valor original.
+        """
+        width = len(self.columns)
+        # Completar filas cortas para poder transponer el lote
+        rows = [row if len(row) >= width else list(row) + [''] * (width - len(row)) for row in rows]
+        cells = list(zip(*rows)) if rows else []
+
+        fields, columns, mismatches = [], [], []
+        for position, converter in enumerate(self.converters):
+            if converter is None or position >= len(cells):
+                continue
+            values, bad = converter.convert(cells[position])
+            fields.append(converter.field)
+            columns.append(values)
+            for i in bad:
+                mismatches.append({"row": first_row + i, "field": converter.field, "value": cells[position][i]})
+
+        # Volver a filas: un dict por fila armado desde las columnas convertidas
+        records = [dict(zip(fields, values)) for values in zip(*columns)] if columns else [{} for _ in rows]
+        return records, mismatches
+
+def provided_values(plan: ImportPlan, rows: List[list], records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Valores de cada registro cuya celda original no está vacía.
+
+    Una celda vacía se convierte a None o al valor por defecto del campo (monto 0,
+    servicios False, estado "Activo"): al actualizar un proyecto existente esos
+    valores no deben escribirse sobre los que ya tiene.
+    """
+    positions = [(position, converter.field) for position, converter in enumerate(plan.converters)
+                 if converter is not None]
+    provided = []
+    for row, record in zip(rows, records):
+        blank = {field for position, field in positions if position >= len(row) or _is_null(row[position])}
+        provided.append({field: value for field, value in record.items() if field not in blank})
+    return provided
+
+def convert_records(items: List[Dict[str, Any]]) -> Tuple[List[Proyecto], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Convierte registros con columnas CSV (p. ej. JSON de bulk-import) en Proyectos.
+
+    Retorna (proyectos, celdas que no calzan con el formato inferido de su columna,
+    valores que trae cada registro; ver provided_values).
+    """
+    columns = []
+    for item in items[:SAMPLE_ROWS]:
+        for key in item:
+            if key not in columns:
+                columns.append(key)
+    rows = [[item.get(key) for key in columns] for item in items]
+    plan = ImportPlan.compile([normalize_column_name(key) for key in columns], rows)
+    records, mismatches = plan.convert_batch(rows, first_row=1)
+    return [Proyecto(**record) for record in records], mismatches, provided_values(plan, rows, records)
+
+# ===== LECTURA DE CSV POR STREAMING =====
+
+class _PrefixedStream(io.RawIOBase):
+    """Stream binario que entrega primero los bytes ya leídos para la detección y luego el resto"""
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def detect_encoding(sample: bytes) -> str:
+    """UTF-8 (con o sin BOM) si la muestra lo es; si no, Windows-1252 (Latin-1 de Excel)"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # Un carácter multibyte puede quedar cortado al final de la muestra
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+def detect_delimiter(sample: str) -> str:
+    """Detecta el delimitador con csv.Sniffer; si falla, el más frecuente en el encabezado"""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        header = sample.split('\n', 1)[0]
+        return max(CSV_DELIMITERS, key=header.count)
+
+def open_csv(stream) -> Tuple[Iterator[List[str]], str, str]:
+    """Abre un stream binario como lector CSV detectando codificación y delimitador.
+
+    Solo se leen SNIFF_BYTES por adelantado; el resto se decodifica y parsea a
+    medida que se consume. Retorna (lector, codificación, delimitador).
+    """
+    sample = stream.read(SNIFF_BYTES)
+    encoding = detect_encoding(sample)
+    sample_text = sample.decode(encoding, errors='ignore')
+    delimiter = detect_delimiter(sample_text)
+
+    raw = io.BufferedReader(_PrefixedStream(sample, stream))
+    # cp1252 no define algunos bytes: se reemplazan en vez de abortar la importación
+    text = io.TextIOWrapper(raw, encoding=encoding, errors='replace', newline='')
+    return csv.reader(text, delimiter=delimiter), encoding, delimiter
+
+def iter_csv_batches(reader: Iterator[List[str]], batch_size: int) -> Iterator[Tuple[int, List[list]]]:
+    """Agrupa las filas en lotes (número de la primera fila, filas), omitiendo filas vacías"""
+    batch, first_row = [], 2
+    for row_number, row in enumerate(reader, start=2):
+        if not any(value.strip() for value in row):
+            continue
+        if not batch:
+            first_row = row_number
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield first_row, batch
+            batch = []
+    if batch:
+        yield first_row, batch
+
+def _key_value(record: Dict[str, Any], field: str):
+    """Valor comparable de una clave de duplicados (None si viene vacía)"""
+    value = record.get(field)
+    if value is None:
+        return None
+    if field == "id":
+        return int(value) if str(value).strip().isdigit() else None
+    value = str(value).strip()
+    return value or None
+
+class DuplicateDetector:
+    """Detecta filas duplicadas por id, contrato o número de factura.
+
+    Contra la colección: una consulta $in por tipo de clave y lote (no una por
+    fila). Dentro del archivo: un diccionario por clave con la fila donde apareció
+    cada valor, así el costo total es O(n). `policy` decide qué pasa con una fila
+    duplicada: "skip" la omite, "overwrite" actualiza el proyecto existente (o
+    reemplaza la fila anterior del mismo lote) y "report" la importa igual.
+    """
+
+    def __init__(self, controller, policy: str = "skip", keys=DUPLICATE_KEYS):
+        self.controller = controller
+        self.policy = policy
+        self.keys = keys
+        self.seen: Dict[str, Dict[Any, int]] = {key: {} for key in keys}
+
+    def resolve(self, entries: List[tuple], summary: Dict[str, Any], report) -> Tuple[List[tuple], List[tuple]]:
+        """Separa las filas (registro, fila, _id, ...) de un lote en (a insertar, a sobrescribir).
+
+        Las filas a sobrescribir traen el id del proyecto existente y solo los valores
+        de la fila de origen (entry[4], ver provided_values; sin él, los del registro).
+        """
+        candidates = {key: [_key_value(entry[0], key) for entry in entries] for key in self.keys}
+        existing = self.controller.find_existing_keys(candidates)
+
+        to_insert: List[tuple] = []
+        to_overwrite: List[tuple] = []
+        pending: Dict[int, int] = {}  # fila -> posición en to_insert (para reemplazarla)
+        for entry in entries:
+            record, row, object_id = entry[:3]
+            values = {key: _key_value(record, key) for key in self.keys}
+            in_collection, in_file = {}, {}
+            for key, value in values.items():
+                if value is None:
+                    continue
+                # Un documento con el _id de esta misma fila viene de un intento anterior (no es duplicado)
+                matches = [match for match in existing[key].get(value, ()) if match["_id"] != object_id]
+                if matches:
+                    in_collection[key] = matches
+                elif value in self.seen[key]:
+                    in_file[key] = self.seen[key][value]
+
+            if not in_collection and not in_file:
+                pending[row] = len(to_insert)
+                to_insert.append(entry)
+                self._remember(values, row)
+                continue
+
+            summary["duplicates"] += 1
+            conflict = self._describe(values, in_collection, in_file)
+
+            if self.policy == "report":
+                report({"row": row, **conflict, "error": f"Duplicado importado igual: {conflict['error']}"})
+                pending[row] = len(to_insert)
+                to_insert.append(entry)
+                self._remember(values, row)
+            elif self.policy == "overwrite" and in_collection:
+                # Sobrescribir exige un único proyecto existente para todas las claves de la fila
+                targets = {match["_id"]: match["id"] for matches in in_collection.values() for match in matches}
+                if len(targets) > 1 or None in targets.values():
+                    summary["skipped"] += 1
+                    report({"row": row, **conflict, "error": f"Duplicado ambiguo, omitido: {conflict['error']}"})
+                    continue
+                # Como en modo upsert, las celdas vacías no borran lo que ya tiene el proyecto
+                # y las fechas de creación y actualización no vienen del archivo
+                source = entry[4] if len(entry) > 4 else record
+                values_to_write = {field: value for field, value in source.items()
+                                   if field not in ('_id', 'created_at', 'updated_at')}
+                to_overwrite.append(({**values_to_write, "id": targets.popitem()[1]}, row, object_id))
+                self._remember(values, row)
+            elif self.policy == "overwrite" and all(first in pending for first in in_file.values()):
+                # La fila anterior es de este mismo lote y aún no se escribe: gana la última
+                positions = {pending.pop(first) for first in in_file.values()}
+                position = positions.pop()
+                for extra in positions:
+                    to_insert[extra] = None
+                for first in in_file.values():
+                    report({"row": first, "error": f"Reemplazada por la fila {row} (duplicada en el archivo)"})
+                pending[row] = position
+                to_insert[position] = entry
+                self._remember(values, row)
+            else:
+                summary["skipped"] += 1
+                report({"row": row, **conflict, "error": f"Duplicado omitido: {conflict['error']}"})
+
+        return [entry for entry in to_insert if entry is not None], to_overwrite
+
+    def _remember(self, values: Dict[str, Any], row: int):
+        for key, value in values.items():
+            if value is not None:
+                self.seen[key][value] = row
+
+    @staticmethod
+    def _describe(values, in_collection, in_file) -> Dict[str, Any]:
+        if in_collection:
+            key = next(iter(in_collection))
+            existing_ids = list(dict.fromkeys(match["id"] for matches in in_collection.values() for match in matches))
+            errors = []
+            for field, matches in in_collection.items():
+                ids = ", ".join(str(match["id"]) for match in matches)
+                errors.append(f"{field} {values[field]!r} ya existe (proyecto{'s' if len(matches) > 1 else ''} {ids})")
+            return {"field": key, "value": values[key], "existing_id": existing_ids[0], "existing_ids": existing_ids,
+                    "error": "; ".join(errors)}
+        key, first = next(iter(in_file.items()))
+        return {"field": key, "value": values[key], "duplicate_of_row": first,
+                "error": f"{key} {values[key]!r} repite la fila {first}"}
+
+def _insert_batch(controller, records, first_row, summary, report, object_ids=None, detector=None,
+                  provided=None):
+    """Modo insert: valida cada registro e inserta los válidos como proyectos nuevos.
+
+    Con `object_ids` (uno por registro) la inserción es idempotente. Con `detector`
+    (DuplicateDetector) las filas duplicadas se omiten, sobrescriben o informan
+    según su política; al sobrescribir solo se escriben los valores de `provided`
+    (uno por registro, ver provided_values). Si se pierde la conexión lanza
+    RuntimeError para que el lote no quede confirmado.
+    """
+    entries = []
+    for offset, record in enumerate(records):
+        if not record.get('contrato'):
+            summary["skipped"] += 1
+            report({"row": first_row + offset, "error": "Falta el contrato"})
+            continue
+        proyecto = Proyecto(**record)
+        is_valid, errors = proyecto.validate()
+        if not is_valid:
+            summary["skipped"] += 1
+            report({"row": first_row + offset, "error": "; ".join(errors)})
+            continue
+        entries.append((record, first_row + offset, object_ids[offset] if object_ids else None, proyecto,
+                        provided[offset] if provided is not None else record))
+
+    to_overwrite = []
+    if detector is not None and entries:
+        entries, to_overwrite = detector.resolve(entries, summary, report)
+
+    if to_overwrite:
+        result = controller.upsert_proyectos([entry[0] for entry in to_overwrite], key="id",
+                                             rows=[entry[1] for entry in to_overwrite])
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        summary["overwritten"] += result["changed"] + result["unchanged"]
+        summary["skipped"] += len(result["skipped"])
+        summary["failed"] += len(result["failed"])
+        for failure in result["failed"]:
+            report(failure)
+
+    if entries:
+        batch = [entry[3] for entry in entries]
+        batch_rows = [entry[1] for entry in entries]
+        batch_ids = [entry[2] for entry in entries]
+        result = controller.bulk_insert_proyectos(batch, batch_rows, batch_ids)
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        # Las filas que ya estaban (intento anterior del mismo archivo) cuentan como importadas
+        summary["imported"] += result["inserted"] + result["already_present"]
+        summary["skipped"] += len(result["skipped"])
+        summary["failed"] += len(result["failed"])
+        for failure in result["failed"]:
+            report(failure)
+
+def _upsert_batch(controller, plan, rows, records, first_row, summary, report, key, dry_run):
+    """Modo upsert: crea o actualiza por clave escribiendo solo las columnas del archivo.
+
+    Las celdas vacías no se escriben: una columna en blanco no borra el valor existente.
+    """
+    records = provided_values(plan, rows, records)
+
+    row_numbers = list(range(first_row, first_row + len(records)))
+    result = controller.upsert_proyectos(records, key=key, dry_run=dry_run, rows=row_numbers)
+    if result.get("error"):
+        raise RuntimeError(result["error"])
+
+    for counter in ("new", "changed", "unchanged"):
+        summary[counter] += result[counter]
+    summary["imported"] += result["written"]
+    summary["skipped"] += len(result["skipped"])
+    summary["failed"] += len(result["failed"])
+    for skipped in result["skipped"]:
+        report({"row": skipped["row"], "error": "; ".join(skipped["errors"])})
+    for failure in result["failed"]:
+        report(failure)
+    summary["changes"].extend(result["changes"][:MAX_REPORTED_ERRORS - len(summary["changes"])])
+
+def check_import_options(mode: str, dry_run: bool, duplicates: str = "skip"):
+    """Valida el modo de importación; lanza ValueError con opciones inválidas"""
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Modo de importación inválido: {mode}. Opciones: {', '.join(IMPORT_MODES)}")
+    if duplicates not in DUPLICATE_POLICIES:
+        raise ValueError(f"Política de duplicados inválida: {duplicates}. Opciones: {', '.join(DUPLICATE_POLICIES)}")
+
+def save_upload(stream, target, chunk_size: int = 1024 * 1024) -> str:
+    """Copia un stream binario a `target` y retorna el SHA-256 del contenido"""
+    digest = hashlib.sha256()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return digest.hexdigest()
+        digest.update(chunk)
+        target.write(chunk)
+
+def checkpoint_mode(mode: str, key: str) -> str:
+    """Modo con el que se identifica el punto de control (un upsert por id no retoma uno por RUT)"""
+    return f"{mode}-{key}" if mode == "upsert" else mode
+
+def import_csv(controller, stream, batch_size: int = IMPORT_BATCH_SIZE, mode: str = "insert",
+               key: str = "id", dry_run: bool = False,
+               on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+               checkpoint=None, duplicates: str = "skip") -> Dict[str, Any]:
+    """Importa un CSV desde un stream binario procesando lotes de `batch_size` filas.
+
+    El formato de cada columna (fechas, decimales, booleanos) se infiere una vez
+    con el primer lote y luego cada lote se convierte columna por columna. Las
+    celdas que no calzan con el formato de su columna quedan vacías y se reportan.
+
+    `mode` "insert" agrega todas las filas como proyectos nuevos; "upsert" crea o
+    actualiza según `key` (`id` o `contrato_rut`). Con `dry_run` no se escribe nada:
+    en modo upsert se reporta la diferencia (nuevos, con cambios, sin cambios) y
+    en modo insert se validan las filas en paralelo (ver validate_csv). Lanza
+    ValueError con opciones inválidas.
+
+    En modo insert las filas cuyo id, contrato o número de factura ya existe (en
+    la colección o antes en el archivo) se tratan según `duplicates`: "skip",
+    "overwrite" o "report" (ver DuplicateDetector).
+
+    `on_batch(summary)` se llama después de cada lote (progreso de un trabajo en
+    segundo plano); si lanza una excepción la importación se detiene ahí.
+
+    Con `checkpoint` (ImportCheckpoint del archivo) cada lote escrito queda
+    confirmado; si el mismo archivo se importó a medias, los lotes confirmados
+    se saltan y los _id deterministas evitan duplicar filas del lote interrumpido.
+    """
+    check_import_options(mode, dry_run, duplicates)
+    detector = DuplicateDetector(controller, duplicates) if mode == "insert" else None
+    if dry_run and mode == "insert":
+        return validate_csv(stream, on_batch=on_batch, detector=detector)
+    if checkpoint is not None:
+        batch_size = checkpoint.batch_size
+
+    reader, encoding, delimiter = open_csv(stream)
+    logger.info(f"📥 Importando CSV en modo {mode} (codificación {encoding}, delimitador {delimiter!r})")
+
+    summary = {
+        "mode": mode,
+        "rows": 0,
+        "imported": 0,
+        "skipped": 0,
+        "mismatches": 0,
+        "failed": 0,
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "formats": {},
+        "errors": []
+    }
+    if mode == "upsert":
+        summary.update({"key": key, "dry_run": dry_run, "new": 0, "changed": 0, "unchanged": 0, "changes": []})
+    else:
+        summary.update({"duplicate_policy": duplicates, "duplicates": 0, "overwritten": 0})
+    if checkpoint is not None:
+        # Los contadores de un intento anterior siguen valiendo para las filas ya confirmadas
+        summary.update(checkpoint.counters)
+        summary["resumed_rows"] = checkpoint.rows_committed
+
+    def report(error):
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append(error)
+
+    try:
+        header = next(reader, None)
+        if not header:
+            return summary
+        columns = [normalize_column_name(name) for name in header]
+
+        plan = None
+        for first_row, rows in iter_csv_batches(reader, batch_size):
+            if plan is None:
+                plan = ImportPlan.compile(columns, rows)
+                summary["formats"] = plan.describe()
+                logger.info(f"🧭 Formatos inferidos: {summary['formats']}")
+
+            row_index = summary["rows"]
+            summary["rows"] += len(rows)
+            if checkpoint is not None and summary["rows"] <= checkpoint.rows_committed:
+                # Lote confirmado en un intento anterior
+                if on_batch:
+                    on_batch(summary)
+                continue
+
+            records, mismatches = plan.convert_batch(rows, first_row)
+            summary["mismatches"] += len(mismatches)
+            for mismatch in mismatches:
+                report({**mismatch, "error": "El valor no calza con el formato de la columna"})
+
+            if mode == "upsert":
+                _upsert_batch(controller, plan, rows, records, first_row, summary, report, key, dry_run)
+            else:
+                object_ids = ([checkpoint.object_id(row_index + offset) for offset in range(len(records))]
+                              if checkpoint is not None else None)
+                provided = provided_values(plan, rows, records) if duplicates == "overwrite" else None
+                _insert_batch(controller, records, first_row, summary, report, object_ids, detector, provided)
+            if checkpoint is not None:
+                checkpoint.commit(summary["rows"], summary)
+            if on_batch:
+                on_batch(summary)
+    except csv.Error as e:
+        raise ValueError(f"CSV inválido cerca de la fila {summary['rows'] + 2}: {e}")
+
+    if checkpoint is not None:
+        checkpoint.complete(summary)
+    logger.info(f"📦 CSV {'simulado' if dry_run else 'importado'}: {summary['imported']} de {summary['rows']} filas "
+                f"({summary['skipped']} omitidas, {summary['failed']} fallidas, "
+                f"{summary['mismatches']} celdas con formato distinto)")
+    return summary
+
+# ===== VALIDACIÓN EN PARALELO (DRY RUN) =====
+
+def validate_csv(stream, workers: int = VALIDATION_WORKERS, chunk_size: int = VALIDATION_CHUNK_SIZE,
+                 on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 detector: Optional[DuplicateDetector] = None) -> Dict[str, Any]:
+    """Valida un CSV sin escribir nada (dry run del modo insert).
+
+    La conversión y la validación de cada bloque de `chunk_size` filas corren en
+    un pool de `workers` procesos; el archivo se sigue leyendo por streaming y
+    solo hay unos pocos bloques en vuelo a la vez. Retorna {rows, valid, invalid,
+    mismatches, errors_by_field, errors: [{row, field, error}], ...}. Con
+    `detector` también cuenta las filas válidas duplicadas (`duplicates`).
+    """
+    started = time.perf_counter()
+    reader, encoding, delimiter = open_csv(stream)
+    summary = {
+        "mode": "insert",
+        "dry_run": True,
+        "rows": 0,
+        "valid": 0,
+        "invalid": 0,
+        "imported": 0,
+        "skipped": 0,
+        "failed": 0,
+        "mismatches": 0,
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "formats": {},
+        "errors_by_field": {},
+        "duplicates": 0,
+        "errors": [],
+        "workers": 1,
+        "elapsed_seconds": 0.0,
+        "rows_per_second": 0.0
+    }
+    by_field = Counter()
+
+    def merge(result):
+        summary["rows"] += result["rows"]
+        summary["invalid"] += result["invalid"]
+        summary["valid"] = summary["rows"] - summary["invalid"]
+        summary["skipped"] = summary["invalid"]
+        summary["mismatches"] += result["mismatches"]
+        by_field.update(result["by_field"])
+        summary["errors_by_field"] = dict(by_field.most_common())
+        room = MAX_VALIDATION_ERRORS - len(summary["errors"])
+        summary["errors"].extend({"row": row, "field": field, "error": message}
+                                 for row, field, message in result["errors"][:room])
+        if detector is not None and result["keys"]:
+            entries = [(dict(zip(DUPLICATE_KEYS, values)), row, None) for row, *values in result["keys"]]
+            counters = {"duplicates": 0, "skipped": 0}
+            conflicts = []
+            detector.resolve(entries, counters, conflicts.append)
+            summary["duplicates"] += counters["duplicates"]
+            room = MAX_VALIDATION_ERRORS - len(summary["errors"])
+            summary["errors"].extend({"row": conflict["row"], "field": conflict.get("field"),
+                                      "error": conflict["error"]} for conflict in conflicts[:room])
+        if on_batch:
+            on_batch(summary)
+
+    try:
+        header = next(reader, None)
+        if not header:
+            return summary
+        batches = iter_csv_batches(reader, chunk_size)
+        first = next(batches, None)
+        if first is None:
+            return summary
+        plan = ImportPlan.compile([normalize_column_name(name) for name in header], first[1])
+        summary["formats"] = plan.describe()
+
+        second = next(batches, None)
+        if second is None or workers <= 1:
+            # Un solo bloque: iniciar procesos cuesta más que validarlo aquí
+            for first_row, rows in itertools.chain([first], [second] if second else [], batches):
+                merge(validate_chunk(rows, first_row, plan, DUPLICATE_KEYS))
+        else:
+            summary["workers"] = workers
+            with ProcessPoolExecutor(max_workers=workers, mp_context=process_context(),
+                                     initializer=init_validation_worker, initargs=(plan, DUPLICATE_KEYS)) as executor:
+                pending = deque()
+                for first_row, rows in itertools.chain([first, second], batches):
+                    pending.append(executor.submit(validate_chunk, rows, first_row))
+                    # Pocos bloques en vuelo: la memoria no depende del tamaño del archivo
+                    if len(pending) >= workers * 2:
+                        merge(pending.popleft().result())
+                while pending:
+                    merge(pending.popleft().result())
+    except csv.Error as e:
+        raise ValueError(f"CSV inválido cerca de la fila {summary['rows'] + 2}: {e}")
+
+    elapsed = time.perf_counter() - started
+    summary["elapsed_seconds"] = round(elapsed, 3)
+    summary["rows_per_second"] = round(summary["rows"] / elapsed, 1) if elapsed else 0.0
+    logger.info(f"🔎 CSV validado: {summary['valid']} de {summary['rows']} filas válidas, "
+                f"{len(summary['errors'])} errores reportados ({summary['workers']} procesos, "
+                f"{summary['rows_per_second']:,.0f} filas/s)")
+    return summary
+
+# ===== TRABAJOS EN SEGUNDO PLANO =====
+
+def run_csv_import_job(job, controller, path: str, file_hash: Optional[str] = None, **options) -> Dict[str, Any]:
+    """Trabajo de la cola: importa el CSV guardado en `path`.
+
+    El progreso (filas leídas, válidas e insertadas y bytes leídos del archivo
+    para la ETA) se reporta después de cada lote; una cancelación se atiende ahí.
+    Con `file_hash` la importación usa un punto de control: un reintento con el
+    mismo archivo (tras un error o una cancelación) retoma desde el lote siguiente.
+    """
+    checkpoint = None
+    if file_hash and not options.get("dry_run"):
+        mode = checkpoint_mode(options.get("mode", "insert"), options.get("key", "id"))
+        checkpoint = controller.import_checkpoints.open(file_hash, mode, IMPORT_BATCH_SIZE)
+
+    with open(path, 'rb') as csv_file:
+        job.update(bytes_total=os.fstat(csv_file.fileno()).st_size)
+
+        def on_batch(summary):
+            job.errors = summary["errors"]
+            job.update(rows_parsed=summary["rows"], rows_validated=summary["rows"] - summary["skipped"],
+                       rows_inserted=summary["imported"], bytes_read=csv_file.tell())
+
+        summary = import_csv(controller, csv_file, on_batch=on_batch, checkpoint=checkpoint, **options)
+        job.progress["bytes_read"] = job.progress["bytes_total"]
+
+    if summary["rows"] == 0:
+        raise ValueError("El archivo CSV no tiene filas de datos")
+    return summary
+
+def run_bulk_import_job(job, controller, items: List[Dict[str, Any]], file_hash: Optional[str] = None,
+                        batch_size: int = IMPORT_BATCH_SIZE, duplicates: str = "skip") -> Dict[str, Any]:
+    """Trabajo de la cola: convierte e inserta registros JSON (bulk-import) por lotes.
+
+    Con `file_hash` (hash del cuerpo) cada lote queda confirmado como en
+    run_csv_import_job; los duplicados se tratan según `duplicates` como en import_csv.
+    """
+    check_import_options("insert", False, duplicates)
+    checkpoint = controller.import_checkpoints.open(file_hash, "insert", batch_size) if file_hash else None
+    if checkpoint is not None:
+        batch_size = checkpoint.batch_size
+    detector = DuplicateDetector(controller, duplicates)
+
+    proyectos, mismatches, provided = convert_records(items)
+    if mismatches:
+        logger.warning(f"⚠️ {len(mismatches)} valores no calzan con el formato de su columna: {mismatches[:5]}")
+    job.update(rows_total=len(proyectos))
+
+    summary = {"total": len(proyectos), "imported": 0, "skipped": 0, "failed": 0, "mismatches": len(mismatches),
+               "duplicate_policy": duplicates, "duplicates": 0, "overwritten": 0}
+    if checkpoint is not None:
+        summary.update(checkpoint.counters)
+        summary["resumed_rows"] = checkpoint.rows_committed
+
+    for start in range(0, len(proyectos), batch_size):
+        end = min(start + batch_size, len(proyectos))
+        if checkpoint is None or end > checkpoint.rows_committed:
+            records = [proyecto.to_dict() for proyecto in proyectos[start:end]]
+            object_ids = [checkpoint.object_id(index) for index in range(start, end)] if checkpoint else None
+            errors = []
+            _insert_batch(controller, records, start + 1, summary, errors.append, object_ids, detector,
+                          provided[start:end])
+            job.add_errors(errors)
+            if checkpoint is not None:
+                checkpoint.commit(end, summary)
+        job.update(rows_parsed=end, rows_validated=end - summary["skipped"], rows_inserted=summary["imported"])
+
+    if checkpoint is not None:
+        checkpoint.complete(summary)
+    return summary
@@ -0,0 +1,358 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from db.conexion import get_collection
+
+logger = logging.getLogger(__name__)
+
+# Trabajos que corren a la vez. Cada importación usa además BULK_WORKERS hilos
+# para insertar, así que 2 trabajos ocupan a lo más ~8 conexiones del pool de Atlas
+JOB_WORKERS = 2
+
+# Trabajos que pueden esperar en cola además de los que están corriendo
+MAX_QUEUED_JOBS = 20
+
+# Segundos mínimos entre escrituras del progreso en la colección jobs
+JOB_PROGRESS_INTERVAL = 1.0
+
+# Un trabajo en cola o corriendo sin latido en este tiempo quedó huérfano (el proceso se detuvo)
+JOB_STALE_SECONDS = 300
+
+# Cada cuánto el proceso dueño renueva el latido de sus trabajos en cola o corriendo
+# (muy por debajo de JOB_STALE_SECONDS: un trabajo vivo nunca parece huérfano)
+JOB_HEARTBEAT_SECONDS = 60
+
+# Días que se conservan los trabajos terminados (índice TTL sobre finished_at)
+JOB_RETENTION_DAYS = 7
+
+# Errores de filas que se guardan en el registro del trabajo
+MAX_JOB_ERRORS = 50
+
+class JobCancelled(Exception):
+    """Se lanza dentro de un trabajo cuando se pidió cancelarlo"""
+
+class JobQueueFull(RuntimeError):
+    """La cola de trabajos alcanzó MAX_QUEUED_JOBS"""
+
+def parse_job_id(job_id: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(job_id)
+    except (InvalidId, TypeError):
+        return None
+
+class Job:
+    """Manejador que recibe la función de un trabajo para reportar progreso.
+
+    `update` acumula contadores (rows_parsed, rows_validated, rows_inserted, ...)
+    y los persiste a lo más cada JOB_PROGRESS_INTERVAL segundos junto con el
+    throughput actual y el tiempo restante estimado. Cada escritura también lee
+    si se pidió cancelar (desde cualquier proceso): en ese caso lanza JobCancelled.
+    """
+
+    def __init__(self, job_queue: "JobQueue", job_id: ObjectId):
+        self.id = job_id
+        self._queue = job_queue
+        self._cancel = threading.Event()
+        self.progress: Dict[str, Any] = {
+            "rows_parsed": 0, "rows_validated": 0, "rows_inserted": 0,
+            "rows_total": None, "bytes_read": 0, "bytes_total": None,
+            "rows_per_second": 0.0, "eta_seconds": None, "percent": None
+        }
+        self.errors: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+        self._last_flush = 0.0
+        self._last_sample = (self._started, 0)  # (instante, filas leídas) del último cálculo de ritmo
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def start(self):
+        """Marca el inicio de la ejecución (el tiempo en cola no cuenta para el ritmo ni la ETA)"""
+        self._started = time.perf_counter()
+        self._last_sample = (self._started, 0)
+
+    def add_errors(self, errors: List[Dict[str, Any]]):
+        self.errors.extend(errors[:MAX_JOB_ERRORS - len(self.errors)])
+
+    def update(self, force: bool = False, **counters):
+        """Actualiza los contadores; lanza JobCancelled si se pidió cancelar"""
+        self.progress.update(counters)
+        now = time.perf_counter()
+        if force or now - self._last_flush >= JOB_PROGRESS_INTERVAL:
+            self._estimate(now)
+            self._last_flush = now
+            if self._queue.save_progress(self):
+                self._cancel.set()
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _estimate(self, now: float):
+        """Ritmo desde la última escritura y tiempo restante según la fracción avanzada"""
+        rows = self.progress["rows_parsed"]
+        sample_time, sample_rows = self._last_sample
+        if now > sample_time and rows > sample_rows:
+            self.progress["rows_per_second"] = round((rows - sample_rows) / (now - sample_time), 1)
+            self._last_sample = (now, rows)
+
+        # La fracción avanzada sale de los bytes leídos (CSV) o de las filas (JSON)
+        if self.progress.get("bytes_total"):
+            total, done = self.progress["bytes_total"], self.progress["bytes_read"]
+        else:
+            total, done = self.progress.get("rows_total"), rows
+        if total and done:
+            fraction = min(done / total, 1.0)
+            elapsed = now - self._started
+            self.progress["percent"] = round(fraction * 100, 1)
+            self.progress["eta_seconds"] = round(elapsed * (1 - fraction) / fraction, 1)
+
+class JobQueue:
+    """Cola de trabajos en segundo plano con un pool de hilos acotado.
+
+    Cada trabajo queda registrado en la colección `jobs` ({status, progress,
+    errors, result, ...}) para consultarlo desde cualquier proceso. El límite de
+    JOB_WORKERS trabajos simultáneos protege el pool de conexiones de Atlas: una
+    segunda importación espera en cola en vez de competir con la primera.
+    """
+
+    def __init__(self, get_collection, collection_name: str = "jobs", workers: int = JOB_WORKERS,
+                 max_queued: int = MAX_QUEUED_JOBS):
+        self._get_collection = get_collection
+        self.collection_name = collection_name
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._active: Dict[ObjectId, Job] = {}
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._initialize_collection()
+
+    def _jobs(self):
+        return self._get_collection(self.collection_name)
+
+    def _initialize_collection(self):
+        try:
+            jobs = self._jobs()
+            jobs.create_index("finished_at", expireAfterSeconds=JOB_RETENTION_DAYS * 24 * 3600)
+            jobs.create_index([("status", 1), ("heartbeat_at", 1)])
+            self.fail_orphans()
+        except Exception as e:
+            logger.error(f"❌ Error inicializando colección de trabajos: {e}")
+
+    def fail_orphans(self) -> int:
+        """Marca como fallidos los trabajos sin latido reciente (su proceso se detuvo)"""
+        now = datetime.now()
+        stale = now - timedelta(seconds=JOB_STALE_SECONDS)
+        result = self._jobs().update_many(
+            {"status": {"$in": ["queued", "running"]}, "heartbeat_at": {"$lt": stale}},
+            {"$set": {"status": "failed", "error": "El servidor se detuvo antes de terminar el trabajo",
+                      "finished_at": now}}
+        )
+        if result.modified_count:
+            logger.warning(f"⚠️ {result.modified_count} trabajos huérfanos marcados como fallidos")
+        return result.modified_count
+
+    def submit(self, kind: str, func: Callable[[Job], Dict[str, Any]], params: Optional[Dict[str, Any]] = None,
+               user: Optional[str] = None, cleanup: Optional[Callable[[], None]] = None) -> str:
+        """Encola `func(job)` y retorna el id del trabajo; lanza JobQueueFull si la cola está llena.
+
+        `cleanup()` se llama siempre al final, aunque el trabajo se cancele antes de empezar.
+        """
+        with self._lock:
+            if len(self._active) >= self.workers + self.max_queued:
+                raise JobQueueFull(f"Hay {len(self._active)} trabajos pendientes, intente más tarde")
+            job = Job(self, ObjectId())
+            self._active[job.id] = job
+
+        now = datetime.now()
+        try:
+            self._jobs().insert_one({
+                "_id": job.id,
+                "kind": kind,
+                "status": "queued",
+                "params": params or {},
+                "user": user,
+                "created_at": now,
+                "heartbeat_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "cancel_requested": False,
+                "progress": job.progress,
+                "errors": [],
+                "result": None,
+                "error": None
+            })
+        except Exception:
+            with self._lock:
+                self._active.pop(job.id, None)
+            raise
+
+        self._executor.submit(self._run, job, kind, func, cleanup)
+        self._start_heartbeat()
+        logger.info(f"🧵 Trabajo {kind} encolado: {job.id}")
+        return str(job.id)
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat and self._heartbeat.is_alive():
+                return
+
+            def beat():
+                while True:
+                    time.sleep(JOB_HEARTBEAT_SECONDS)
+                    self.heartbeat()
+
+            self._heartbeat = threading.Thread(target=beat, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def heartbeat(self) -> int:
+        """Renueva el latido de los trabajos de este proceso, también los que esperan en cola.
+
+        Un trabajo en cola detrás de importaciones largas solo recibe latido al
+        encolarse; sin esto otra instancia del servidor lo daría por huérfano.
+        """
+        with self._lock:
+            job_ids = list(self._active)
+        if not job_ids:
+            return 0
+        try:
+            result = self._jobs().update_many(
+                {"_id": {"$in": job_ids}, "status": {"$in": ["queued", "running"]}},
+                {"$set": {"heartbeat_at": datetime.now()}}
+            )
+            return result.modified_count
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo renovar el latido de {len(job_ids)} trabajos: {e}")
+            return 0
+
+    def _run(self, job: Job, kind: str, func: Callable[[Job], Dict[str, Any]], cleanup=None):
+        jobs = self._jobs()
+        try:
+            # Si se canceló mientras esperaba en cola ya no está "queued"
+            started = jobs.find_one_and_update(
+                {"_id": job.id, "status": "queued"},
+                {"$set": {"status": "running", "started_at": datetime.now(), "heartbeat_at": datetime.now()}}
+            )
+            if started is None:
+                return
+            job.start()
+
+            status, result, error = "completed", None, None
+            try:
+                result = func(job)
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                status, error = "failed", str(e)
+                logger.error(f"❌ Trabajo {kind} {job.id} falló: {e}")
+
+            job._estimate(time.perf_counter())
+            jobs.update_one({"_id": job.id}, {"$set": {
+                "status": status,
+                "progress": job.progress,
+                "errors": job.errors,
+                "result": result,
+                "error": error,
+                "finished_at": datetime.now(),
+                "heartbeat_at": datetime.now()
+            }})
+            logger.info(f"🏁 Trabajo {kind} {job.id}: {status} ({job.progress['rows_parsed']} filas)")
+        except Exception as e:
+            logger.error(f"❌ Error registrando el trabajo {job.id}: {e}")
+        finally:
+            with self._lock:
+                self._active.pop(job.id, None)
+            if cleanup:
+                try:
+                    cleanup()
+                except Exception as e:
+                    logger.warning(f"⚠️ Error liberando recursos del trabajo {job.id}: {e}")
+
+    def save_progress(self, job: Job) -> bool:
+        """Persiste el progreso de un trabajo; retorna True si se pidió cancelarlo"""
+        try:
+            doc = self._jobs().find_one_and_update(
+                {"_id": job.id},
+                {"$set": {"progress": job.progress, "errors": job.errors, "heartbeat_at": datetime.now()}},
+                projection={"cancel_requested": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            return bool(doc and doc.get("cancel_requested"))
+        except Exception as e:
+            # El trabajo sigue aunque no se pueda informar su progreso
+            logger.warning(f"⚠️ No se pudo guardar el progreso del trabajo {job.id}: {e}")
+            return False
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Estado de un trabajo ({} si no existe)"""
+        oid = parse_job_id(job_id)
+        if oid is None:
+            return {}
+        try:
+            doc = self._jobs().find_one({"_id": oid})
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo trabajo {job_id}: {e}")
+            return {}
+        if not doc:
+            return {}
+        doc["id"] = str(doc.pop("_id"))
+        return doc
+
+    def cancel(self, job_id: str) -> bool:
+        """Pide cancelar un trabajo en cola o corriendo; False si no existe o ya terminó.
+
+        Un trabajo en cola se cancela de inmediato. Uno que está corriendo se
+        detiene al terminar su lote actual; lo ya escrito se conserva.
+        """
+        oid = parse_job_id(job_id)
+        if oid is None:
+            return False
+        try:
+            jobs = self._jobs()
+            queued = jobs.update_one({"_id": oid, "status": "queued"},
+                                     {"$set": {"status": "cancelled", "cancel_requested": True,
+                                               "finished_at": datetime.now()}})
+            if queued.modified_count:
+                logger.info(f"🛑 Trabajo {job_id} cancelado antes de empezar")
+                return True
+
+            running = jobs.update_one({"_id": oid, "status": "running"}, {"$set": {"cancel_requested": True}})
+            with self._lock:
+                job = self._active.get(oid)
+            if job:
+                job.cancel()
+            if running.matched_count:
+                logger.info(f"🛑 Cancelación pedida para el trabajo {job_id}")
+            return bool(running.matched_count)
+        except Exception as e:
+            logger.error(f"❌ Error cancelando trabajo {job_id}: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active": len(self._active), "workers": self.workers, "max_queued": self.max_queued}
+
+# Instancia global de la cola de trabajos, creada al primer uso (al crearla se marcan
+# los trabajos huérfanos, algo que solo debe hacer el proceso del servidor)
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Retorna la cola de trabajos global, creándola la primera vez"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(get_collection)
+    return _job_queue
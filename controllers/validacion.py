@@ -0,0 +1,67 @@
+import multiprocessing
+import sys
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from models.proyecto import Proyecto
+
+# Este módulo es lo que cargan los procesos que validan importaciones: solo importa
+# modelos puros, nunca el servidor, la conexión a MongoDB ni la cola de trabajos.
+
+# Errores de validación reportados por bloque y en el resumen
+MAX_VALIDATION_ERRORS = 1000
+
+# Plan de conversión y campos clave de cada proceso validador (se reciben una vez, al iniciar el proceso)
+_worker_plan = None
+_worker_key_fields: Sequence[str] = ()
+
+def init_validation_worker(plan, key_fields: Sequence[str]):
+    global _worker_plan, _worker_key_fields
+    _worker_plan = plan
+    _worker_key_fields = tuple(key_fields)
+
+def validate_chunk(rows: List[list], first_row: int, plan=None,
+                   key_fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Convierte y valida un bloque de filas con un ImportPlan.
+
+    Retorna contadores, errores (fila, campo, mensaje) y, por cada fila válida,
+    (fila, *valores de `key_fields`) para buscar duplicados en el proceso principal.
+    """
+    plan = plan or _worker_plan
+    key_fields = _worker_key_fields if key_fields is None else key_fields
+    records, mismatches = plan.convert_batch(rows, first_row)
+    errors = [(mismatch["row"], mismatch["field"],
+               f"El valor {mismatch['value']!r} no calza con el formato de la columna")
+              for mismatch in mismatches]
+    invalid, keys = 0, []
+    for offset, record in enumerate(records):
+        if not record.get('contrato'):
+            row_errors = [("contrato", "Falta el contrato")]
+        else:
+            row_errors = Proyecto(**record).validate_fields()
+        if row_errors:
+            invalid += 1
+            errors.extend((first_row + offset, field, message) for field, message in row_errors)
+        else:
+            keys.append((first_row + offset, *(record.get(field) for field in key_fields)))
+
+    by_field = Counter(field for _, field, _ in errors)
+    errors.sort(key=lambda error: error[0])
+    return {"rows": len(rows), "invalid": invalid, "mismatches": len(mismatches),
+            "by_field": dict(by_field), "errors": errors[:MAX_VALIDATION_ERRORS], "keys": keys}
+
+def process_context():
+    """Contexto de procesos para validar.
+
+    Nunca fork: el servidor tiene hilos (Flask, cola de trabajos, pool de MongoDB) y
+    un fork copia sus locks en cualquier estado. forkserver donde existe, precargando
+    solo este módulo; spawn en Windows y en el ejecutable. Los procesos igual
+    reimportan el programa principal como __mp_main__: por eso el controlador y la
+    cola de trabajos se crean al primer uso (get_controller, get_job_queue) y no al
+    importar sus módulos.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods() and not getattr(sys, 'frozen', False):
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
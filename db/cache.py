@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# Tamaño estimado en bytes de un elemento de una lista cacheada (un proyecto hidratado)
+ITEM_SIZE_ESTIMATE = 2048
+
+# Tamaño estimado de un valor que no es bytes ni lista (p. ej. estadísticas)
+VALUE_SIZE_ESTIMATE = 4096
+
+def _key_default(obj):
+    if isinstance(obj, ObjectId):
+        return {"$o": str(obj)}
+    if isinstance(obj, datetime):
+        return {"$d": obj.isoformat()}
+    return repr(obj)
+
+def make_cache_key(*parts) -> str:
+    """Clave estable para una consulta: JSON canónico (claves ordenadas) resumido con SHA-1"""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=_key_default)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def estimate_size(value) -> int:
+    """Tamaño aproximado en memoria de un valor cacheado"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, list):
+        return max(1, len(value)) * ITEM_SIZE_ESTIMATE
+    if isinstance(value, dict) and isinstance(value.get("items"), list):
+        return max(1, len(value["items"])) * ITEM_SIZE_ESTIMATE
+    return VALUE_SIZE_ESTIMATE
+
+class QueryCache:
+    """Caché LRU de resultados de consultas con invalidación por generación.
+
+    Cada escritura incrementa `generation` y descarta las entradas; un resultado
+    calculado durante una escritura no se guarda (su generación ya no coincide).
+    La memoria se limita por cantidad de entradas y por tamaño estimado.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.generation = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # clave -> (valor, tamaño)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        """Retorna el valor cacheado o None (cuenta como acierto o fallo)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value, generation: Optional[int] = None) -> bool:
+        """Guarda un valor; si se indica `generation` y ya cambió, no se guarda"""
+        size = estimate_size(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if size > self.max_bytes:
+                return False
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]):
+        """Retorna el valor cacheado o lo calcula con `loader` y lo guarda.
+
+        Si `loader` lanza una excepción no se guarda nada y la excepción se propaga.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self.generation
+        value = loader()
+        self.put(key, value, generation)
+        return value
+
+    def invalidate(self):
+        """Descarta todas las entradas (se llama después de cada escritura)"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores para ajustar el tamaño de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "watching_changes": bool(self._watcher and self._watcher.is_alive())
+            }
+
+    def watch(self, collection, retry_seconds: int = 30, on_change: Optional[Callable[[], Any]] = None) -> bool:
+        """Invalida la caché con cada cambio de `collection` (escrituras de otros procesos).
+
+        Usa un change stream en un hilo de fondo. Si el servidor no los soporta
+        (p. ej. un MongoDB standalone) el hilo termina y la caché solo se invalida
+        con las escrituras de este proceso. `on_change()` se llama junto con cada
+        invalidación (p. ej. para incrementar la versión de los datos).
+        """
+        if self._watcher and self._watcher.is_alive():
+            return True
+
+        def listen():
+            while True:
+                try:
+                    with collection.watch() as stream:
+                        logger.info("👂 Escuchando cambios para invalidar la caché de consultas")
+                        for _ in stream:
+                            self.invalidate()
+                            if on_change:
+                                on_change()
+                except Exception as e:
+                    if "replica set" in str(e).lower() or getattr(e, "code", None) == 40573:
+                        logger.warning(f"⚠️ Change streams no disponibles, caché sin invalidación externa: {e}")
+                        return
+                    logger.warning(f"⚠️ Change stream interrumpido, reintentando en {retry_seconds}s: {e}")
+                # Los cambios ocurridos mientras no se escuchaba no se conocen
+                self.invalidate()
+                if on_change:
+                    on_change()
+                time.sleep(retry_seconds)
+
+        self._watcher = threading.Thread(target=listen, name="query-cache-watcher", daemon=True)
+        self._watcher.start()
+        return True
@@ -2,6 +2,7 @@ from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import logging
 import platform
+import threading
 from urllib.parse import quote_plus
 import certifi
 
@@ -23,6 +24,8 @@ class DatabaseConnection:
 
         self.client = None
         self.db = None
+        self.connect_count = 0  # Número de conexiones reales establecidas
+        self._lock = threading.Lock()
 
     def _build_connection_string(self):
         """Construye la cadena de conexión de MongoDB Atlas"""
@@ -34,13 +37,16 @@ class DatabaseConnection:
 
     def update_credentials(self, username, password):
         """Actualiza credenciales y reconstruye la conexión"""
-        self.username = username
-        self.password = password
-        self.connection_string = self._build_connection_string()
-        if self.client:
-            self.client.close()
-            self.client = None
-            self.db = None
+        with self._lock:
+            if username == self.username and password == self.password:
+                return
+            self.username = username
+            self.password = password
+            self.connection_string = self._build_connection_string()
+            if self.client:
+                self.client.close()
+                self.client = None
+                self.db = None
         logger.info(f"🔄 Credenciales actualizadas para usuario: {username}")
 
     def connect(self):
@@ -62,6 +68,7 @@ class DatabaseConnection:
 
             # Obtener la base de datos
             self.db = self.client[self.database_name]
+            self.connect_count += 1
             logger.info(f"✅ Conexión exitosa a MongoDB Atlas - Base: {self.database_name}")
             return True
 
@@ -76,10 +83,11 @@ class DatabaseConnection:
             return False
 
     def get_database(self):
-        """Retorna la base de datos"""
+        """Retorna la base de datos, conectando una sola vez aunque haya varios hilos"""
         if self.db is None:
-            if not self.connect():
-                raise Exception("No se pudo establecer conexión con MongoDB Atlas")
+            with self._lock:
+                if self.db is None and not self.connect():
+                    raise Exception("No se pudo establecer conexión con MongoDB Atlas")
         return self.db
 
     def get_collection(self, collection_name):
@@ -90,8 +98,7 @@ class DatabaseConnection:
     def test_connection(self):
         """Prueba la conexión y retorna info"""
         try:
-            if not self.client:
-                self.connect()
+            self.get_database()
             server_info = self.client.server_info()
             db_stats = self.db.command("dbstats")
             connection_info = {
@@ -109,9 +116,64 @@ class DatabaseConnection:
 
     def close_connection(self):
         """Cierra la conexión con MongoDB"""
-        if self.client:
-            self.client.close()
-            logger.info("🔌 Conexión cerrada")
+        with self._lock:
+            if self.client:
+                self.client.close()
+                self.client = None
+                self.db = None
+                logger.info("🔌 Conexión cerrada")
+
+
+class ConnectionManager:
+    """Registro thread-safe de conexiones persistentes, una por conjunto de credenciales.
+
+    Cada conexión mantiene su propio MongoClient (y su pool) durante toda la vida
+    del proceso; pedir una colección nunca cierra ni reconstruye un cliente.
+    """
+
+    def __init__(self, credentials):
+        self._credentials = credentials
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def get_connection(self, user_type='admin') -> DatabaseConnection:
+        """Retorna la conexión asociada al tipo de usuario, creándola la primera vez"""
+        creds = self._credentials.get(user_type) or self._credentials['admin']
+        key = (creds['username'], creds['password'])
+
+        connection = self._connections.get(key)
+        if connection is None:
+            with self._lock:
+                connection = self._connections.get(key)
+                if connection is None:
+                    connection = DatabaseConnection(*key)
+                    self._connections[key] = connection
+                    logger.info(f"🔐 Conexión registrada para usuario: {key[0]}")
+        return connection
+
+    def get_database(self, user_type='admin'):
+        return self.get_connection(user_type).get_database()
+
+    def get_collection(self, collection_name, user_type='admin'):
+        return self.get_connection(user_type).get_collection(collection_name)
+
+    def get_stats(self):
+        """Retorna cuántas veces se conectó cada cliente registrado.
+
+        Una entrada {username, connect_count} por conjunto de credenciales: dos
+        con el mismo usuario y distinta contraseña no se mezclan.
+        """
+        with self._lock:
+            connections = list(self._connections.values())
+        return [{"username": conn.username, "connect_count": conn.connect_count} for conn in connections]
+
+    def close_all(self):
+        """Cierra todos los clientes registrados"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close_connection()
 
 # Credenciales por tipo de usuario
 USER_CREDENTIALS = {
@@ -119,20 +181,17 @@ USER_CREDENTIALS = {
     'reader': {'username': 'Admin', 'password': 'Admin123'}
 }
 
-# Instancia global
-db_connection = DatabaseConnection()
+# Registro global de conexiones por credenciales
+connection_manager = ConnectionManager(USER_CREDENTIALS)
+
+# Instancia global (conexión de administrador)
+db_connection = connection_manager.get_connection('admin')
 
 def get_db_for_user(user_type='admin'):
-    if user_type in USER_CREDENTIALS:
-        creds = USER_CREDENTIALS[user_type]
-        db_connection.update_credentials(creds['username'], creds['password'])
-    return db_connection.get_database()
+    return connection_manager.get_database(user_type)
 
 def get_collection_for_user(collection_name, user_type='admin'):
-    if user_type in USER_CREDENTIALS:
-        creds = USER_CREDENTIALS[user_type]
-        db_connection.update_credentials(creds['username'], creds['password'])
-    return db_connection.get_collection(collection_name)
+    return connection_manager.get_collection(collection_name, user_type)
 
 def get_db():
     return db_connection.get_database()
@@ -0,0 +1,138 @@
+import logging
+import threading
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_COLLECTION = "counters"
+
+class IdAllocator:
+    """Asigna IDs numéricos consecutivos usando un documento contador con $inc atómico.
+
+    Las reservas se hacen por bloques: un lote pide todos sus IDs en un solo
+    round trip y las creaciones individuales consumen un bloque cacheado en el
+    proceso. Los IDs de un bloque no usado se pierden al reiniciar (quedan huecos,
+    nunca duplicados).
+    """
+
+    def __init__(self, get_collection, source_collection_name, counter_name=None,
+                 block_size=20, initial_id=1001):
+        self._get_collection = get_collection
+        self.source_collection_name = source_collection_name
+        self.counter_name = counter_name or f"{source_collection_name}_id"
+        self.block_size = block_size
+        self.initial_id = initial_id
+
+        self._seeded = False
+        self._next = 0  # Siguiente ID disponible del bloque cacheado
+        self._end = 0   # Fin exclusivo del bloque cacheado
+        self._lock = threading.Lock()
+
+    def _counters(self):
+        return self._get_collection(COUNTERS_COLLECTION)
+
+    def seed(self, force=False) -> int:
+        """Inicializa el contador desde el ID máximo existente (solo la primera vez).
+
+        `initial_id` solo se usa con la colección vacía.
+        """
+        counters = self._counters()
+        if not force and counters.find_one({"_id": self.counter_name}, {"_id": 1}):
+            self._seeded = True
+            return 0
+
+        pipeline = [{"$group": {"_id": None, "max_id": {"$max": "$id"}}}]
+        result = list(self._get_collection(self.source_collection_name).aggregate(pipeline))
+        # Como antes del contador: el siguiente ID es max + 1, o initial_id si la colección está vacía
+        max_id = int(result[0]["max_id"]) if result and result[0]["max_id"] else self.initial_id - 1
+
+        try:
+            # $max hace que la siembra sea idempotente aunque varios procesos la ejecuten
+            counters.update_one({"_id": self.counter_name}, {"$max": {"seq": max_id}}, upsert=True)
+        except DuplicateKeyError:
+            counters.update_one({"_id": self.counter_name}, {"$max": {"seq": max_id}})
+
+        self._seeded = True
+        logger.info(f"🌱 Contador '{self.counter_name}' inicializado en {max_id}")
+        return max_id
+
+    def reserve(self, count: int) -> range:
+        """Reserva un bloque contiguo de `count` IDs en un solo round trip"""
+        if count <= 0:
+            return range(0)
+        if not self._seeded:
+            self.seed()
+
+        doc = self._counters().find_one_and_update(
+            {"_id": self.counter_name},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        end = doc["seq"]
+        return range(end - count + 1, end + 1)
+
+    def next_id(self) -> int:
+        """Retorna el siguiente ID usando el bloque cacheado en el proceso"""
+        with self._lock:
+            if self._next >= self._end:
+                block = self.reserve(self.block_size)
+                self._next, self._end = block.start, block.stop
+            next_id = self._next
+            self._next += 1
+            return next_id
+
+    def observe(self, used_id: int):
+        """Registra un ID asignado manualmente para que el contador nunca lo repita"""
+        try:
+            used_id = int(used_id)
+        except (TypeError, ValueError):
+            return
+        if used_id <= 0:
+            return
+        if not self._seeded:
+            self.seed()
+        self._counters().update_one({"_id": self.counter_name}, {"$max": {"seq": used_id}})
+        with self._lock:
+            # Descartar el bloque cacheado si el ID manual cae dentro de él
+            if self._next <= used_id < self._end:
+                self._next = self._end = 0
+
+class DataVersion:
+    """Versión de los datos de una colección para los ETag: un contador propio
+    que se incrementa con cada escritura, local o vista en el change stream.
+
+    Si un incremento falla la versión deja de ser confiable: `get` retorna None
+    (el GET condicional no responde 304) hasta que un incremento vuelva a funcionar.
+    """
+
+    def __init__(self, get_collection, source_collection_name, counter_name=None):
+        self._get_collection = get_collection
+        self.counter_name = counter_name or f"{source_collection_name}_version"
+        self._stale = False
+
+    def _counters(self):
+        return self._get_collection(COUNTERS_COLLECTION)
+
+    def bump(self) -> bool:
+        """Incrementa la versión; retorna False (y la marca como no confiable) si falla"""
+        try:
+            try:
+                self._counters().update_one({"_id": self.counter_name}, {"$inc": {"seq": 1}}, upsert=True)
+            except DuplicateKeyError:
+                # Otro proceso creó el contador al mismo tiempo
+                self._counters().update_one({"_id": self.counter_name}, {"$inc": {"seq": 1}})
+            self._stale = False
+            return True
+        except Exception as e:
+            self._stale = True
+            logger.warning(f"⚠️ No se pudo incrementar la versión de los datos: {e}")
+            return False
+
+    def get(self):
+        """Versión actual (0 si nunca hubo escrituras) o None si no es confiable"""
+        if self._stale and not self.bump():
+            return None
+        doc = self._counters().find_one({"_id": self.counter_name}, {"seq": 1})
+        return doc.get("seq", 0) if doc else 0
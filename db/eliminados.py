@@ -0,0 +1,65 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Días que se conserva el rastro de un documento eliminado (índice TTL)
+TOMBSTONE_RETENTION_DAYS = 30
+
+class TombstoneLog:
+    """Registro de documentos eliminados ("lápidas") para la sincronización incremental.
+
+    Cada eliminación deja {_id, id, deleted_at} en una colección auxiliar; un
+    índice TTL las borra pasado TOMBSTONE_RETENTION_DAYS. Un cliente con un
+    cursor más antiguo que la retención debe recargar todo.
+    """
+
+    def __init__(self, get_collection, source_collection_name, collection_name=None,
+                 retention_days=TOMBSTONE_RETENTION_DAYS):
+        self._get_collection = get_collection
+        self.source_collection_name = source_collection_name
+        self.collection_name = collection_name or f"{source_collection_name}_eliminados"
+        self.retention = timedelta(days=retention_days)
+
+    def _tombstones(self):
+        return self._get_collection(self.collection_name)
+
+    def ensure_indexes(self):
+        """Crea el índice TTL sobre deleted_at (también sirve para consultar por fecha)"""
+        self._tombstones().create_index("deleted_at", expireAfterSeconds=int(self.retention.total_seconds()))
+
+    def record(self, docs: Iterable[Dict[str, Any]]) -> bool:
+        """Deja una lápida por cada documento eliminado (deben incluir _id e id)"""
+        now = datetime.now()
+        tombstones = [{"_id": doc["_id"], "id": doc.get("id"), "deleted_at": now} for doc in docs]
+        if not tombstones:
+            return True
+        try:
+            self._tombstones().insert_many(tombstones, ordered=False)
+            return True
+        except Exception as e:
+            # Sin lápida, los clientes sincronizados no se enteran de la eliminación
+            logger.warning(f"⚠️ No se pudieron registrar {len(tombstones)} eliminaciones: {e}")
+            return False
+
+    def forget(self, ids: Iterable[Any]) -> bool:
+        """Quita las lápidas de documentos que se volvieron a insertar con el mismo _id"""
+        ids = list(ids)
+        if not ids:
+            return True
+        try:
+            self._tombstones().delete_many({"_id": {"$in": ids}})
+            return True
+        except Exception as e:
+            # Con la lápida vigente, un cliente sincronizado borraría el documento reinsertado
+            logger.warning(f"⚠️ No se pudieron quitar {len(ids)} lápidas de documentos reinsertados: {e}")
+            return False
+
+    def covers(self, since: datetime) -> bool:
+        """True si las lápidas desde `since` todavía se conservan"""
+        return since >= datetime.now() - self.retention
+
+    def since(self, since: datetime) -> List[Dict[str, Any]]:
+        """Lápidas de documentos eliminados desde `since`"""
+        return list(self._tombstones().find({"deleted_at": {"$gte": since}}).sort("deleted_at", 1))
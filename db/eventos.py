@@ -0,0 +1,186 @@
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# Eventos recientes que se conservan para reenviar a clientes que se reconectan
+REPLAY_BUFFER_SIZE = 1000
+
+# Eventos pendientes por suscriptor; si un cliente lento lo llena, recibe un reset
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+def format_event(event_id: Optional[str], event_type: str, data: str) -> str:
+    """Formatea un evento según el protocolo Server-Sent Events"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+class Subscription:
+    """Cola de eventos de un cliente conectado"""
+
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue: "queue.Queue[str]" = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Se perdieron eventos: el cliente debe resincronizar
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[str]:
+        """Siguiente evento formateado, o None si no llegó ninguno en `timeout` segundos"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class EventBus:
+    """Canal pub/sub en proceso para notificar cambios de proyectos (Server-Sent Events).
+
+    Cada evento se serializa una sola vez al publicarse y se guarda en un buffer
+    circular; un cliente que se reconecta con Last-Event-ID recibe los eventos
+    posteriores desde el buffer. Si ese id ya no está en el buffer (o es de otro
+    proceso/arranque) recibe un evento `reset` y debe resincronizar sus datos.
+    """
+
+    def __init__(self, replay_size: int = REPLAY_BUFFER_SIZE):
+        # Los ids llevan un prefijo por arranque: un id de otro proceso nunca coincide
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._buffer: "deque[tuple]" = deque(maxlen=replay_size)  # (seq, mensaje)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._external = False
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self.boot_id}-{self._seq}"
+
+    def publish(self, event_type: str, data: Dict[str, Any], source: str = "local"):
+        """Publica un evento a todos los suscriptores.
+
+        Mientras un change stream alimenta el canal, los eventos locales se ignoran
+        (el change stream ya incluye las escrituras de este proceso).
+        """
+        if source == "local" and self._external:
+            return
+        payload = json.dumps(data, default=_json_default, separators=(",", ":"))
+        with self._lock:
+            self._seq += 1
+            message = format_event(f"{self.boot_id}-{self._seq}", event_type, payload)
+            self._buffer.append((self._seq, message))
+            for subscription in self._subscribers:
+                subscription.push(message)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """Registra un suscriptor; con `last_event_id` le encola los eventos perdidos"""
+        subscription = Subscription()
+        with self._lock:
+            if last_event_id:
+                for message in self._replay(last_event_id):
+                    subscription.push(message)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def _replay(self, last_event_id: str) -> Iterable[str]:
+        boot_id, _, seq = last_event_id.partition("-")
+        try:
+            seq = int(seq)
+        except ValueError:
+            seq = None
+        oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+        # Hay continuidad si el id es de este arranque y el siguiente evento sigue en el buffer
+        if boot_id != self.boot_id or seq is None or seq > self._seq or seq + 1 < oldest:
+            return [format_event(self.last_event_id, "reset", "{}")]
+        return [message for event_seq, message in self._buffer if event_seq > seq]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "last_event_id": self.last_event_id,
+                "buffered": len(self._buffer),
+                "change_stream": self._external
+            }
+
+    def watch(self, collection, ignored_fields: Iterable[str] = (), retry_seconds: int = 30) -> bool:
+        """Alimenta el canal desde un change stream de `collection` (varios procesos servidores).
+
+        Si el servidor no soporta change streams (p. ej. un MongoDB standalone) el
+        hilo termina y el canal sigue con los eventos locales de este proceso.
+        """
+        if self._watcher and self._watcher.is_alive():
+            return True
+        ignored = set(ignored_fields)
+
+        def listen():
+            while True:
+                try:
+                    with collection.watch(full_document="updateLookup") as stream:
+                        self._external = True
+                        logger.info("📣 Eventos de proyectos alimentados por change stream")
+                        for change in stream:
+                            self._publish_change(change, ignored)
+                except Exception as e:
+                    self._external = False
+                    if "replica set" in str(e).lower() or getattr(e, "code", None) == 40573:
+                        logger.warning(f"⚠️ Change streams no disponibles, eventos solo locales: {e}")
+                        return
+                    logger.warning(f"⚠️ Change stream de eventos interrumpido, reintentando en {retry_seconds}s: {e}")
+                # Los cambios ocurridos mientras no se escuchaba no se conocen
+                self.publish("reset", {}, source="change_stream")
+                time.sleep(retry_seconds)
+
+        self._watcher = threading.Thread(target=listen, name="event-bus-watcher", daemon=True)
+        self._watcher.start()
+        return True
+
+    def _publish_change(self, change: Dict[str, Any], ignored: set):
+        operation = change.get("operationType")
+        doc_id = str(change.get("documentKey", {}).get("_id"))
+        full_document = change.get("fullDocument") or {}
+
+        if operation == "insert":
+            document = {k: v for k, v in full_document.items() if k not in ignored}
+            self.publish("created", {"_id": doc_id, "id": document.get("id"), "fields": document},
+                         source="change_stream")
+        elif operation in ("update", "replace"):
+            if operation == "update":
+                changed = change.get("updateDescription", {}).get("updatedFields", {})
+            else:
+                changed = full_document
+            fields = {k: v for k, v in changed.items() if k not in ignored}
+            if fields:
+                self.publish("updated", {"_id": doc_id, "id": full_document.get("id"), "fields": fields},
+                             source="change_stream")
+        elif operation == "delete":
+            self.publish("deleted", {"_id": doc_id, "id": None}, source="change_stream")
+        elif operation in ("drop", "rename", "invalidate"):
+            self.publish("reset", {}, source="change_stream")
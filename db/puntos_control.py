@@ -0,0 +1,136 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Días que se conserva un punto de control sin actividad (índice TTL sobre updated_at)
+CHECKPOINT_RETENTION_DAYS = 7
+
+# Contadores del resumen que se guardan con cada bloque confirmado
+CHECKPOINT_COUNTERS = ("imported", "inserted", "skipped", "failed", "mismatches", "duplicates", "overwritten",
+                       "new", "changed", "unchanged")
+
+class ImportCheckpoint:
+    """Punto de control de una importación: filas ya confirmadas y contadores acumulados.
+
+    Los _id de los documentos se derivan del archivo y del número de fila, así que
+    reimportar un bloque que quedó a medias no duplica filas: las que alcanzaron a
+    insertarse fallan con clave duplicada y se cuentan como ya importadas.
+    """
+
+    def __init__(self, store: "ImportCheckpoints", doc: Dict[str, Any]):
+        self._store = store
+        self.id = doc["_id"]
+        self.file_hash = doc["file_hash"]
+        self.batch_size = doc["batch_size"]
+        self.rows_committed = doc.get("rows_committed", 0)
+        self.chunks_committed = doc.get("chunks_committed", 0)
+        self.counters = doc.get("counters", {})
+        # Los _id usan la hora del primer intento: un reintento genera los mismos
+        self._timestamp = int(doc["started_at_epoch"]).to_bytes(4, "big")
+        self._file_prefix = bytes.fromhex(self.file_hash[:6])
+
+    @property
+    def resumed(self) -> bool:
+        return self.rows_committed > 0
+
+    def object_id(self, row_index: int) -> ObjectId:
+        """_id determinista de la fila de datos `row_index` (0, 1, ...) del archivo.
+
+        4 bytes de hora (como un ObjectId normal, así se mantiene el orden de
+        inserción), 3 bytes del hash del archivo y 5 bytes con el número de fila.
+        """
+        return ObjectId(self._timestamp + self._file_prefix + row_index.to_bytes(5, "big"))
+
+    def commit(self, rows_committed: int, summary: Dict[str, Any]) -> bool:
+        """Registra que las primeras `rows_committed` filas de datos quedaron escritas"""
+        self.rows_committed = rows_committed
+        self.chunks_committed += 1
+        self.counters = {name: summary[name] for name in CHECKPOINT_COUNTERS if name in summary}
+        return self._store.save(self, "in_progress")
+
+    def complete(self, summary: Dict[str, Any]) -> bool:
+        self.counters = {name: summary[name] for name in CHECKPOINT_COUNTERS if name in summary}
+        return self._store.save(self, "completed")
+
+class ImportCheckpoints:
+    """Puntos de control de importaciones, por archivo (hash) y modo.
+
+    Cada importación confirma bloques numerados; después de cada bloque guarda
+    cuántas filas quedaron escritas. Reintentar con el mismo archivo retoma desde
+    el bloque siguiente en vez de empezar de nuevo.
+    """
+
+    def __init__(self, get_collection, collection_name: str = "importaciones",
+                 retention_days: int = CHECKPOINT_RETENTION_DAYS):
+        self._get_collection = get_collection
+        self.collection_name = collection_name
+        self.retention = timedelta(days=retention_days)
+
+    def _checkpoints(self):
+        return self._get_collection(self.collection_name)
+
+    def ensure_indexes(self):
+        """Índice TTL: los puntos de control sin actividad se borran solos"""
+        self._checkpoints().create_index("updated_at", expireAfterSeconds=int(self.retention.total_seconds()))
+
+    def open(self, file_hash: str, mode: str, batch_size: int) -> ImportCheckpoint:
+        """Retoma el punto de control del archivo en este modo, o crea uno nuevo.
+
+        Un reintento usa el tamaño de bloque del primer intento para que los
+        bloques confirmados coincidan.
+        """
+        now = datetime.now()
+        doc = self._checkpoints().find_one_and_update(
+            {"_id": f"{file_hash}:{mode}"},
+            {
+                "$setOnInsert": {
+                    "file_hash": file_hash,
+                    "mode": mode,
+                    "batch_size": batch_size,
+                    "started_at": now,
+                    "started_at_epoch": int(time.time()),
+                    "rows_committed": 0,
+                    "chunks_committed": 0,
+                    "counters": {},
+                    "status": "in_progress"
+                },
+                "$set": {"updated_at": now}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc.get("status") == "completed":
+            # Reimportar un archivo ya terminado lo recorre de nuevo con los mismos _id:
+            # las filas que siguen en la colección no se duplican
+            doc = self._checkpoints().find_one_and_update(
+                {"_id": doc["_id"]},
+                {"$set": {"rows_committed": 0, "chunks_committed": 0, "counters": {},
+                          "batch_size": batch_size, "status": "in_progress"}},
+                return_document=ReturnDocument.AFTER
+            )
+        checkpoint = ImportCheckpoint(self, doc)
+        if checkpoint.resumed:
+            logger.info(f"⏯️ Retomando importación {doc['_id'][:12]}… desde la fila {checkpoint.rows_committed + 1} "
+                        f"({checkpoint.chunks_committed} bloques ya confirmados)")
+        return checkpoint
+
+    def save(self, checkpoint: ImportCheckpoint, status: str) -> bool:
+        try:
+            self._checkpoints().update_one({"_id": checkpoint.id}, {"$set": {
+                "rows_committed": checkpoint.rows_committed,
+                "chunks_committed": checkpoint.chunks_committed,
+                "counters": checkpoint.counters,
+                "status": status,
+                "updated_at": datetime.now()
+            }})
+            return True
+        except Exception as e:
+            # Sin punto de control un reintento repite bloques; los _id deterministas evitan duplicados
+            logger.warning(f"⚠️ No se pudo guardar el punto de control {checkpoint.id}: {e}")
+            return False
@@ -0,0 +1,183 @@
+import logging
+import threading
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+
+from pymongo import UpdateOne
+
+from models.proyecto import (SEARCH_FIELDS, SEARCH_KEY_VERSION, SEARCH_SEPARATOR, DERIVED_FIELDS, fold_text,
+                             build_search_key, add_derived_fields)
+
+logger = logging.getLogger(__name__)
+
+# Largo de los n-gramas del índice invertido
+NGRAM_SIZE = 3
+
+# Peso de cada campo en el ranking (el segmento extra del final es el RUT compacto)
+FIELD_WEIGHTS = {"id": 4, "contrato": 4, "cliente": 4, "rut_cliente": 3, "ciudad": 2, "region": 2}
+SEGMENT_WEIGHTS = [FIELD_WEIGHTS.get(field, 1) for field in SEARCH_FIELDS] + [FIELD_WEIGHTS["rut_cliente"]]
+
+# Documentos por lote al recalcular claves de búsqueda faltantes
+BACKFILL_BATCH_SIZE = 500
+
+def ngrams(text: str) -> set:
+    """N-gramas de un texto normalizado, sin cruzar el separador de segmentos"""
+    grams = set()
+    for segment in text.split(SEARCH_SEPARATOR):
+        for i in range(len(segment) - NGRAM_SIZE + 1):
+            grams.add(segment[i:i + NGRAM_SIZE])
+    return grams
+
+def score_key(key: str, terms: List[str]) -> int:
+    """Puntaje de un documento: por cada término, el mejor segmento que lo contiene.
+
+    Coincidir al inicio del campo vale más que al inicio de una palabra, y esto más
+    que en medio de una palabra. Retorna 0 si algún término no aparece.
+    """
+    segments = key.split(SEARCH_SEPARATOR)
+    total = 0
+    for term in terms:
+        best = 0
+        for weight, segment in zip(SEGMENT_WEIGHTS, segments):
+            position = segment.find(term)
+            if position < 0:
+                continue
+            if position == 0:
+                bonus = 3
+            elif segment[position - 1] == " " or f" {term}" in segment:
+                bonus = 2
+            else:
+                bonus = 1
+            best = max(best, weight * bonus)
+        if not best:
+            return 0
+        total += best
+    return total
+
+class SearchIndex:
+    """Índice invertido de trigramas en memoria sobre la clave `search_key`.
+
+    Las búsquedas por subcadena se resuelven intersectando las listas de
+    documentos de cada trigrama del término y verificando la subcadena solo en
+    esos candidatos, sin recorrer la colección. Se construye en el primer uso
+    y el controlador lo mantiene al día en cada escritura.
+    """
+
+    def __init__(self, get_collection, source_collection_name):
+        self._get_collection = get_collection
+        self.source_collection_name = source_collection_name
+
+        self._keys: Dict[Any, str] = {}          # _id -> search_key
+        self._postings: Dict[str, set] = {}      # trigrama -> conjunto de _id
+        self._built = False
+        self._lock = threading.RLock()
+
+    def _collection(self):
+        return self._get_collection(self.source_collection_name)
+
+    def _add(self, doc_id, key: str):
+        self._remove(doc_id)
+        self._keys[doc_id] = key
+        for gram in ngrams(key):
+            self._postings.setdefault(gram, set()).add(doc_id)
+
+    def _remove(self, doc_id):
+        key = self._keys.pop(doc_id, None)
+        if key is None:
+            return
+        for gram in ngrams(key):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def backfill(self) -> int:
+        """Calcula y guarda los campos derivados (search_key, rut_normalizado) en los documentos
+        que no los tienen o están desactualizados"""
+        collection = self._collection()
+        projection = {field: 1 for field in SEARCH_FIELDS}
+        pending = collection.find({"search_key_version": {"$ne": SEARCH_KEY_VERSION}}, projection)
+
+        updated = 0
+        operations = []
+        for doc in pending:
+            derived = add_derived_fields(doc)
+            operations.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {field: derived[field] for field in DERIVED_FIELDS}}
+            ))
+            if len(operations) >= BACKFILL_BATCH_SIZE:
+                updated += collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+
+        if updated:
+            logger.info(f"🔤 Claves de búsqueda calculadas para {updated} proyectos")
+        return updated
+
+    def build(self):
+        """Construye el índice desde la colección (primero completa las claves faltantes)"""
+        with self._lock:
+            self.backfill()
+            self._keys = {}
+            self._postings = {}
+            for doc in self._collection().find({}, {"search_key": 1}):
+                self._add(doc["_id"], doc.get("search_key") or "")
+            self._built = True
+            logger.info(f"🔎 Índice de búsqueda construido: {len(self._keys)} proyectos, "
+                        f"{len(self._postings)} trigramas")
+
+    def invalidate(self):
+        """Descarta el índice; se reconstruye en la siguiente búsqueda"""
+        with self._lock:
+            self._keys = {}
+            self._postings = {}
+            self._built = False
+
+    def update(self, added: Iterable[Dict[str, Any]] = (), removed: Iterable[Dict[str, Any]] = ()):
+        """Aplica documentos eliminados y agregados/actualizados (deben incluir _id)"""
+        with self._lock:
+            if not self._built:
+                return
+            for doc in removed:
+                self._remove(doc.get("_id"))
+            for doc in added:
+                if doc.get("_id") is None:
+                    continue
+                self._add(doc["_id"], doc.get("search_key") or build_search_key(doc))
+
+    def _candidates(self, term: str) -> Iterable:
+        if len(term) < NGRAM_SIZE:
+            # Términos cortos: no hay trigramas, se revisan todas las claves en memoria
+            return self._keys.keys()
+        postings = sorted((self._postings.get(gram, set()) for gram in ngrams(term)), key=len)
+        if not postings[0]:
+            return ()
+        return set.intersection(*postings)
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[Tuple[Any, int]]:
+        """Busca `text` (cada palabra como subcadena, sin distinguir tildes ni mayúsculas).
+
+        Retorna pares (_id, puntaje) ordenados de mayor a menor puntaje.
+        """
+        terms = fold_text(text).split(" ")
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+
+        with self._lock:
+            if not self._built:
+                self.build()
+
+            # Partir por el término más selectivo (el más largo suele serlo)
+            terms.sort(key=len, reverse=True)
+            results = []
+            for doc_id in self._candidates(terms[0]):
+                score = score_key(self._keys[doc_id], terms)
+                if score:
+                    results.append((doc_id, score))
+
+        # Empates en orden de inserción (_id)
+        results.sort(key=lambda item: (-item[1], str(item[0])))
+        return results[:limit] if limit else results
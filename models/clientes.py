@@ -0,0 +1,333 @@
+import difflib
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.proyecto import compact_rut, fold_text, normalize_rut
+
+logger = logging.getLogger(__name__)
+
+# Palabras que no distinguen a un cliente: artículos, "Ilustre" y formas jurídicas
+CLIENT_STOPWORDS = {
+    "de", "del", "la", "las", "el", "los", "y", "en", "ilustre", "sa", "spa", "ltda", "limitada",
+    "eirl", "cia", "compania"
+}
+
+# Puntaje mínimo (0 a 1) para sugerir que dos nombres son el mismo cliente
+CLIENT_SIMILARITY_THRESHOLD = 0.85
+
+# Con los primeros dígitos del RUT en común basta un nombre menos parecido
+RUT_PREFIX_SIMILARITY_THRESHOLD = 0.6
+
+# Dos palabras con al menos este parecido cuentan como la misma (errores de tipeo)
+TOKEN_SIMILARITY_THRESHOLD = 0.8
+
+# Dígitos del RUT que forman la clave de bloque por prefijo
+RUT_PREFIX_LENGTH = 6
+
+# Palabras más cortas no forman bloque (demasiado comunes para distinguir)
+MIN_BLOCK_TOKEN_LENGTH = 3
+
+# Un bloque con más variantes que esto es una palabra común ("municipalidad"): no
+# se compara por dentro, así el costo no vuelve a ser cuadrático
+MAX_BLOCK_SIZE = 100
+
+# Orden de los bloques de más a menos concluyente (define el motivo de un par)
+BLOCK_STRENGTH = {"rut": 0, "nombre": 1, "rut_prefijo": 2, "palabra": 3}
+
+# Grupos que se guardan en el reporte de sugerencias
+MAX_REPORTED_CLUSTERS = 2000
+
+# Comparaciones entre reportes de progreso
+PROGRESS_EVERY = 1000
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+def client_tokens(name) -> List[str]:
+    """Palabras significativas de un nombre de cliente, normalizadas y ordenadas.
+
+    "I. Municipalidad de Arica" y "Municipalidad Arica" dan ["arica", "municipalidad"].
+    """
+    words = _NON_ALNUM_RE.sub(" ", fold_text(name)).split()
+    return sorted(word for word in words if len(word) > 1 and word not in CLIENT_STOPWORDS)
+
+def _token_similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    matcher = difflib.SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < TOKEN_SIMILARITY_THRESHOLD:
+        return 0.0
+    return matcher.ratio()
+
+def name_similarity(tokens_a: List[str], tokens_b: List[str]) -> float:
+    """Parecido entre dos nombres (0 a 1) comparando palabra a palabra.
+
+    Cada palabra del nombre más corto se empareja con la más parecida del otro
+    (si supera TOKEN_SIMILARITY_THRESHOLD); el puntaje es la suma de esos
+    parecidos dividida por la cantidad de palabras del nombre más largo. Así
+    "Municipalidad de Arica" y "Municipalidad de Arauco" no se confunden por
+    compartir la palabra larga.
+    """
+    if not tokens_a or not tokens_b:
+        return 0.0
+    if tokens_a == tokens_b:
+        return 1.0
+    shorter, longer = sorted((tokens_a, tokens_b), key=len)
+    available = list(longer)
+    total = 0.0
+    for token in shorter:
+        best, best_position = 0.0, None
+        for position, other in enumerate(available):
+            score = _token_similarity(token, other)
+            if score > best:
+                best, best_position = score, position
+        if best_position is not None and best >= TOKEN_SIMILARITY_THRESHOLD:
+            total += best
+            del available[best_position]
+    return total / len(longer)
+
+class _UnionFind:
+    """Conjuntos disjuntos con compresión de caminos y unión por tamaño"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> int:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+class ClientClusters:
+    """Agrupa las variantes de un mismo cliente ("Municipalidad de Arica",
+    "I. Municipalidad Arica", RUT con o sin puntos) y sugiere unificarlas.
+
+    Trabaja sobre las variantes distintas (cliente, RUT canónico), no sobre los
+    proyectos. Para no comparar todos contra todos, cada variante cae en bloques
+    (mismo RUT, mismo nombre normalizado, prefijo del RUT y cada palabra del
+    nombre) y solo se comparan los pares que comparten un bloque. Los pares
+    parecidos se unen con union-find; dos RUT válidos distintos nunca quedan en
+    el mismo grupo. El último reporte se guarda en `clientes_grupos` y sirve
+    para consultar los proyectos de todo un grupo con los índices de cliente y RUT.
+    """
+
+    def __init__(self, get_collection, source_collection_name, collection_name: str = "clientes_grupos"):
+        self._get_collection = get_collection
+        self.source_collection_name = source_collection_name
+        self.collection_name = collection_name
+
+        self._by_rut: Dict[str, Dict[str, Any]] = {}   # RUT canónico -> grupo
+        self._by_name: Dict[str, Dict[str, Any]] = {}  # nombre normalizado -> grupo
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load_variants(self) -> List[Dict[str, Any]]:
+        pipeline = [
+            {"$match": {"$or": [{"cliente": {"$nin": [None, ""]}}, {"rut_normalizado": {"$ne": None}}]}},
+            {"$group": {
+                "_id": {"cliente": "$cliente", "rut": "$rut_normalizado"},
+                "proyectos": {"$sum": 1},
+                "rut_cliente": {"$first": "$rut_cliente"}
+            }}
+        ]
+        collection = self._get_collection(self.source_collection_name)
+        variants: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        for row in collection.aggregate(pipeline):
+            # Cliente vacío, null o ausente son una sola variante sin nombre (group_query las busca juntas)
+            name = row["_id"].get("cliente") or ""
+            key = (name, row["_id"].get("rut"))
+            if key in variants:
+                variants[key]["proyectos"] += row["proyectos"]
+                continue
+            tokens = client_tokens(name)
+            variants[key] = {
+                "cliente": name,
+                "rut": key[1],
+                "rut_cliente": row.get("rut_cliente") or "",
+                "proyectos": row["proyectos"],
+                "tokens": tokens,
+                "name_key": " ".join(tokens)
+            }
+        return list(variants.values())
+
+    @staticmethod
+    def _block_keys(variant: Dict[str, Any]) -> List[Tuple[str, str]]:
+        keys = []
+        if variant["rut"]:
+            keys.append(("rut", variant["rut"]))
+        if variant["name_key"]:
+            keys.append(("nombre", variant["name_key"]))
+        digits = re.sub(r"\D", "", compact_rut(variant["rut_cliente"]))
+        if len(digits) > RUT_PREFIX_LENGTH:
+            keys.append(("rut_prefijo", digits[:RUT_PREFIX_LENGTH]))
+        for token in set(variant["tokens"]):
+            if len(token) >= MIN_BLOCK_TOKEN_LENGTH:
+                keys.append(("palabra", token))
+        return keys
+
+    def _candidate_pairs(self, variants: List[Dict[str, Any]]) -> Tuple[Dict[Tuple[int, int], str], Dict[str, int]]:
+        """Pares de variantes que comparten algún bloque, con el bloque más fuerte que comparten"""
+        blocks: Dict[Tuple[str, str], List[int]] = {}
+        for index, variant in enumerate(variants):
+            for key in self._block_keys(variant):
+                blocks.setdefault(key, []).append(index)
+
+        pairs: Dict[Tuple[int, int], str] = {}
+        oversized = 0
+        for (kind, _), members in blocks.items():
+            if len(members) < 2:
+                continue
+            if len(members) > MAX_BLOCK_SIZE and kind in ("rut_prefijo", "palabra"):
+                oversized += 1
+                continue
+            for position, a in enumerate(members):
+                for b in members[position + 1:]:
+                    current = pairs.get((a, b))
+                    if current is None or BLOCK_STRENGTH[kind] < BLOCK_STRENGTH[current]:
+                        pairs[(a, b)] = kind
+        return pairs, {"blocks": len(blocks), "oversized_blocks": oversized}
+
+    def _score(self, a: Dict[str, Any], b: Dict[str, Any], kind: str) -> Tuple[float, str]:
+        """Puntaje y motivo para unir dos variantes (0 si no se unen)"""
+        if a["rut"] and b["rut"] and a["rut"] != b["rut"]:
+            return 0.0, ""
+        if kind == "rut":
+            return 1.0, "mismo RUT"
+        score = name_similarity(a["tokens"], b["tokens"])
+        if kind == "rut_prefijo" and score >= RUT_PREFIX_SIMILARITY_THRESHOLD:
+            return score, "RUT parecido y nombre similar"
+        if score >= CLIENT_SIMILARITY_THRESHOLD:
+            return score, "mismo nombre" if score == 1.0 else "nombre similar"
+        return 0.0, ""
+
+    def cluster(self, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Calcula los grupos de clientes duplicados, guarda el reporte y lo retorna.
+
+        `on_progress(comparados, total)` se llama cada PROGRESS_EVERY pares.
+        """
+        started = time.perf_counter()
+        variants = self._load_variants()
+        pairs, block_stats = self._candidate_pairs(variants)
+
+        # Primero se evalúan todos los pares y luego se unen de mayor a menor
+        # puntaje: un vínculo fuerte gana sobre uno débil que traería otro RUT
+        links = []
+        for done, ((a, b), kind) in enumerate(pairs.items(), start=1):
+            score, reason = self._score(variants[a], variants[b], kind)
+            if score:
+                links.append((-score, BLOCK_STRENGTH[kind], a, b, reason))
+            if on_progress and done % PROGRESS_EVERY == 0:
+                on_progress(done, len(pairs))
+        links.sort(key=lambda link: link[:2])
+
+        sets = _UnionFind(len(variants))
+        ruts = [{variant["rut"]} - {None} for variant in variants]
+        edges: Dict[int, List[Tuple[float, str]]] = {}
+        for negative_score, _, a, b, reason in links:
+            root_a, root_b = sets.find(a), sets.find(b)
+            if root_a == root_b:
+                continue
+            if ruts[root_a] and ruts[root_b] and ruts[root_a] != ruts[root_b]:
+                continue
+            root = sets.union(a, b)
+            ruts[root] = ruts[root_a] | ruts[root_b]
+            edges[root] = edges.pop(root_a, []) + edges.pop(root_b, []) + [(-negative_score, reason)]
+
+        members: Dict[int, List[int]] = {}
+        for index in range(len(variants)):
+            members.setdefault(sets.find(index), []).append(index)
+
+        clusters = []
+        for root, indexes in members.items():
+            if len(indexes) < 2:
+                continue
+            # Las variantes sin nombre van al final: no sirven como nombre del grupo
+            group = sorted((variants[index] for index in indexes),
+                           key=lambda variant: (not variant["cliente"], -variant["proyectos"], variant["rut"] is None,
+                                                variant["cliente"]))
+            canonical = next((variant for variant in group if variant["rut"]), group[0])
+            clusters.append({
+                "cliente": canonical["cliente"],
+                "rut": canonical["rut"],
+                "proyectos": sum(variant["proyectos"] for variant in group),
+                "score": round(min(score for score, _ in edges[root]), 3),
+                "reasons": sorted({reason for _, reason in edges[root]}),
+                "variants": [{field: variant[field] for field in ("cliente", "rut", "rut_cliente", "proyectos")}
+                             for variant in group]
+            })
+        clusters.sort(key=lambda cluster: (-cluster["proyectos"], cluster["cliente"]))
+
+        elapsed = time.perf_counter() - started
+        report = {
+            "generated_at": datetime.now(),
+            "variants": len(variants),
+            "invalid_ruts": sum(variant["proyectos"] for variant in variants
+                                if variant["rut_cliente"].strip() and not variant["rut"]),
+            "naive_pairs": len(variants) * (len(variants) - 1) // 2,
+            "candidate_pairs": len(pairs),
+            **block_stats,
+            "cluster_count": len(clusters),
+            "clusters": clusters[:MAX_REPORTED_CLUSTERS],
+            "elapsed_seconds": round(elapsed, 3)
+        }
+        self._get_collection(self.collection_name).replace_one({"_id": "ultimo"}, report, upsert=True)
+        self._index(report)
+        logger.info(f"👥 {len(clusters)} grupos de clientes duplicados entre {len(variants)} variantes "
+                    f"({len(pairs)} pares comparados de {report['naive_pairs']} posibles, {elapsed:.2f}s)")
+        return report
+
+    def _index(self, report: Dict[str, Any]):
+        with self._lock:
+            self._by_rut, self._by_name = {}, {}
+            # Los grupos vienen de mayor a menor: un nombre repetido queda en el más grande
+            for cluster in report.get("clusters", []):
+                for variant in cluster["variants"]:
+                    if variant["rut"]:
+                        self._by_rut.setdefault(variant["rut"], cluster)
+                    if variant["cliente"]:
+                        self._by_name.setdefault(fold_text(variant["cliente"]), cluster)
+            self._loaded = True
+
+    def latest(self) -> Dict[str, Any]:
+        """Último reporte de sugerencias ({} si nunca se calculó)"""
+        report = self._get_collection(self.collection_name).find_one({"_id": "ultimo"}, {"_id": 0})
+        return report or {}
+
+    def find_group(self, client: str) -> Optional[Dict[str, Any]]:
+        """Grupo al que pertenece un cliente, buscado por RUT (en cualquier formato) o por nombre"""
+        if not self._loaded:
+            self._index(self.latest())
+        rut = normalize_rut(client)
+        with self._lock:
+            if rut and rut in self._by_rut:
+                return self._by_rut[rut]
+            return self._by_name.get(fold_text(client))
+
+    def group_query(self, client: str) -> Dict[str, Any]:
+        """Consulta por los proyectos de todas las variantes del grupo de `client`.
+
+        Cada variante se busca por (cliente, rut_normalizado), así que cada rama
+        del $or usa el índice de cliente o el de RUT; una variante sin nombre
+        (cliente vacío, null o ausente) se busca con $in [None, ""]. Sin grupo se
+        busca el RUT canónico o el nombre exacto.
+        """
+        group = self.find_group(client)
+        if group is not None:
+            return {"$or": [{"cliente": variant["cliente"] or {"$in": [None, ""]}, "rut_normalizado": variant["rut"]}
+                            for variant in group["variants"]]}
+        rut = normalize_rut(client)
+        return {"rut_normalizado": rut} if rut else {"cliente": client}
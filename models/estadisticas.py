@@ -0,0 +1,186 @@
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterable
+import logging
+
+from models.proyecto import SERVICE_FLAGS, UNSPECIFIED_LABEL, get_collection_stats
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLLECTION = "estadisticas"
+
+# Campos que intervienen en las estadísticas (proyección para leer imágenes previas)
+STATS_FIELDS = ["estado", "region", "tipo_cliente", "fecha_inicio", "monto", *SERVICE_FLAGS]
+STATS_PROJECTION = {field: 1 for field in STATS_FIELDS}
+
+# Desgloses mantenidos: nombre en el resumen -> función que obtiene la clave del documento
+BREAKDOWNS = {
+    "status_breakdown": lambda doc: doc.get("estado"),
+    "region_breakdown": lambda doc: doc.get("region"),
+    "year_breakdown": lambda doc: doc["fecha_inicio"].year if isinstance(doc.get("fecha_inicio"), datetime) else None,
+    "tipo_cliente_breakdown": lambda doc: doc.get("tipo_cliente"),
+}
+
+def encode_key(value) -> str:
+    """Convierte un valor en una clave válida de MongoDB ('.' y '$' inicial no se permiten)"""
+    key = UNSPECIFIED_LABEL if value in (None, "") else str(value)
+    key = key.replace(".", "．")
+    if key.startswith("$"):
+        key = "＄" + key[1:]
+    return key
+
+def decode_key(key: str) -> str:
+    """Revierte encode_key"""
+    key = key.replace("．", ".")
+    if key.startswith("＄"):
+        key = "$" + key[1:]
+    return key
+
+def _amount(doc) -> float:
+    """Monto sumable del documento (igual que $sum: ignora valores no numéricos)"""
+    monto = doc.get("monto")
+    if isinstance(monto, (int, float)) and not isinstance(monto, bool):
+        return monto
+    return 0
+
+def accumulate(deltas: Dict[str, float], doc: Dict[str, Any], sign: int = 1) -> Dict[str, float]:
+    """Suma (sign=1) o resta (sign=-1) el aporte de un documento a un mapa de $inc"""
+    amount = _amount(doc) * sign
+
+    def add(path, value):
+        if value:
+            deltas[path] = deltas.get(path, 0) + value
+
+    add("total_projects", sign)
+    add("total_amount", amount)
+    for name, key_of in BREAKDOWNS.items():
+        key = encode_key(key_of(doc))
+        add(f"{name}.{key}.count", sign)
+        add(f"{name}.{key}.total_amount", amount)
+    for flag in SERVICE_FLAGS:
+        if doc.get(flag) is True:
+            add(f"service_counts.{flag}", sign)
+    return deltas
+
+def compute_deltas(added: Iterable[Dict[str, Any]] = (), removed: Iterable[Dict[str, Any]] = ()) -> Dict[str, float]:
+    """Calcula el $inc neto de documentos agregados y eliminados"""
+    deltas = {}
+    for doc in added:
+        accumulate(deltas, doc, 1)
+    for doc in removed:
+        accumulate(deltas, doc, -1)
+    return {path: value for path, value in deltas.items() if value}
+
+def _summary_from_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte el resultado de get_collection_stats al formato guardado del resumen"""
+    summary = {
+        "total_projects": stats.get("total_projects", 0),
+        "total_amount": stats.get("total_amount", 0),
+        "service_counts": dict(stats.get("service_counts", {})),
+    }
+    for name in BREAKDOWNS:
+        summary[name] = {encode_key(key): dict(value) for key, value in stats.get(name, {}).items()}
+    return summary
+
+def _flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{path}."))
+        else:
+            flat[path] = value
+    return flat
+
+class StatsSummary:
+    """Documento de estadísticas materializado y mantenido con deltas $inc.
+
+    Cada escritura del controlador aplica el aporte de los documentos agregados
+    y eliminados, de modo que leer las estadísticas completas es O(1).
+    """
+
+    def __init__(self, get_collection, source_collection_name, summary_id=None):
+        self._get_collection = get_collection
+        self.source_collection_name = source_collection_name
+        self.summary_id = summary_id or source_collection_name
+
+    def _summaries(self):
+        return self._get_collection(SUMMARY_COLLECTION)
+
+    def apply(self, deltas: Dict[str, float]) -> bool:
+        """Aplica un mapa de $inc al resumen.
+
+        Solo sobre un resumen ya construido: si no existe se reconstruye desde la
+        colección (que ya incluye esta escritura) en vez de crear uno parcial.
+        """
+        try:
+            update = {"$set": {"updated_at": datetime.now()}}
+            if deltas:
+                update["$inc"] = deltas
+            result = self._summaries().update_one({"_id": self.summary_id, "rebuilt_at": {"$exists": True}}, update)
+            if not result.matched_count:
+                self.rebuild()
+            return True
+        except Exception as e:
+            # Un fallo aquí no debe romper la escritura; la reconciliación corrige la deriva
+            logger.warning(f"⚠️ No se pudo actualizar el resumen de estadísticas: {e}")
+            return False
+
+    def record(self, added: Iterable[Dict[str, Any]] = (), removed: Iterable[Dict[str, Any]] = ()) -> bool:
+        """Registra documentos agregados y/o eliminados"""
+        return self.apply(compute_deltas(added, removed))
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """Lee el resumen con el mismo formato que get_collection_stats (None si no existe)"""
+        doc = self._summaries().find_one({"_id": self.summary_id})
+        # Sin rebuilt_at el documento nunca se sembró desde la colección (no es confiable)
+        if not doc or "rebuilt_at" not in doc:
+            return None
+
+        total_count = doc.get("total_projects", 0)
+        total_amount = doc.get("total_amount", 0)
+        stats = {
+            "total_projects": total_count,
+            "total_amount": total_amount,
+            "average_amount": total_amount / total_count if total_count > 0 else 0,
+        }
+        for name in BREAKDOWNS:
+            stats[name] = {
+                decode_key(key): {"count": value.get("count", 0), "total_amount": value.get("total_amount", 0)}
+                for key, value in sorted(doc.get(name, {}).items())
+                if value.get("count", 0) > 0
+            }
+        services = doc.get("service_counts", {})
+        stats["service_counts"] = {flag: services.get(flag, 0) for flag in SERVICE_FLAGS}
+        return stats
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Reconstruye el resumen desde cero y reporta la deriva encontrada"""
+        stats = get_collection_stats(self._get_collection(self.source_collection_name))
+        if not stats:
+            raise Exception("No se pudieron calcular las estadísticas de la colección")
+
+        expected = _summary_from_stats(stats)
+        current = self._summaries().find_one({"_id": self.summary_id}) or {}
+        current = {key: value for key, value in current.items() if key in expected}
+
+        expected_flat = _flatten(expected)
+        current_flat = _flatten(current)
+        drift = {}
+        for path in sorted(set(expected_flat) | set(current_flat)):
+            before = current_flat.get(path, 0)
+            after = expected_flat.get(path, 0)
+            # Tolerancia para el redondeo acumulado de sumas de montos
+            if abs(before - after) > 1e-6 * max(1, abs(after)):
+                drift[decode_key(path)] = {"stored": before, "actual": after}
+
+        self._summaries().update_one(
+            {"_id": self.summary_id},
+            {"$set": {**expected, "updated_at": datetime.now(), "rebuilt_at": datetime.now()}},
+            upsert=True
+        )
+
+        if drift:
+            logger.warning(f"⚠️ Resumen de estadísticas con {len(drift)} diferencias, reconstruido")
+        else:
+            logger.info("✅ Resumen de estadísticas sin diferencias")
+        return {"drift": drift, "drift_count": len(drift), "summary": stats}
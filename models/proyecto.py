@@ -1,233 +1,178 @@
 from datetime import datetime
 from typing import Optional, Dict, Any
 from bson import ObjectId
+import itertools
+import json
 import logging
+import re
+import unicodedata
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Esquema del proyecto: (campo, valor por defecto). Es la única definición de los
+# campos; el constructor, from_dict, to_dict y update_fields se generan desde aquí.
+PROYECTO_SCHEMA = [
+    ("id", None),
+    ("contrato", ""),
+    ("cliente", ""),
+    ("fecha_inicio", None),
+    ("fecha_termino", None),
+    ("duracion", None),
+    ("region", ""),
+    ("ciudad", ""),
+    ("estado", "Activo"),
+    ("monto", 0.0),
+    # Información del cliente
+    ("rut_cliente", ""),
+    ("tipo_cliente", ""),
+    ("persona_contacto", ""),
+    ("telefono_contacto", ""),
+    ("correo_contacto", ""),
+    # Información técnica
+    ("superficie_terreno", None),
+    ("superficie_construida", None),
+    ("tipo_obra_lista", ""),
+    # Estudios y servicios
+    ("ems", False),
+    ("estudio_sismico", False),
+    ("estudio_geoelectrico", False),
+    ("topografia", False),
+    ("sondaje", False),
+    ("hidraulica_hidrologia", False),
+    ("descripcion", ""),
+    ("certificado_experiencia", False),
+    ("orden_compra", False),
+    ("contrato_doc", False),
+    ("factura", False),
+    ("fecha_factura", None),
+    ("numero_factura", ""),
+    ("numero_orden_compra", ""),
+    ("link_documentos", ""),
+    ("_id", None),  # MongoDB ObjectId
+    ("created_at", None),
+    ("updated_at", None)
+]
+
+# Campos del documento de proyecto (en el orden en que se serializan)
+PROYECTO_FIELDS = [name for name, _ in PROYECTO_SCHEMA]
+
+# Valores por defecto de cada campo al leer documentos incompletos
+FIELD_DEFAULTS = {name: default for name, default in PROYECTO_SCHEMA if default is not None}
+
+# Campos que toman la fecha actual cuando vienen vacíos
+_TIMESTAMP_FIELDS = ("created_at", "updated_at")
+
+def _compile_proyecto_methods(schema):
+    """Genera el código de __init__, from_dict y to_dict a partir del esquema"""
+    params = ", ".join(f"{name}={default!r}" for name, default in schema)
+    init_lines = [f"def __init__(self, {params}):"]
+    from_lines = ["def from_dict(cls, data):", "    self = cls.__new__(cls)", "    get = data.get"]
+    to_items = []
+
+    for name, default in schema:
+        if name in _TIMESTAMP_FIELDS:
+            init_lines.append(f"    self.{name} = {name} if {name} else now()")
+            from_lines.append(f"    value = get({name!r})")
+            from_lines.append(f"    self.{name} = value if value else now()")
+        else:
+            init_lines.append(f"    self.{name} = {name}")
+            from_lines.append(f"    self.{name} = get({name!r}, {default!r})" if default is not None
+                              else f"    self.{name} = get({name!r})")
+        if name != "_id":
+            to_items.append(f"        {name!r}: self.{name},")
+
+    from_lines.append("    return self")
+    to_lines = ["def to_dict(self):", "    data = {", *to_items, "    }",
+                "    # Solo incluir _id si existe",
+                "    if self._id:",
+                "        data['_id'] = self._id",
+                "    return data"]
+
+    namespace = {"now": datetime.now}
+    exec("\n".join(init_lines + [""] + from_lines + [""] + to_lines), namespace)
+    return namespace["__init__"], namespace["from_dict"], namespace["to_dict"]
+
+_proyecto_init, _proyecto_from_dict, _proyecto_to_dict = _compile_proyecto_methods(PROYECTO_SCHEMA)
+
 class Proyecto:
-    """Modelo para representar un proyecto/registro en MongoDB Atlas"""
-
-    def __init__(self,
-                 id: int = None,
-                 contrato: str = "",
-                 cliente: str = "",
-                 fecha_inicio: Optional[datetime] = None,
-                 fecha_termino: Optional[datetime] = None,
-                 duracion: Optional[int] = None,
-                 region: str = "",
-                 ciudad: str = "",
-                 estado: str = "Activo",
-                 monto: float = 0.0,
-                 # Información del cliente
-                 rut_cliente: str = "",
-                 tipo_cliente: str = "",
-                 persona_contacto: str = "",
-                 telefono_contacto: str = "",
-                 correo_contacto: str = "",
-                 # Información técnica
-                 superficie_terreno: Optional[float] = None,
-                 superficie_construida: Optional[float] = None,
-                 tipo_obra_lista: str = "",
-                 # Estudios y servicios
-                 ems: bool = False,
-                 estudio_sismico: bool = False,
-                 estudio_geoelectrico: bool = False,
-                 topografia: bool = False,
-                 sondaje: bool = False,
-                 hidraulica_hidrologia: bool = False,
-                 descripcion: str = "",
-                 certificado_experiencia: bool = False,
-                 orden_compra: bool = False,
-                 contrato_doc: bool = False,
-                 factura: bool = False,
-                 fecha_factura: Optional[datetime] = None,
-                 numero_factura: str = "",
-                 numero_orden_compra: str = "",
-                 link_documentos: str = "",
-                 _id: Optional[ObjectId] = None,
-                 created_at: Optional[datetime] = None,
-                 updated_at: Optional[datetime] = None):
-        self.id = id
-        self.contrato = contrato
-        self.cliente = cliente
-        self.fecha_inicio = fecha_inicio
-        self.fecha_termino = fecha_termino
-        self.duracion = duracion
-        self.region = region
-        self.ciudad = ciudad
-        self.estado = estado
-        self.monto = monto
-        # Información del cliente
-        self.rut_cliente = rut_cliente
-        self.tipo_cliente = tipo_cliente
-        self.persona_contacto = persona_contacto
-        self.telefono_contacto = telefono_contacto
-        self.correo_contacto = correo_contacto
-        # Información técnica
-        self.superficie_terreno = superficie_terreno
-        self.superficie_construida = superficie_construida
-        self.tipo_obra_lista = tipo_obra_lista
-        # Estudios y servicios
-        self.ems = ems
-        self.estudio_sismico = estudio_sismico
-        self.estudio_geoelectrico = estudio_geoelectrico
-        self.topografia = topografia
-        self.sondaje = sondaje
-        self.hidraulica_hidrologia = hidraulica_hidrologia
-        self.descripcion = descripcion
-        self.certificado_experiencia = certificado_experiencia
-        self.orden_compra = orden_compra
-        self.contrato_doc = contrato_doc
-        self.factura = factura
-        self.fecha_factura = fecha_factura
-        self.numero_factura = numero_factura
-        self.numero_orden_compra = numero_orden_compra
-        self.link_documentos = link_documentos
-        self._id = _id  # MongoDB ObjectId
-        self.created_at = created_at if created_at else datetime.now()
-        self.updated_at = updated_at if updated_at else datetime.now()
+    """Modelo para representar un proyecto/registro en MongoDB Atlas.
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Convierte el objeto a diccionario para MongoDB"""
-        data = {
-            'id': self.id,
-            'contrato': self.contrato,
-            'cliente': self.cliente,
-            'fecha_inicio': self.fecha_inicio,
-            'fecha_termino': self.fecha_termino,
-            'duracion': self.duracion,
-            'region': self.region,
-            'ciudad': self.ciudad,
-            'estado': self.estado,
-            'monto': self.monto,
-            # Información del cliente
-            'rut_cliente': self.rut_cliente,
-            'tipo_cliente': self.tipo_cliente,
-            'persona_contacto': self.persona_contacto,
-            'telefono_contacto': self.telefono_contacto,
-            'correo_contacto': self.correo_contacto,
-            # Información técnica
-            'superficie_terreno': self.superficie_terreno,
-            'superficie_construida': self.superficie_construida,
-            'tipo_obra_lista': self.tipo_obra_lista,
-            # Estudios y servicios
-            'ems': self.ems,
-            'estudio_sismico': self.estudio_sismico,
-            'estudio_geoelectrico': self.estudio_geoelectrico,
-            'topografia': self.topografia,
-            'sondaje': self.sondaje,
-            'hidraulica_hidrologia': self.hidraulica_hidrologia,
-            'descripcion': self.descripcion,
-            'certificado_experiencia': self.certificado_experiencia,
-            'orden_compra': self.orden_compra,
-            'contrato_doc': self.contrato_doc,
-            'factura': self.factura,
-            'fecha_factura': self.fecha_factura,
-            'numero_factura': self.numero_factura,
-            'numero_orden_compra': self.numero_orden_compra,
-            'link_documentos': self.link_documentos,
-            'created_at': self.created_at,
-            'updated_at': datetime.now()  # Siempre actualizar timestamp
-        }
+    Usa __slots__ (sin __dict__ por instancia) y métodos generados desde
+    PROYECTO_SCHEMA para reducir memoria y acelerar la hidratación.
+    """
 
-        # Solo incluir _id si existe
-        if self._id:
-            data['_id'] = self._id
+    __slots__ = tuple(PROYECTO_FIELDS)
+    _field_names = frozenset(PROYECTO_FIELDS)
 
-        return data
+    __init__ = _proyecto_init
+    __init__.__doc__ = "Crea un proyecto; acepta como argumentos con nombre los campos de PROYECTO_SCHEMA"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convierte el objeto a diccionario para MongoDB"""
+        return _proyecto_to_dict(self)
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Proyecto':
         """Crea un objeto Proyecto desde un diccionario de MongoDB"""
-        return cls(
-            id=data.get('id'),
-            contrato=data.get('contrato', ''),
-            cliente=data.get('cliente', ''),
-            fecha_inicio=data.get('fecha_inicio'),
-            fecha_termino=data.get('fecha_termino'),
-            duracion=data.get('duracion'),
-            region=data.get('region', ''),
-            ciudad=data.get('ciudad', ''),
-            estado=data.get('estado', 'Activo'),
-            monto=data.get('monto', 0.0),
-            # Información del cliente
-            rut_cliente=data.get('rut_cliente', ''),
-            tipo_cliente=data.get('tipo_cliente', ''),
-            persona_contacto=data.get('persona_contacto', ''),
-            telefono_contacto=data.get('telefono_contacto', ''),
-            correo_contacto=data.get('correo_contacto', ''),
-            # Información técnica
-            superficie_terreno=data.get('superficie_terreno'),
-            superficie_construida=data.get('superficie_construida'),
-            tipo_obra_lista=data.get('tipo_obra_lista', ''),
-            # Estudios y servicios
-            ems=data.get('ems', False),
-            estudio_sismico=data.get('estudio_sismico', False),
-            estudio_geoelectrico=data.get('estudio_geoelectrico', False),
-            topografia=data.get('topografia', False),
-            sondaje=data.get('sondaje', False),
-            hidraulica_hidrologia=data.get('hidraulica_hidrologia', False),
-            descripcion=data.get('descripcion', ''),
-            certificado_experiencia=data.get('certificado_experiencia', False),
-            orden_compra=data.get('orden_compra', False),
-            contrato_doc=data.get('contrato_doc', False),
-            factura=data.get('factura', False),
-            fecha_factura=data.get('fecha_factura'),
-            numero_factura=data.get('numero_factura', ''),
-            numero_orden_compra=data.get('numero_orden_compra', ''),
-            link_documentos=data.get('link_documentos', ''),
-            _id=data.get('_id'),
-            created_at=data.get('created_at'),
-            updated_at=data.get('updated_at')
-        )
+        return _proyecto_from_dict(cls, data)
 
     def update_fields(self, **kwargs):
         """Actualiza campos específicos del proyecto"""
+        field_names = self._field_names
         for key, value in kwargs.items():
-            if hasattr(self, key):
+            if key in field_names:
                 setattr(self, key, value)
         self.updated_at = datetime.now()
 
     def validate(self) -> tuple[bool, list[str]]:
         """Valida los datos del proyecto"""
+        errors = [message for _, message in self.validate_fields()]
+        return len(errors) == 0, errors
+
+    def validate_fields(self) -> list[tuple[str, str]]:
+        """Valida los datos del proyecto; retorna (campo, mensaje) por cada error"""
         errors = []
 
         # Validar contrato
         if not self.contrato or len(self.contrato.strip()) < 2:
-            errors.append("El contrato debe tener al menos 2 caracteres")
+            errors.append(("contrato", "El contrato debe tener al menos 2 caracteres"))
 
         # Validar cliente
         if not self.cliente or len(self.cliente.strip()) < 2:
-            errors.append("El cliente debe tener al menos 2 caracteres")
+            errors.append(("cliente", "El cliente debe tener al menos 2 caracteres"))
 
         # Validar región
         if not self.region or len(self.region.strip()) < 2:
-            errors.append("La región debe tener al menos 2 caracteres")
+            errors.append(("region", "La región debe tener al menos 2 caracteres"))
 
         # Validar ciudad
         if not self.ciudad or len(self.ciudad.strip()) < 2:
-            errors.append("La ciudad debe tener al menos 2 caracteres")
+            errors.append(("ciudad", "La ciudad debe tener al menos 2 caracteres"))
 
         # Validar estado
         if self.estado not in STATUS_OPTIONS:
-            errors.append(f"Estado inválido. Opciones válidas: {', '.join(STATUS_OPTIONS)}")
+            errors.append(("estado", f"Estado inválido. Opciones válidas: {', '.join(STATUS_OPTIONS)}"))
 
         # Validar monto
         if self.monto < 0:
-            errors.append("El monto no puede ser negativo")
+            errors.append(("monto", "El monto no puede ser negativo"))
 
         if self.monto > 999999999.99:
-            errors.append("El monto es demasiado grande")
+            errors.append(("monto", "El monto es demasiado grande"))
 
         # Validar fechas
         if self.fecha_inicio and self.fecha_inicio > datetime.now():
-            errors.append("La fecha de inicio no puede ser futura")
+            errors.append(("fecha_inicio", "La fecha de inicio no puede ser futura"))
 
         if self.fecha_termino and self.fecha_inicio and self.fecha_termino < self.fecha_inicio:
-            errors.append("La fecha de término no puede ser anterior a la fecha de inicio")
+            errors.append(("fecha_termino", "La fecha de término no puede ser anterior a la fecha de inicio"))
 
-        return len(errors) == 0, errors
+        return errors
 
     def to_json_serializable(self) -> Dict[str, Any]:
         """Convierte el objeto a formato serializable JSON"""
@@ -238,8 +183,8 @@ class Proyecto:
             data['_id'] = str(data['_id'])
 
         # Convertir datetime a string ISO
-        for field in ['date', 'created_at', 'updated_at']:
-            if data.get(field) and isinstance(data[field], datetime):
+        for field in DATETIME_FIELDS:
+            if isinstance(data.get(field), datetime):
                 data[field] = data[field].isoformat()
 
         return data
@@ -257,6 +202,24 @@ STATUS_OPTIONS = [
     "Pendiente"
 ]
 
+# Campos de tipo fecha
+DATETIME_FIELDS = ["fecha_inicio", "fecha_termino", "fecha_factura", "created_at", "updated_at"]
+
+# Campos por los que se puede ordenar/paginar (cada uno con índice compuesto campo + _id)
+SORTABLE_FIELDS = [
+    "id",
+    "contrato",
+    "cliente",
+    "fecha_inicio",
+    "fecha_termino",
+    "region",
+    "ciudad",
+    "estado",
+    "monto",
+    "created_at",
+    "updated_at"
+]
+
 # Mapeo de colores para estados (para uso en frontend)
 STATUS_COLORS = {
     "Activo": "#3498db",      # Azul
@@ -283,11 +246,200 @@ def format_date(date: datetime) -> str:
             return date
     return str(date) if date else ""
 
+# Función para construir proyecciones
+def parse_fields(fields) -> Optional[list]:
+    """Normaliza una lista de campos (o string separado por comas) y valida los nombres.
+
+    Retorna None si no se pidió proyección. Lanza ValueError con campos desconocidos.
+    """
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    fields = [field.strip() for field in fields if field and field.strip()]
+    if not fields:
+        return None
+
+    unknown = [field for field in fields if field not in PROYECTO_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+
+    # El id siempre se incluye para que el frontend pueda identificar el registro
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+def build_projection(fields, *extra) -> Dict[str, int]:
+    """Construye la proyección de MongoDB para los campos pedidos (más campos extra).
+
+    Sin campos pedidos se traen todos menos los campos derivados.
+    """
+    if not fields:
+        return {field: 0 for field in DERIVED_FIELDS}
+    projection = {field: 1 for field in fields}
+    for field in extra:
+        projection[field] = 1
+    return projection
+
+def serialize_document(doc: Dict[str, Any], fields) -> Dict[str, Any]:
+    """Serializa solo los campos pedidos de un documento crudo, sin hidratar un Proyecto"""
+    data = {}
+    for field in fields:
+        value = doc.get(field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, ObjectId):
+            value = str(value)
+        data[field] = value
+    return data
+
+def _json_default(obj):
+    """Convierte a JSON los tipos que el serializador no maneja de forma nativa"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+if orjson is not None:
+    def dumps_bytes(data) -> bytes:
+        """Serializa a JSON (bytes) usando orjson, que maneja datetime de forma nativa"""
+        return orjson.dumps(data, default=_json_default)
+else:
+    def dumps_bytes(data) -> bytes:
+        """Serializa a JSON (bytes) usando la librería estándar"""
+        return json.dumps(data, default=_json_default, ensure_ascii=False).encode("utf-8")
+
+class ProyectoEncoder:
+    """Codificador precompilado de documentos crudos de MongoDB a JSON.
+
+    A partir del esquema (PROYECTO_FIELDS/FIELD_DEFAULTS) genera una sola función
+    que arma el diccionario de salida en una pasada, sin hidratar un Proyecto.
+    datetime, ObjectId y None se resuelven en el serializador JSON.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = tuple(fields) if fields else tuple(PROYECTO_FIELDS)
+        self._build = self._compile(self.fields, include_defaults=not fields)
+
+    @staticmethod
+    def _compile(fields, include_defaults):
+        lines = ["def build(doc):", "    get = doc.get", "    data = {"]
+        for field in fields:
+            if field == "_id":
+                continue
+            if include_defaults and field in FIELD_DEFAULTS:
+                lines.append(f"        {field!r}: get({field!r}, {FIELD_DEFAULTS[field]!r}),")
+            else:
+                lines.append(f"        {field!r}: get({field!r}),")
+        lines.append("    }")
+        if "_id" in fields:
+            lines += [
+                "    if doc.get('_id') is not None:",
+                "        data['_id'] = str(doc['_id'])",
+            ]
+        lines.append("    return data")
+
+        namespace = {}
+        exec("\n".join(lines), namespace)
+        return namespace["build"]
+
+    def to_serializable(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Arma el diccionario de salida (los datetime se serializan al codificar)"""
+        return self._build(doc)
+
+    def encode(self, doc: Dict[str, Any]) -> bytes:
+        """Codifica un documento a JSON (bytes)"""
+        return dumps_bytes(self._build(doc))
+
+    def encode_many(self, docs) -> bytes:
+        """Codifica una secuencia de documentos como arreglo JSON (bytes)"""
+        build = self._build
+        return dumps_bytes([build(doc) for doc in docs])
+
+_encoders: Dict[tuple, ProyectoEncoder] = {}
+
+def get_encoder(fields=None) -> ProyectoEncoder:
+    """Retorna (y cachea) el codificador para un conjunto de campos"""
+    key = tuple(fields) if fields else ()
+    encoder = _encoders.get(key)
+    if encoder is None:
+        encoder = _encoders[key] = ProyectoEncoder(fields)
+    return encoder
+
 # Función para formatear cantidad
 def format_amount(amount: float) -> str:
     """Formatea la cantidad como moneda chilena"""
     return f"${amount:,.0f} CLP"
 
+# ===== CAMPOS DERIVADOS =====
+
+# Campos incluidos en la clave de búsqueda, en orden fijo (cada uno es un segmento)
+SEARCH_FIELDS = [
+    "id", "contrato", "cliente", "rut_cliente", "ciudad", "region", "estado", "tipo_cliente",
+    "tipo_obra_lista", "persona_contacto", "telefono_contacto", "correo_contacto",
+    "numero_factura", "numero_orden_compra", "descripcion"
+]
+
+# Se incrementa cuando cambia el formato de search_key o de los campos derivados
+# (fuerza el recálculo). 2: se agrega rut_normalizado
+SEARCH_KEY_VERSION = 2
+
+# Campos que se guardan en el documento pero no forman parte del proyecto
+DERIVED_FIELDS = ["search_key", "search_key_version", "rut_normalizado"]
+
+# Separador de segmentos: no puede aparecer en un texto normalizado
+SEARCH_SEPARATOR = "\n"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def fold_text(value) -> str:
+    """Normaliza un texto para búsqueda: minúsculas, sin tildes y espacios simples"""
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WHITESPACE_RE.sub(" ", text.lower()).strip()
+
+def compact_rut(value) -> str:
+    """RUT sin puntos, guiones ni espacios (permite buscar "12345678" en "12.345.678-9")"""
+    return re.sub(r"[^0-9k]", "", fold_text(value))
+
+def rut_check_digit(body: str) -> str:
+    """Dígito verificador (módulo 11) del cuerpo numérico de un RUT"""
+    total = sum(int(digit) * factor for digit, factor in zip(reversed(body), itertools.cycle(range(2, 8))))
+    remainder = 11 - total % 11
+    return {11: "0", 10: "K"}.get(remainder, str(remainder))
+
+def normalize_rut(value) -> Optional[str]:
+    """RUT en forma canónica ("76123456-7") o None si está vacío o su dígito verificador no calza.
+
+    Acepta puntos, guiones, espacios y K minúscula: "76.123.456-7", "761234567" y
+    "76123456-7" dan el mismo resultado.
+    """
+    compact = compact_rut(value).upper()
+    body, check_digit = compact[:-1].lstrip("0"), compact[-1:]
+    if not body.isdigit() or len(body) > 9 or rut_check_digit(body) != check_digit:
+        return None
+    return f"{body}-{check_digit}"
+
+def build_search_key(doc: Dict[str, Any]) -> str:
+    """Construye la clave de búsqueda: un segmento normalizado por campo de SEARCH_FIELDS
+    y, al final, el RUT compacto"""
+    segments = [fold_text(doc.get(field)) for field in SEARCH_FIELDS]
+    segments.append(compact_rut(doc.get("rut_cliente")))
+    return SEARCH_SEPARATOR.join(segments)
+
+def add_derived_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Agrega al documento los campos derivados que se guardan junto a los datos"""
+    doc["search_key"] = build_search_key(doc)
+    doc["search_key_version"] = SEARCH_KEY_VERSION
+    doc["rut_normalizado"] = normalize_rut(doc.get("rut_cliente"))
+    return doc
+
+# Campos filtrables sin índice propio en SORTABLE_FIELDS (esos ya tienen (campo, _id))
+FILTER_INDEX_FIELDS = ["tipo_obra_lista", "duracion", "superficie_terreno", "superficie_construida", "fecha_factura"]
+
 # Función para crear índices en MongoDB
 def create_indexes(collection):
     """Crea índices optimizados para la colección de proyectos"""
@@ -304,6 +456,23 @@ def create_indexes(collection):
         # Índice en created_at para ordenamiento
         collection.create_index("created_at")
 
+        # Índice para filtrar estadísticas por tipo de cliente
+        collection.create_index("tipo_cliente")
+
+        # Índice para detectar facturas duplicadas al importar (id y contrato ya tienen índice)
+        collection.create_index("numero_factura")
+
+        # Índice para agrupar y consultar por cliente con el RUT canónico
+        collection.create_index("rut_normalizado")
+
+        # Índices para los filtros del listado (igualdad, conjuntos y rangos)
+        for field in FILTER_INDEX_FIELDS:
+            collection.create_index(field)
+
+        # Índices compuestos para paginación por cursor (campo + _id como desempate)
+        for field in SORTABLE_FIELDS:
+            collection.create_index([(field, 1), ("_id", 1)])
+
         logger.info("✅ Índices creados exitosamente")
         return True
 
@@ -311,38 +480,90 @@ def create_indexes(collection):
         logger.error(f"❌ Error creando índices: {e}")
         return False
 
-# Función para obtener estadísticas de la colección
-def get_collection_stats(collection) -> Dict[str, Any]:
-    """Obtiene estadísticas de la colección de proyectos"""
-    try:
-        # Contar documentos por estado
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1},
-                    "total_amount": {"$sum": "$amount"}
-                }
-            }
-        ]
+# Campos booleanos de estudios, servicios y documentos que se contabilizan
+SERVICE_FLAGS = [
+    "ems",
+    "estudio_sismico",
+    "estudio_geoelectrico",
+    "topografia",
+    "sondaje",
+    "hidraulica_hidrologia",
+    "certificado_experiencia",
+    "orden_compra",
+    "contrato_doc",
+    "factura"
+]
 
-        status_stats = list(collection.aggregate(pipeline))
-
-        # Estadísticas generales
-        total_count = collection.count_documents({})
-        total_amount = collection.aggregate([
-            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-        ])
-        total_amount = list(total_amount)
-        total_amount = total_amount[0]["total"] if total_amount else 0
-
-        return {
-            "total_projects": total_count,
-            "total_amount": total_amount,
-            "status_breakdown": {stat["_id"]: stat for stat in status_stats},
-            "average_amount": total_amount / total_count if total_count > 0 else 0
+# Etiqueta para agrupar documentos sin valor en el campo
+UNSPECIFIED_LABEL = "Sin especificar"
+
+def _group_by(expression):
+    """Etapas de $facet que cuentan y suman monto agrupando por una expresión"""
+    return [
+        {"$group": {"_id": expression, "count": {"$sum": 1}, "total_amount": {"$sum": "$monto"}}},
+        {"$sort": {"_id": 1}}
+    ]
+
+def _breakdown(buckets) -> Dict[str, Dict[str, Any]]:
+    """Convierte los grupos de $facet en {valor: {count, total_amount}}"""
+    result = {}
+    for bucket in buckets:
+        key = bucket["_id"]
+        key = UNSPECIFIED_LABEL if key in (None, "") else str(key)
+        entry = result.setdefault(key, {"count": 0, "total_amount": 0})
+        entry["count"] += bucket["count"]
+        entry["total_amount"] += bucket["total_amount"]
+    return result
+
+def build_stats_pipeline(query: Optional[Dict[str, Any]] = None) -> list:
+    """Construye la agregación $facet que calcula todas las estadísticas en un round trip"""
+    year_of_start = {
+        "$cond": [
+            {"$eq": [{"$type": "$fecha_inicio"}, "date"]},
+            {"$year": "$fecha_inicio"},
+            None
+        ]
+    }
+    services = {flag: {"$sum": {"$cond": [{"$eq": [f"${flag}", True]}, 1, 0]}} for flag in SERVICE_FLAGS}
+
+    pipeline = [{"$match": query}] if query else []
+    pipeline.append({
+        "$facet": {
+            "totals": [{"$group": {"_id": None, "count": {"$sum": 1}, "total_amount": {"$sum": "$monto"}}}],
+            "by_estado": _group_by("$estado"),
+            "by_region": _group_by("$region"),
+            "by_year": _group_by(year_of_start),
+            "by_tipo_cliente": _group_by("$tipo_cliente"),
+            "services": [{"$group": {"_id": None, **services}}]
         }
+    })
+    return pipeline
+
+def format_stats_result(facets: Dict[str, Any]) -> Dict[str, Any]:
+    """Da formato al resultado de la agregación $facet"""
+    totals = facets["totals"][0] if facets.get("totals") else {"count": 0, "total_amount": 0}
+    services = facets["services"][0] if facets.get("services") else {}
+    total_count = totals["count"]
+    total_amount = totals["total_amount"]
+
+    return {
+        "total_projects": total_count,
+        "total_amount": total_amount,
+        "average_amount": total_amount / total_count if total_count > 0 else 0,
+        "status_breakdown": _breakdown(facets.get("by_estado", [])),
+        "region_breakdown": _breakdown(facets.get("by_region", [])),
+        "year_breakdown": _breakdown(facets.get("by_year", [])),
+        "tipo_cliente_breakdown": _breakdown(facets.get("by_tipo_cliente", [])),
+        "service_counts": {flag: services.get(flag, 0) for flag in SERVICE_FLAGS}
+    }
+
+# Función para obtener estadísticas de la colección
+def get_collection_stats(collection, query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Obtiene estadísticas de la colección de proyectos en una sola agregación $facet"""
+    try:
+        result = list(collection.aggregate(build_stats_pipeline(query)))
+        return format_stats_result(result[0] if result else {})
 
     except Exception as e:
         logger.error(f"❌ Error obteniendo estadísticas: {e}")
-        return {}
\ No newline at end of file
+        return {}
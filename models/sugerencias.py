@@ -0,0 +1,99 @@
+import bisect
+import heapq
+import logging
+import threading
+from typing import Dict, Any, Iterable, List
+
+from models.proyecto import fold_text
+
+logger = logging.getLogger(__name__)
+
+# Campos con sugerencias de valores (autocompletado)
+SUGGEST_FIELDS = ["cliente", "ciudad", "region", "tipo_obra_lista"]
+
+# Máximo de sugerencias por consulta
+MAX_SUGGESTIONS = 50
+
+class _FieldValues:
+    """Valores distintos de un campo con su frecuencia, ordenados por su forma normalizada"""
+
+    def __init__(self, counts: Dict[str, int]):
+        self.counts = counts
+        self.keys = sorted((fold_text(value), value) for value in counts)
+
+    def add(self, value: str, delta: int):
+        count = self.counts.get(value, 0) + delta
+        entry = (fold_text(value), value)
+        if count > 0:
+            if value not in self.counts:
+                bisect.insort(self.keys, entry)
+            self.counts[value] = count
+        elif value in self.counts:
+            del self.counts[value]
+            position = bisect.bisect_left(self.keys, entry)
+            if position < len(self.keys) and self.keys[position] == entry:
+                del self.keys[position]
+
+    def prefix(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        # Todas las claves que empiezan con el prefijo forman un rango contiguo
+        start = bisect.bisect_left(self.keys, (prefix,))
+        end = bisect.bisect_left(self.keys, (prefix + "\uffff",))
+        matches = self.keys[start:end]
+        top = heapq.nsmallest(limit, matches, key=lambda entry: (-self.counts[entry[1]], entry[0]))
+        return [{"value": value, "count": self.counts[value]} for _, value in top]
+
+class SuggestionIndex:
+    """Sugerencias por prefijo sobre los valores distintos de algunos campos.
+
+    Cada campo se carga la primera vez que se consulta con una agregación
+    ($group por valor) y luego se mantiene con las escrituras del controlador,
+    así que las consultas se responden en memoria sin ir a la base de datos.
+    """
+
+    def __init__(self, get_collection, source_collection_name, fields=None):
+        self._get_collection = get_collection
+        self.source_collection_name = source_collection_name
+        self.fields = list(fields or SUGGEST_FIELDS)
+
+        self._values: Dict[str, _FieldValues] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, field: str) -> _FieldValues:
+        pipeline = [
+            {"$match": {field: {"$nin": [None, ""]}}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+        ]
+        collection = self._get_collection(self.source_collection_name)
+        counts = {str(row["_id"]): row["count"] for row in collection.aggregate(pipeline)}
+        logger.info(f"💡 Sugerencias de '{field}' cargadas: {len(counts)} valores")
+        return _FieldValues(counts)
+
+    def suggest(self, field: str, prefix: str = "", limit: int = 10) -> List[Dict[str, Any]]:
+        """Valores de `field` que empiezan con `prefix` (sin distinguir tildes ni mayúsculas),
+        de mayor a menor frecuencia. Lanza ValueError si el campo no tiene sugerencias."""
+        if field not in self.fields:
+            raise ValueError(f"Campo sin sugerencias: {field}. Opciones: {', '.join(self.fields)}")
+        limit = max(1, min(int(limit), MAX_SUGGESTIONS))
+
+        with self._lock:
+            values = self._values.get(field)
+            if values is None:
+                values = self._values[field] = self._load(field)
+            return values.prefix(fold_text(prefix), limit)
+
+    def invalidate(self):
+        """Descarta los valores cargados; se vuelven a cargar en la siguiente consulta"""
+        with self._lock:
+            self._values = {}
+
+    def update(self, added: Iterable[Dict[str, Any]] = (), removed: Iterable[Dict[str, Any]] = ()):
+        """Aplica documentos agregados y eliminados a los campos ya cargados"""
+        with self._lock:
+            if not self._values:
+                return
+            for docs, delta in ((removed, -1), (added, 1)):
+                for doc in docs:
+                    for field, values in self._values.items():
+                        value = doc.get(field)
+                        if value not in (None, ""):
+                            values.add(str(value), delta)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Reconstruye el resumen materializado de estadísticas de proyectos
+y reporta las diferencias encontradas respecto del resumen guardado
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.controller import get_controller
+
+def main():
+    print("🔄 Reconciliando estadísticas de proyectos...")
+    try:
+        result = get_controller().reconcile_statistics()
+    except Exception as e:
+        print(f"❌ Error reconciliando estadísticas: {e}")
+        return 1
+
+    if not result['drift']:
+        print("✅ El resumen estaba al día, sin diferencias")
+        return 0
+
+    print(f"⚠️ Se corrigieron {result['drift_count']} diferencias:")
+    for path, values in result['drift'].items():
+        print(f"   {path}: guardado={values['stored']} real={values['actual']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from db.conexion import ConnectionManager, DatabaseConnection
+
+CREDENTIALS = {
+    'admin': {'username': 'Admin', 'password': 'Admin123'},
+    'reader': {'username': 'Admin', 'password': 'Admin123'},
+    'auditor': {'username': 'Auditor', 'password': 'Auditor123'}
+}
+
+class ConnectionManagerConcurrencyTest(unittest.TestCase):
+    """Muchos hilos pidiendo la base a la vez comparten un solo cliente por credenciales"""
+
+    def setUp(self):
+        self.connects = []
+        self.lock = threading.Lock()
+
+        def fake_connect(connection):
+            # Simula un handshake lento para que varios hilos coincidan dentro de get_database
+            threading.Event().wait(0.01)
+            with self.lock:
+                self.connects.append(connection.username)
+            connection.client = object()
+            connection.db = {"credenciales": connection.username}
+            connection.connect_count += 1
+            return True
+
+        patcher = mock.patch.object(DatabaseConnection, 'connect', fake_connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_client_per_credential_set(self):
+        manager = ConnectionManager(CREDENTIALS)
+        user_types = ['admin', 'reader', 'auditor', 'desconocido']
+        threads = 32
+        start = threading.Barrier(threads)
+
+        def worker(index):
+            # Todos los hilos parten juntos para forzar la carrera en la primera conexión
+            start.wait()
+            return {id(manager.get_database(user_types[(index + i) % len(user_types)])) for i in range(100)}
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            databases = set().union(*executor.map(worker, range(threads)))
+
+        # admin, reader y el tipo desconocido (cae en admin) usan las mismas credenciales
+        self.assertEqual(sorted(self.connects), ['Admin', 'Auditor'])
+        self.assertEqual(len(databases), 2)
+        self.assertEqual(sorted((entry['username'], entry['connect_count']) for entry in manager.get_stats()),
+                         [('Admin', 1), ('Auditor', 1)])
+        self.assertIs(manager.get_connection('admin'), manager.get_connection('reader'))
+
+    def test_stats_keep_credentials_with_same_username_apart(self):
+        manager = ConnectionManager({
+            'admin': {'username': 'Admin', 'password': 'Admin123'},
+            'reader': {'username': 'Admin', 'password': 'Lector123'}
+        })
+        manager.get_database('admin')
+        manager.get_database('reader')
+        manager.get_database('reader')
+
+        self.assertEqual(self.connects, ['Admin', 'Admin'])
+        self.assertEqual(manager.get_stats(), [{'username': 'Admin', 'connect_count': 1},
+                                               {'username': 'Admin', 'connect_count': 1}])
+
+if __name__ == '__main__':
+    unittest.main()